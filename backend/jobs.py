@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Analyses running at once; each one spawns compiler/binary child processes
+DEFAULT_WORKERS = int(os.getenv("SMARTOPT_WORKERS", os.cpu_count() or 1))
+
+# Queued + running analyses accepted before new submissions get a 429
+DEFAULT_MAX_PENDING = int(os.getenv("SMARTOPT_MAX_PENDING", 4 * DEFAULT_WORKERS))
+
+# Finished jobs kept around for GET /jobs/{id}
+DEFAULT_KEEP_FINISHED = 1000
+
+
+class QueueFull(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+class Job:
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "queued"
+        self.progress = {"done": 0, "total": None, "stage": None}
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.dedupe_key = None
+        self.subscribers = 1
+
+    def update_progress(self, done: int, total: int, stage: str):
+        self.progress = {"done": done, "total": total, "stage": stage}
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "subscribers": self.subscribers,
+        }
+
+
+class JobManager:
+    """
+    Fixed-size worker pool with a bounded backlog.
+
+    submit() never blocks: once `max_pending` jobs are queued or running it
+    raises QueueFull so the API can answer 429 instead of piling up work.
+    The job function receives a `progress(done, total, stage)` callback.
+
+    Submissions with a `dedupe_key` are single-flight: while a job with the
+    same key is queued or running, later submissions join it (and share
+    its result) instead of starting a second run.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS,
+                 max_pending: int = DEFAULT_MAX_PENDING,
+                 keep_finished: int = DEFAULT_KEEP_FINISHED):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self._pool = ThreadPoolExecutor(max_workers=workers,
+                                        thread_name_prefix="smartopt-job")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self._pending = 0
+        self._running = 0
+        self.submitted = 0
+        self.coalesced = 0
+
+    def join(self, dedupe_key):
+        """The in-flight job for `dedupe_key` (now shared), or None."""
+        with self._lock:
+            return self._join_locked(dedupe_key)
+
+    def _join_locked(self, dedupe_key):
+        job = self._inflight.get(dedupe_key)
+        if job is not None:
+            job.subscribers += 1
+            self.coalesced += 1
+        return job
+
+    def submit(self, fn, *args, dedupe_key=None, **kwargs) -> Job:
+        with self._lock:
+            if dedupe_key is not None:
+                job = self._join_locked(dedupe_key)
+                if job is not None:
+                    return job
+
+            if not self._slots.acquire(blocking=False):
+                raise QueueFull(f"{self.max_pending} analyses already pending")
+
+            job = Job(uuid.uuid4().hex)
+            job.dedupe_key = dedupe_key
+            self._jobs[job.id] = job
+            if dedupe_key is not None:
+                self._inflight[dedupe_key] = job
+            self._pending += 1
+            self.submitted += 1
+            self._trim()
+
+            # Inside the lock so a joining caller never sees job.future unset
+            job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job: Job, fn, args, kwargs):
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, progress=job.update_progress, **kwargs)
+            job.status = "done"
+            return job.result
+        except Exception as e:
+            job.error = str(e)
+            job.status = "error"
+            raise
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._running -= 1
+                if job.dedupe_key is not None:
+                    self._inflight.pop(job.dedupe_key, None)
+            self._slots.release()
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        requests = self.submitted + self.coalesced
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queued": self._pending,
+            "running": self._running,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "coalesce_hit_rate": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
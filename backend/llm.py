@@ -0,0 +1,181 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src import telemetry
+
+HF_API_KEY = os.getenv("HF_API_KEY")
+
+HF_MODEL_URL = "https://api-inference.huggingface.co/models/google/gemma-2b-it"
+
+# Point explanations at another endpoint (e.g. a local stub) instead of HF
+LLM_URL = os.getenv("SMARTOPT_LLM_URL", HF_MODEL_URL)
+
+# Seconds a response waits for a still-running explanation once the
+# analysis itself is done; the request keeps going and fills the cache
+LLM_DEADLINE = float(os.getenv("SMARTOPT_LLM_DEADLINE", "5"))
+
+# Hard limit for one HTTP call to the LLM
+LLM_TIMEOUT = float(os.getenv("SMARTOPT_LLM_TIMEOUT", "30"))
+
+LLM_CACHE_SIZE = int(os.getenv("SMARTOPT_LLM_CACHE_SIZE", "1024"))
+
+PENDING_EXPLANATION = "⏳ Explanation not ready yet; ask again shortly and it will be served from cache."
+
+
+def build_prompt(best_flag, stats, language) -> str:
+    return f"""
+You are an expert compiler engineer. Explain why the optimization flag {best_flag}
+is expected to perform best for the provided source code.
+
+Language detected: {language}
+
+Model confidence per flag:
+{stats}
+
+Explain in 2–3 simple sentences so a beginner can understand.
+"""
+
+
+def stats_digest(stats) -> str:
+    data = json.dumps(stats, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class ExplanationClient:
+    """
+    Pooled, non-blocking client for LLM explanations.
+
+    Requests run on one httpx.AsyncClient inside a private event loop
+    thread, so keep-alive connections are reused across analyses and
+    callers on any thread get a concurrent.futures.Future back at once.
+    Successful explanations are LRU-cached by (best_flag, stats digest,
+    language), and concurrent identical requests share one HTTP call.
+    """
+
+    def __init__(self, url: str = LLM_URL, api_key: str = HF_API_KEY,
+                 timeout: float = LLM_TIMEOUT, deadline: float = LLM_DEADLINE,
+                 cache_size: int = LLM_CACHE_SIZE):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.deadline = deadline
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    @property
+    def enabled(self) -> bool:
+        # The public endpoint needs a key; a custom URL (stub, proxy) may not
+        return self.api_key is not None or self.url != HF_MODEL_URL
+
+    def explain(self, best_flag, stats, language) -> concurrent.futures.Future:
+        """Start (or reuse) an explanation; returns a Future of the text."""
+        if not self.enabled:
+            return _done("⚠️ LLM explanation unavailable (HF_API_KEY not set).")
+
+        key = (best_flag, stats_digest(stats), language)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return _done(self._cache[key])
+            if key in self._inflight:
+                return self._inflight[key]
+            self.misses += 1
+            prompt = build_prompt(best_flag, stats, language)
+            future = asyncio.run_coroutine_threadsafe(self._fetch(key, prompt),
+                                                      self._event_loop())
+            self._inflight[key] = future
+            return future
+
+    def _event_loop(self):
+        # Called with self._lock held
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, name="smartopt-llm",
+                             daemon=True).start()
+        return self._loop
+
+    async def _fetch(self, key, prompt) -> str:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        try:
+            with self._lock:
+                self.requests += 1
+            with telemetry.stage("llm"):
+                response = await self._client.post(self.url, headers=headers,
+                                                   json={"inputs": prompt})
+            out = response.json()
+
+            # HuggingFace returns: [{"generated_text": "..."}]
+            if not (isinstance(out, list) and out and "generated_text" in out[0]):
+                telemetry.FAILURES.inc(stage="llm")
+                return "⚠️ Could not extract explanation from model."
+
+            text = out[0]["generated_text"]
+            with self._lock:
+                self._cache[key] = text
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return text
+        except Exception as e:
+            telemetry.FAILURES.inc(stage="llm")
+            return f"⚠️ LLM error: {e}"
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def wait(self, future: concurrent.futures.Future, deadline: float = None) -> str:
+        """
+        The explanation, or PENDING_EXPLANATION if it isn't ready within
+        `deadline` seconds (default: the client's deadline). A late
+        explanation still lands in the cache.
+        """
+        try:
+            return future.result(timeout=self.deadline if deadline is None else deadline)
+        except concurrent.futures.TimeoutError:
+            return PENDING_EXPLANATION
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "url": self.url,
+                "cached": len(self._cache),
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "requests": self.requests,
+            }
+
+    def close(self):
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(5)
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+
+def _done(text: str) -> concurrent.futures.Future:
+    future = concurrent.futures.Future()
+    future.set_result(text)
+    return future
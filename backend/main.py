@@ -1,28 +1,45 @@
+import asyncio
+import hashlib
+import io
+import json
+import queue
 import sys
-import tempfile
+import tarfile
+import threading
+import zipfile
+from contextlib import asynccontextmanager
 from pathlib import Path
 import os
-import requests
 
 # Allow importing src.smartopt
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from fastapi import FastAPI, UploadFile, File, Body
+from fastapi import FastAPI, UploadFile, File, Body, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from src.smartopt import analyze_source
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter, ValidationError
+from src.smartopt import (
+    ANALYSIS_MODES,
+    SOURCE_EXTENSIONS,
+    analyze_batch,
+    analyze_source,
+    collect_batch_sources,
+    iter_analysis,
+    warmup,
+)
+from src import telemetry
+from src.benchmark_runner import COMPILE_PIPELINES, FLAGS
+from src.cache import CACHE_ENABLED, get_cache
+from src.model_registry import COST_MODEL_PATH, model_info, model_version
+from src.profiler import profile_diff
+from src.workspace import Workspace, WorkspaceQuotaExceeded, quota_stats
+from backend.jobs import Job, JobManager, QueueFull
 import uvicorn
 from dotenv import load_dotenv
 load_dotenv()
 
-# ---------------------------------------------------
-# TEMPORARY: Hardcode your HF API key for testing
-# ---------------------------------------------------
-HF_API_KEY = os.getenv("HF_API_KEY")
-
-
-
-HF_MODEL_URL = "https://api-inference.huggingface.co/models/google/gemma-2b-it"
-
+# After load_dotenv(): reads HF_API_KEY / SMARTOPT_LLM_* at import
+from backend.llm import ExplanationClient  # noqa: E402
 
 # ---------------------------------------------------
 # 🔍 Language Detection
@@ -54,55 +71,41 @@ def detect_language_from_code(code: str) -> str:
 
 
 # ---------------------------------------------------
-# 🧠 Gemma LLM Explanation Wrapper
+# 🧠 Gemma LLM Explanations (pooled, cached, non-blocking)
 # ---------------------------------------------------
-def explain_results(best_flag, stats, language):
-    """
-    Calls Gemma-2B-IT to generate a 2–3 sentence explanation.
-    """
-
-    if HF_API_KEY is None:
-        return "⚠️ LLM explanation unavailable (HF_API_KEY not set)."
-
-    headers = {
-        "Authorization": f"Bearer {HF_API_KEY}",
-        "Content-Type": "application/json"
-    }
+llm = ExplanationClient()
 
-    prompt = f"""
-You are an expert compiler engineer. Explain why the optimization flag {best_flag} 
-performed best for the provided source code.
 
-Language detected: {language}
-
-Benchmark results:
-{stats}
+# ---------------------------------------------------
+# FastAPI App
+# ---------------------------------------------------
 
-Explain in 2–3 simple sentences so a beginner can understand.
-"""
+# Load the model and ML stack in the background once the server is up, so
+# /health answers immediately and the first analysis doesn't pay for it
+WARMUP = os.getenv("SMARTOPT_WARMUP", "1") != "0"
 
-    payload = {"inputs": prompt}
 
+def background_warmup():
     try:
-        response = requests.post(HF_MODEL_URL, headers=headers, json=payload, timeout=30)
-        out = response.json()
-
-        # HuggingFace returns: [{"generated_text": "..."}]
-        if isinstance(out, list) and "generated_text" in out[0]:
-            return out[0]["generated_text"]
-        else:
-            return "⚠️ Could not extract explanation from model."
+        warmup()
     except Exception as e:
-        return f"⚠️ LLM error: {e}"
+        print(f"⚠️ Warmup failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP:
+        threading.Thread(target=background_warmup, name="smartopt-warmup",
+                         daemon=True).start()
+    yield
+    llm.close()
 
 
-# ---------------------------------------------------
-# FastAPI App
-# ---------------------------------------------------
 app = FastAPI(
     title="SmartOpt Backend",
     description="AI-powered Compiler Optimization Advisor (C, C++, Rust)",
-    version="2.3.0"
+    version="2.3.0",
+    lifespan=lifespan,
 )
 
 # CORS for HuggingFace UI
@@ -115,6 +118,12 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(WorkspaceQuotaExceeded)
+async def workspace_full(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": "5"})
+
+
 # ---------------------------------------------------
 # Health Check
 # ---------------------------------------------------
@@ -124,31 +133,326 @@ def health_check():
 
 
 # ---------------------------------------------------
-# 📌 (1) Analyze Uploaded File
+# Loaded model info
 # ---------------------------------------------------
-@app.post("/analyze-file")
-async def analyze_file(file: UploadFile = File(...)):
-    content = await file.read()
+@app.get("/model")
+def model_status():
+    return model_info()
 
-    suffix = Path(file.filename).suffix or ".c"
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(content)
-        tmp_path = Path(tmp.name)
+# ---------------------------------------------------
+# ⚙️ Analysis worker pool
+# ---------------------------------------------------
+jobs = JobManager()
 
-    best_flag, stats = analyze_source(tmp_path)
+# ---------------------------------------------------
+# 📈 Prometheus metrics
+# ---------------------------------------------------
+# Stage histograms and failure counters are recorded by the engine; the
+# gauges below are only read when /metrics is scraped.
+METRICS_ENABLED = os.getenv("SMARTOPT_TELEMETRY", "1") != "0"
+telemetry.enable(METRICS_ENABLED)
+
+
+def cache_hit_ratios() -> dict:
+    ratios = {("coalesce",): jobs.stats()["coalesce_hit_rate"]}
+    if CACHE_ENABLED:
+        ratios[("analysis",)] = get_cache().stats()["hit_ratio"]
+    llm_stats = llm.stats()
+    lookups = llm_stats["hits"] + llm_stats["misses"]
+    ratios[("llm",)] = round(llm_stats["hits"] / lookups, 4) if lookups else 0.0
+    return ratios
+
+
+telemetry.Gauge("smartopt_queue_depth", "Analyses waiting for a worker.",
+                lambda: jobs.stats()["queued"])
+telemetry.Gauge("smartopt_jobs_running", "Analyses running on the worker pool.",
+                lambda: jobs.stats()["running"])
+telemetry.Gauge("smartopt_cache_hit_ratio",
+                "Hit ratio of the analysis cache, LLM cache and request coalescing.",
+                cache_hit_ratios, ("cache",))
+
+# "fast" benchmarks only the model's top-k flags (+ -O0); "full" runs all;
+# "cost" ranks with the cost model and benchmarks only when it is unsure
+DEFAULT_MODE = os.getenv("SMARTOPT_MODE", "fast")
+
+
+def run_analysis(src_path: Path, filename: str, language: str, progress=None,
+                 workspace: Workspace = None, **options):
+    """
+    Blocking analysis + explanation. Runs on the job pool, never on the
+    event loop. The explanation request starts as soon as the model has
+    predicted and runs while the flags are benchmarked.
+
+    The analysis builds into `workspace` (holding the uploaded source),
+    which is removed once the analysis is over.
+    """
+    pending = {}
+
+    def start_explanation(best_flag, ranked):
+        probabilities = {flag: round(p, 4) for flag, p in ranked}
+        pending["explanation"] = llm.explain(best_flag, probabilities, language)
+
+    try:
+        best_flag, stats = analyze_source(src_path, progress=progress,
+                                          on_predict=start_explanation,
+                                          workspace=workspace, **options)
+    finally:
+        if workspace:
+            workspace.close()
+
+    explanation = llm.wait(pending["explanation"])
 
-    explanation = explain_results(best_flag, stats, suffix)
+    return analysis_response(filename, language, best_flag, stats, explanation)
 
+
+def analysis_response(filename, language, best_flag, stats, explanation) -> dict:
     return {
-        "filename": file.filename,
-        "language": suffix,
+        "filename": filename,
+        "language": language,
         "best_flag": best_flag,
+        "model_version": model_version(),
         "flags": stats,
+        "verified_flags": [row["flag"] for row in stats if row.get("verified")],
+        "profile_diff": profile_diff(stats, best_flag),
         "explanation": explanation
     }
 
 
+def run_stream(src_path: Path, language: str, workspace: Workspace, emit,
+               cancelled: threading.Event, progress=None, **options):
+    """
+    Blocking streamed analysis on the job pool. Hands emit() (event, data)
+    pairs: "prediction" as soon as the model has run, one "flag" per row
+    as it completes, "explanation", then "done" with the same body as
+    /analyze-code. emit(None) ends the stream; once `cancelled` is set
+    (client gone) the remaining flags are skipped.
+    """
+    events = iter_analysis(src_path, workspace=workspace, **options)
+    explanation = None
+    done = 0
+    try:
+        for event in events:
+            if cancelled.is_set():
+                break
+            kind = event["event"]
+            if kind == "prediction":
+                probabilities = {flag: round(p, 4) for flag, p in event["ranked"]}
+                explanation = llm.explain(event["best_flag"], probabilities, language)
+                emit(("prediction", {"best_flag": event["best_flag"],
+                                     "probabilities": probabilities,
+                                     "verify": event["verify"],
+                                     "costs": event["costs"],
+                                     "model_version": model_version()}))
+            elif kind == "flag":
+                emit(("flag", event["row"]))
+                done += 1
+                if progress:
+                    progress(done, len(FLAGS), event["row"]["flag"])
+            else:
+                text = llm.wait(explanation)
+                emit(("explanation", {"explanation": text}))
+                emit(("done", analysis_response(src_path.name, language, event["best_flag"],
+                                                event["flags"], text)))
+    except Exception as e:
+        emit(("error", {"detail": str(e)}))
+        raise
+    finally:
+        events.close()
+        workspace.close()
+        emit(None)
+    return {"flags": done}
+
+
+def run_batch(src_paths: list, workspace: Workspace, emit, progress=None, **options):
+    """
+    Blocking batch analysis on the job pool. Each finished file is handed
+    to emit() as a response dict; emit(None) marks the end of the stream.
+    The explanation is skipped per file to keep batches cheap.
+    """
+    done = 0
+    try:
+        for item in analyze_batch(src_paths, **options):
+            src = Path(item["source"])
+            emit({
+                "filename": str(src.relative_to(workspace.path)),
+                "language": src.suffix,
+                "best_flag": item["best_flag"],
+                "model_version": model_version(),
+                "flags": item["flags"],
+                "verified_flags": [row["flag"] for row in item["flags"] if row.get("verified")],
+                "error": item["error"],
+            })
+            done += 1
+            if progress:
+                progress(done, len(src_paths), src.name)
+    except Exception as e:
+        emit({"error": str(e)})
+        raise
+    finally:
+        workspace.close()
+        emit(None)
+    return {"files": done}
+
+
+def submit_job(fn, *args, **options) -> Job:
+    if options.get("mode", "full") not in ANALYSIS_MODES:
+        raise HTTPException(status_code=422,
+                            detail=f"mode must be one of {list(ANALYSIS_MODES)}")
+    if options.get("pipeline", "source") not in COMPILE_PIPELINES:
+        raise HTTPException(status_code=422,
+                            detail=f"pipeline must be one of {list(COMPILE_PIPELINES)}")
+    if not 1 <= options.get("top_k", 2) <= len(FLAGS):
+        raise HTTPException(status_code=422,
+                            detail=f"top_k must be between 1 and {len(FLAGS)}")
+    if options.get("mode") == "cost" and not COST_MODEL_PATH.exists():
+        raise HTTPException(status_code=503,
+                            detail="No cost model trained; run python3 src/cost_model.py")
+    try:
+        return jobs.submit(fn, *args, **options)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+
+def source_key(content: bytes, language: str, options: dict) -> tuple:
+    """
+    What makes two analyses identical: the source with line endings and
+    trailing whitespace normalized, its language and the options.
+    """
+    lines = content.replace(b"\r\n", b"\n").split(b"\n")
+    normalized = b"\n".join(line.rstrip() for line in lines).strip(b"\n")
+    return hashlib.sha256(normalized).hexdigest(), language, tuple(sorted(options.items()))
+
+
+def submit_source(content: bytes, filename: str, language: str, **options) -> Job:
+    """
+    Analyze `content`, joining an identical analysis that is already queued
+    or running instead of starting (and writing a temp file for) another.
+    """
+    key = source_key(content, language, options)
+    job = jobs.join(key)
+    if job is None:
+        workspace = Workspace(prefix="request-")
+        try:
+            src_path = workspace.write(f"source{language}", content)
+            job = submit_job(run_analysis, src_path, filename or src_path.name, language,
+                             dedupe_key=key, workspace=workspace, **options)
+        except BaseException:
+            workspace.close()
+            raise
+    return job
+
+
+# Uploads /analyze-batch unpacks instead of treating as a single source
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# Most sources one archive may unpack to
+MAX_ARCHIVE_MEMBERS = int(os.getenv("SMARTOPT_MAX_ARCHIVE_MEMBERS", "10000"))
+
+
+def check_archive_size(sizes: list, max_bytes: int):
+    """413 before extracting when the members would not fit; sizes are uncompressed."""
+    if len(sizes) > MAX_ARCHIVE_MEMBERS:
+        raise HTTPException(status_code=413,
+                            detail=f"Archive has {len(sizes)} sources, "
+                                   f"at most {MAX_ARCHIVE_MEMBERS} are allowed")
+    if sum(sizes) > max_bytes:
+        raise HTTPException(status_code=413,
+                            detail=f"Archive unpacks to {sum(sizes)} bytes, "
+                                   f"only {max_bytes} are free in the workspace quota")
+
+
+def unpack_archive(content: bytes, filename: str, dest: Path, max_bytes: int):
+    """
+    Extract only C/C++/Rust sources; paths escaping dest are rejected.
+    Nothing is written when they would unpack to more than max_bytes or
+    MAX_ARCHIVE_MEMBERS files.
+    """
+    buf = io.BytesIO(content)
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(buf) as zf:
+            members = [m for m in zf.infolist()
+                       if not m.is_dir() and Path(m.filename).suffix in SOURCE_EXTENSIONS]
+            check_archive_size([m.file_size for m in members], max_bytes)
+            for member in members:
+                zf.extract(member, dest)
+    else:
+        with tarfile.open(fileobj=buf) as tf:
+            members = [m for m in tf.getmembers()
+                       if m.isfile() and Path(m.name).suffix in SOURCE_EXTENSIONS]
+            check_archive_size([m.size for m in members], max_bytes)
+            tf.extractall(dest, members=members, filter="data")
+
+
+def ndjson_stream(lines: queue.Queue):
+    while True:
+        item = lines.get()
+        if item is None:
+            return
+        yield json.dumps(item) + "\n"
+
+
+def sse_stream(events: queue.Queue, cancelled: threading.Event):
+    """Server-Sent Events from run_stream(); stops the analysis if the client leaves."""
+    try:
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            kind, data = item
+            yield f"event: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+    finally:
+        cancelled.set()
+
+
+# JSON body key -> (analysis option, type, default), as the query parameters
+CODE_OPTIONS = {
+    "cache": ("use_cache", bool, True),
+    "robust": ("robust", bool, False),
+    "mode": ("mode", str, DEFAULT_MODE),
+    "top_k": ("top_k", int, 2),
+    "pipeline": ("pipeline", str, "source"),
+    "profile": ("profile", bool, False),
+    "race": ("race", bool, False),
+}
+_option_types = {kind: TypeAdapter(kind) for kind in (bool, int, str)}
+
+
+def code_options(payload: dict) -> dict:
+    """
+    Analysis options from a JSON body, coerced the way FastAPI coerces
+    query parameters ("3" -> 3, "true" -> True); 422 for anything else.
+    """
+    options = {}
+    for key, (name, kind, default) in CODE_OPTIONS.items():
+        value = payload.get(key, default)
+        try:
+            options[name] = _option_types[kind].validate_python(value)
+        except ValidationError:
+            raise HTTPException(status_code=422,
+                                detail=f"{key} must be a {kind.__name__}, got {value!r}")
+    return options
+
+
+# ---------------------------------------------------
+# 📌 (1) Analyze Uploaded File
+# ---------------------------------------------------
+@app.post("/analyze-file")
+async def analyze_file(file: UploadFile = File(...), cache: bool = True,
+                       robust: bool = False, mode: str = DEFAULT_MODE, top_k: int = 2,
+                       pipeline: str = "source", profile: bool = False,
+                       race: bool = False):
+    content = await file.read()
+
+    suffix = Path(file.filename).suffix or ".c"
+    job = submit_source(content, file.filename, suffix,
+                        use_cache=cache, robust=robust, mode=mode, top_k=top_k,
+                        pipeline=pipeline, profile=profile, race=race)
+    result = await asyncio.wrap_future(job.future)
+    # A coalesced job may have been submitted under another file name
+    return {**result, "filename": file.filename}
+
+
 # ---------------------------------------------------
 # 📌 (2) Analyze Pasted Code (JSON)
 # ---------------------------------------------------
@@ -160,21 +464,134 @@ async def analyze_code(payload: dict = Body(...)):
     code = payload["code"]
 
     suffix = detect_language_from_code(code)
+    job = submit_source(code.encode(), None, suffix, **code_options(payload))
+    return await asyncio.wrap_future(job.future)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(code.encode())
-        tmp_path = Path(tmp.name)
 
-    best_flag, stats = analyze_source(tmp_path)
-    explanation = explain_results(best_flag, stats, suffix)
+@app.post("/analyze-code/stream")
+async def analyze_code_stream(payload: dict = Body(...)):
+    """
+    /analyze-code as Server-Sent Events: `prediction` right away, a `flag`
+    event per row as its compile/run finishes, `explanation`, then `done`
+    with the full /analyze-code response.
+    """
+    if "code" not in payload:
+        raise HTTPException(status_code=422, detail="Missing 'code' field in JSON body")
 
-    return {
-        "filename": tmp_path.name,
-        "language": suffix,
-        "best_flag": best_flag,
-        "flags": stats,
-        "explanation": explanation
-    }
+    suffix = detect_language_from_code(payload["code"])
+    workspace = Workspace(prefix="stream-")
+    events = queue.Queue()
+    cancelled = threading.Event()
+    try:
+        src_path = workspace.write(f"source{suffix}", payload["code"].encode())
+        submit_job(run_stream, src_path, suffix, workspace, events.put, cancelled,
+                   **code_options(payload))
+    except BaseException:
+        workspace.close()
+        raise
+    return StreamingResponse(sse_stream(events, cancelled), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ---------------------------------------------------
+# 📌 (3) Analyze many files or an archive, streamed as NDJSON
+# ---------------------------------------------------
+@app.post("/analyze-batch")
+async def analyze_batch_files(files: list[UploadFile] = File(...), cache: bool = True,
+                              robust: bool = False, mode: str = DEFAULT_MODE,
+                              top_k: int = 2, pipeline: str = "source",
+                              benchmark: bool = True):
+    workspace = Workspace(prefix="batch-upload-")
+    root = workspace.path
+    try:
+        for i, upload in enumerate(files):
+            content = await upload.read()
+            name = Path(upload.filename or f"source_{i}.c").name
+            if name.lower().endswith(ARCHIVE_SUFFIXES):
+                free = workspace.quota.limit - workspace.quota.used
+                unpack_archive(content, name, root / f"archive_{i}", free)
+                # Charge it now so the next archive sees what is left
+                for src in collect_batch_sources(root / f"archive_{i}"):
+                    workspace.track(src)
+                continue
+            if (root / name).exists():
+                name = f"{Path(name).stem}_{i}{Path(name).suffix}"
+            workspace.write(name, content)
+
+        sources = collect_batch_sources(root)
+        for src in sources:
+            workspace.track(src)
+        if not sources:
+            raise HTTPException(status_code=422,
+                                detail=f"No {'/'.join(SOURCE_EXTENSIONS)} sources in upload")
+
+        lines = queue.Queue()
+        submit_job(run_batch, sources, workspace, lines.put,
+                   use_cache=cache, robust=robust, mode=mode, top_k=top_k,
+                   pipeline=pipeline, benchmark=benchmark)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        workspace.close()
+        raise HTTPException(status_code=422, detail=f"Could not unpack archive: {e}")
+    except BaseException:
+        workspace.close()
+        raise
+    return StreamingResponse(ndjson_stream(lines), media_type="application/x-ndjson")
+
+
+# ---------------------------------------------------
+# 📌 (4) Async job API: submit, then poll /jobs/{id}
+# ---------------------------------------------------
+@app.post("/jobs/analyze-file", status_code=202)
+async def submit_file_job(file: UploadFile = File(...), cache: bool = True,
+                          robust: bool = False, mode: str = DEFAULT_MODE, top_k: int = 2,
+                          pipeline: str = "source", profile: bool = False,
+                          race: bool = False):
+    content = await file.read()
+
+    suffix = Path(file.filename).suffix or ".c"
+    job = submit_source(content, file.filename, suffix,
+                        use_cache=cache, robust=robust, mode=mode, top_k=top_k,
+                        pipeline=pipeline, profile=profile, race=race)
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+
+
+@app.post("/jobs/analyze-code", status_code=202)
+async def submit_code_job(payload: dict = Body(...)):
+    if "code" not in payload:
+        raise HTTPException(status_code=422, detail="Missing 'code' field in JSON body")
+
+    code = payload["code"]
+
+    suffix = detect_language_from_code(code)
+    job = submit_source(code.encode(), None, suffix, **code_options(payload))
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}
+
+
+@app.get("/jobs")
+def job_queue_stats():
+    return jobs.stats()
+
+
+@app.get("/stats")
+def service_stats():
+    """Job pool (incl. coalescing hit rate), LLM client and workspace usage."""
+    return {"jobs": jobs.stats(), "llm": llm.stats(), "workspace": quota_stats()}
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint (disable with SMARTOPT_TELEMETRY=0)."""
+    if not telemetry.enabled():
+        raise HTTPException(status_code=404, detail="Telemetry is disabled")
+    return PlainTextResponse(telemetry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
 
 
 # ---------------------------------------------------
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+forest_inference.py [--rows N] [--repeat N]
+
+Compares serving data/model.pkl through scikit-learn against the exported
+NumPy forest (data/model.npz): cold start (import + load + first predict,
+in a fresh interpreter), peak RSS of that interpreter, and per-row
+latency for single-row and batched predictions.
+
+Run src/forest_inference.py first if data/model.npz does not exist.
+
+Example:
+    python3 bench/forest_inference.py --rows 1000
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from src.forest_inference import FOREST_PATH, MODEL_PATH, NumpyForest  # noqa: E402
+
+COLD_START = {
+    "sklearn": "import joblib; model = joblib.load({path!r})",
+    "numpy": "from src.forest_inference import NumpyForest; model = NumpyForest.load({path!r})",
+}
+
+# VmHWM rather than ru_maxrss: the latter is inherited from the (large)
+# forking benchmark process across exec.
+COLD_SCRIPT = """
+import json, re, sys, time, warnings
+warnings.simplefilter("ignore")
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{load}
+import pandas as pd
+X = pd.DataFrame([[1.0] * len(model.feature_names_in_)], columns=model.feature_names_in_)
+model.predict(X)
+elapsed = time.perf_counter() - start
+hwm_kb = int(re.search(r"VmHWM:\\s+(\\d+)", open("/proc/self/status").read()).group(1))
+print(json.dumps({{"seconds": elapsed, "rss_mb": hwm_kb / 1024}}))
+"""
+
+
+def cold_start(engine: str, path: Path) -> dict:
+    script = COLD_SCRIPT.format(root=str(ROOT), load=COLD_START[engine].format(path=str(path)))
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True,
+                         text=True, check=True)
+    return json.loads(out.stdout.splitlines()[-1])
+
+
+def per_row_us(model, X: pd.DataFrame, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for i in range(repeat):
+        model.predict(X.iloc[[i % len(X)]])
+    single = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    model.predict(X)
+    batch = (time.perf_counter() - start) / len(X)
+    return single * 1e6, batch * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    if not FOREST_PATH.exists():
+        print("No data/model.npz; run src/forest_inference.py first.", file=sys.stderr)
+        return 1
+
+    import warnings
+    import joblib
+    warnings.simplefilter("ignore")
+    models = {"sklearn": joblib.load(MODEL_PATH), "numpy": NumpyForest.load(FOREST_PATH)}
+    paths = {"sklearn": MODEL_PATH, "numpy": FOREST_PATH}
+
+    forest = models["numpy"]
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(
+        rng.choice(forest.threshold[np.isfinite(forest.threshold)],
+                   size=(args.rows, forest.n_features_in_)),
+        columns=forest.feature_names_in_,
+    )
+    if not np.array_equal(models["sklearn"].predict(X), forest.predict(X)):
+        print("Prediction mismatch between sklearn and the NumPy forest", file=sys.stderr)
+        return 1
+
+    print(f"{'engine':<10}{'cold start':>12}{'peak RSS':>11}{'1-row µs':>11}"
+          f"{'batch µs/row':>14}")
+    for engine, model in models.items():
+        cold = cold_start(engine, paths[engine])
+        single, batch = per_row_us(model, X, args.repeat)
+        print(f"{engine:<10}{cold['seconds'] * 1000:>10.0f}ms{cold['rss_mb']:>9.0f}MB"
+              f"{single:>11.0f}{batch:>14.2f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
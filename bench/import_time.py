@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+import_time.py [module] [--repeat N] [--max-ms MS] [--forbid MOD ...]
+
+Measures what importing a module (default: backend.main) costs a cold
+interpreter, using `python -X importtime` in fresh processes. Prints the
+median cumulative import time and the slowest imports, and fails when
+the median exceeds --max-ms or a --forbid module (by default the heavy
+ML stack, which must load lazily) gets imported.
+
+Example:
+    python3 bench/import_time.py --max-ms 800
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["pandas", "sklearn", "joblib", "pyarrow", "numpy"]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def importtime(module: str) -> list:
+    """(self_us, cumulative_us, depth, name) per import, in -X importtime order."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append((int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return rows
+
+
+def direct_imports(rows: list, module: str) -> dict:
+    """Cumulative ms of each import made directly by `module`."""
+    end = max(i for i, (_, _, depth, name) in enumerate(rows)
+              if name == module and depth == 0)
+    children = {}
+    for _, cum, depth, name in reversed(rows[:end]):
+        if depth == 0:
+            break
+        if depth == 1:
+            children[name] = cum / 1000
+    return children
+
+
+def loaded_modules(module: str) -> set:
+    script = f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return set(json.loads(out.stdout.splitlines()[-1]))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("module", nargs="?", default="backend.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--forbid", nargs="*", default=HEAVY_MODULES)
+    args = parser.parse_args()
+
+    totals = []
+    slowest = {}
+    for _ in range(args.repeat):
+        rows = importtime(args.module)
+        totals.append(next(cum for _, cum, depth, name in reversed(rows)
+                           if name == args.module and depth == 0) / 1000)
+        for name, ms in direct_imports(rows, args.module).items():
+            slowest.setdefault(name, []).append(ms)
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.0f}ms "
+          f"(min {min(totals):.0f}ms, {args.repeat} runs)\n")
+    print(f"{'imported by ' + args.module:<40}{'cumulative ms':>14}")
+    ranked = sorted(slowest.items(), key=lambda kv: -statistics.median(kv[1]))
+    for name, times in ranked[:args.top]:
+        print(f"{name:<40}{statistics.median(times):>14.1f}")
+
+    failed = False
+    leaked = sorted(m for m in args.forbid if m in loaded_modules(args.module))
+    if leaked:
+        print(f"\n❌ {args.module} imports {', '.join(leaked)} eagerly", file=sys.stderr)
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"\n❌ Median import time {median:.0f}ms exceeds {args.max_ms:.0f}ms",
+              file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
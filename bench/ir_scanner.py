@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+ir_scanner.py [file.ll ...] [--size-mb N]
+
+Compares the streaming IR feature scanner against the regex reference
+implementation: throughput (MB/s) and peak Python memory (tracemalloc).
+
+Without arguments it benchmarks the .ll files in data/ir. Each input is
+repeated until it is at least --size-mb large, to mimic big C++/Rust IR.
+
+Example:
+    python3 bench/ir_scanner.py --size-mb 32
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.feature_extractor import (  # noqa: E402
+    IR_DIR,
+    extract_features_from_ir,
+    extract_features_regex,
+)
+
+
+def inflate(ir_file: Path, size_mb: float, out_dir: Path) -> Path:
+    text = ir_file.read_text()
+    target = int(size_mb * 1024 * 1024)
+    out = out_dir / ir_file.name
+    with open(out, "w") as f:
+        written = 0
+        while written < target:
+            f.write(text)
+            written += len(text)
+    return out
+
+
+def measure(fn, path: Path):
+    # Time and memory are measured in separate runs: tracemalloc slows
+    # allocation-heavy code down and would distort the MB/s figures.
+    start = time.perf_counter()
+    feats = fn(path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return feats, elapsed, peak
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("files", nargs="*", type=Path)
+    parser.add_argument("--size-mb", type=float, default=16.0)
+    args = parser.parse_args()
+
+    files = args.files or sorted(IR_DIR.glob("*.ll"))
+    if not files:
+        print("No .ll files found; run src/feature_extractor.py first.", file=sys.stderr)
+        return 1
+
+    print(f"{'file':<24}{'MB':>8}{'regex MB/s':>12}{'stream MB/s':>13}"
+          f"{'regex peak':>13}{'stream peak':>13}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for ir_file in files:
+            path = inflate(ir_file, args.size_mb, Path(tmp))
+            mb = path.stat().st_size / (1024 * 1024)
+
+            ref, t_ref, m_ref = measure(extract_features_regex, path)
+            got, t_new, m_new = measure(extract_features_from_ir, path)
+            if got != ref:
+                print(f"Feature mismatch for {ir_file}: {got} != {ref}", file=sys.stderr)
+                return 1
+
+            print(f"{ir_file.name:<24}{mb:>8.1f}{mb / t_ref:>12.1f}{mb / t_new:>13.1f}"
+                  f"{m_ref / 2**20:>11.1f}MB{m_new / 2**20:>11.1f}MB")
+            path.unlink()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
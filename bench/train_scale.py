@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+train_scale.py [--programs N] [--search-iter N] [--chunk-rows N]
+
+Runs the model_trainer pipeline on a synthetic corpus of N programs
+(features + five flag results each, written as Parquet parts to a
+temporary store) and reports wall time, peak RSS and the held-out
+accuracy/regret. Nothing under data/ is touched.
+
+Example:
+    python3 bench/train_scale.py --programs 100000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+PART_PROGRAMS = 10000
+
+# Run in a fresh interpreter so peak RSS covers only the training
+TRAIN_SCRIPT = """
+import json, re, sys, warnings
+warnings.simplefilter("ignore")
+sys.path.insert(0, {root!r})
+from src import model_trainer
+model, report = model_trainer.train(search_iter={search_iter}, chunk_rows={chunk_rows})
+out = model_trainer.save_artifacts(model, report, {models!r}, promote=False)
+hwm_kb = int(re.search(r"VmHWM:\\s+(\\d+)", open("/proc/self/status").read()).group(1))
+print(json.dumps({{"rss_mb": hwm_kb / 1024, "artifact": str(out), "report": report}}))
+"""
+
+
+def write_corpus(store: Path, programs: int, seed: int = 0):
+    """Synthetic features whose loop/function mix decides the best flag."""
+    from src.model_trainer import FEATURE_COLUMNS
+    from src.benchmark_runner import FLAGS
+
+    rng = np.random.default_rng(seed)
+    stamp = pd.Timestamp("2026-01-01", tz="UTC")
+    for start in range(0, programs, PART_PROGRAMS):
+        n = min(PART_PROGRAMS, programs - start)
+        files = [f"prog{i}" for i in range(start, start + n)]
+        feats = pd.DataFrame(rng.integers(0, 500, size=(n, len(FEATURE_COLUMNS))),
+                             columns=FEATURE_COLUMNS, dtype="float64")
+        feats.insert(0, "file", files)
+
+        loops = feats["loop_markers"].to_numpy() / 500
+        calls = feats["function_count"].to_numpy() / 500
+        base = 0.01 + feats["instruction_count"].to_numpy() / 1e4
+        speedup = {"-O0": 1.0, "-O1": 0.6, "-O2": 0.5 - 0.1 * loops,
+                   "-O3": 0.55 - 0.3 * loops, "-Os": 0.5 + 0.2 * loops - 0.1 * calls}
+        size = {"-O0": 1.0, "-O1": 0.9, "-O2": 0.9, "-O3": 1.1 + 0.2 * loops, "-Os": 0.7}
+        results = pd.concat([pd.DataFrame({
+            "file": files, "language": ".c", "flag": flag,
+            "compile_time": 0.1 + 0.05 * i + rng.random(n) * 0.01,
+            "runtime": base * speedup[flag] * rng.lognormal(0, 0.05, n),
+            "binary_size": (16000 * size[flag] * (1 + calls)).astype("int64"),
+            "status": "ok",
+        }) for i, flag in enumerate(FLAGS)], ignore_index=True)
+
+        for dataset, df in (("features", feats), ("results", results)):
+            df["timestamp"] = stamp + pd.Timedelta(seconds=start)
+            df["deleted"] = False
+            out = store / dataset
+            out.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(out / f"part-{start:09d}.parquet", index=False)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--programs", type=int, default=100000)
+    parser.add_argument("--search-iter", type=int, default=4)
+    parser.add_argument("--chunk-rows", type=int, default=65536)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="smartopt-train-") as tmp:
+        tmp = Path(tmp)
+        start = time.perf_counter()
+        write_corpus(tmp / "store", args.programs)
+        print(f"Wrote {args.programs} synthetic programs in {time.perf_counter() - start:.1f}s")
+
+        script = TRAIN_SCRIPT.format(root=str(ROOT), search_iter=args.search_iter,
+                                     chunk_rows=args.chunk_rows, models=str(tmp / "models"))
+        env = {**os.environ, "SMARTOPT_STORE_DIR": str(tmp / "store")}
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True,
+                             text=True)
+        elapsed = time.perf_counter() - start
+        if out.returncode != 0:
+            print(out.stderr, file=sys.stderr)
+            return 1
+        result = json.loads(out.stdout.splitlines()[-1])
+
+    report = result["report"]
+    test = report.get("test", {})
+    print(f"Trained on {report['programs']} programs in {elapsed:.1f}s, "
+          f"peak RSS {result['rss_mb']:.0f}MB")
+    print(f"Parameters: {report['params']} (CV accuracy {report['cv_accuracy']})")
+    print(f"Held-out accuracy {test.get('accuracy')}, mean regret {test.get('mean_regret')}, "
+          f"runtime slowdown {test.get('runtime_slowdown')}x")
+    best_static = min(report.get("static_flag_regret", {}).items(), key=lambda kv: kv[1],
+                      default=None)
+    if best_static:
+        print(f"Best single flag for every program: {best_static[0]} "
+              f"(mean regret {best_static[1]})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,17 +1,53 @@
+import argparse
+import math
 import os
+import shutil
+import statistics
 import subprocess
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-import pandas as pd
+
+try:
+    from . import telemetry
+except ImportError:  # run as a script: python3 src/benchmark_runner.py
+    import telemetry
 
 FLAGS = ["-O0", "-O1", "-O2", "-O3", "-Os"]
+BASELINE_FLAG = "-O0"
 
 ROOT = Path(__file__).resolve().parent.parent
 SRC_DIR = ROOT / "data" / "benchmarks"
 OUTPUT_CSV = ROOT / "data" / "results.csv"
 BIN_DIR = ROOT / "data" / "bin"
 
-BIN_DIR.mkdir(exist_ok=True)
+COMPILERS = {
+    ".c": "clang",
+    ".cpp": "clang++",
+    ".rs": "rustc",
+}
+
+# "source": every flag compiles from source; "ir": lower once, then opt/llc
+COMPILE_PIPELINES = ("source", "ir")
+
+# Extensions that can be built from shared IR with opt/llc + a link step.
+# Rust needs rustc to link its std, so it always builds from source.
+IR_PIPELINE_LINKERS = {
+    ".c": "clang",
+    ".cpp": "clang++",
+}
+
+# llc has no size level; -Os code generation uses -O2
+LLC_OPT_MAP = {
+    "-O0": "-O0",
+    "-O1": "-O1",
+    "-O2": "-O2",
+    "-O3": "-O3",
+    "-Os": "-O2",
+}
 
 RUST_OPT_MAP = {
     "-O0": "0",
@@ -22,114 +58,589 @@ RUST_OPT_MAP = {
 }
 
 
+# Collect rusage / hardware-counter columns for every run_flag() by default
+COLLECT_METRICS = os.getenv("SMARTOPT_METRICS", "0") == "1"
+
+# `perf stat` event -> result column
+PERF_EVENTS = {
+    "instructions": "instructions",
+    "cycles": "cycles",
+    "cache-misses": "cache_misses",
+    "branch-misses": "branch_misses",
+}
+
+# Every column collect_metrics() fills (None when unavailable)
+METRIC_COLUMNS = [
+    "peak_rss_kb", "user_time", "sys_time", "minor_faults", "major_faults",
+    *PERF_EVENTS.values(), "ipc",
+]
+
+
+# Seconds a single binary run may take
+RUN_TIMEOUT = 10
+
+# Racing (race_binaries): a run is killed as "dominated" once it takes
+# RACE_FACTOR x the fastest run so far, but never sooner than
+# RACE_MIN_TIMEOUT, so timer jitter on tiny programs cannot kill them.
+RACE_FACTOR = float(os.getenv("SMARTOPT_RACE_FACTOR", "3"))
+RACE_MIN_TIMEOUT = float(os.getenv("SMARTOPT_RACE_MIN_TIMEOUT", "0.5"))
+
+# Timed rounds per binary when racing with robust=True
+RACE_ROBUST_ROUNDS = 5
+
+
+# Two-sided 95% Student-t critical values, keyed by degrees of freedom
+T95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447,
+    7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131,
+    20: 2.086, 25: 2.060, 30: 2.042,
+}
+
+
 def run_command(command: list, timeout: int = 30):
-    start = time.time()
+    start = time.perf_counter()
     try:
         subprocess.run(command, check=True, stdout=subprocess.PIPE,
                        stderr=subprocess.PIPE, timeout=timeout)
-        return True, time.time() - start, ""
+        elapsed = time.perf_counter() - start
+        telemetry.STAGE_SECONDS.observe(elapsed, stage="compile")
+        return True, elapsed, ""
     except subprocess.TimeoutExpired:
+        telemetry.FAILURES.inc(stage="compile")
         return False, None, "TimeoutExpired"
     except subprocess.CalledProcessError as e:
+        telemetry.FAILURES.inc(stage="compile")
         return False, None, e.stderr.decode("utf-8", errors="ignore")
 
 
-def measure_runtime(binary_path: Path, timeout: int = 10):
-    start = time.time()
+def run_binary(binary_path: Path, timeout: float = RUN_TIMEOUT):
+    """
+    Run a binary once.
+
+    Returns (ok, elapsed, rusage, error). `elapsed` is taken from the
+    monotonic perf_counter clock and `rusage` is the child's own resource
+    usage from wait4(), so concurrent runs do not pollute each other.
+    """
+    with tempfile.TemporaryFile() as err_file:
+        start = time.perf_counter()
+        proc = subprocess.Popen([str(binary_path)], stdout=subprocess.DEVNULL,
+                                stderr=err_file)
+        timed_out = threading.Event()
+
+        def _kill():
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, _kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(proc.pid, 0)
+        finally:
+            timer.cancel()
+        elapsed = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        if timed_out.is_set():
+            telemetry.FAILURES.inc(stage="run")
+            return False, None, usage, "TimeoutExpired"
+        if proc.returncode != 0:
+            telemetry.FAILURES.inc(stage="run")
+            err_file.seek(0)
+            return False, None, usage, err_file.read().decode("utf-8", errors="ignore")
+
+    telemetry.STAGE_SECONDS.observe(elapsed, stage="run")
+    return True, elapsed, usage, ""
+
+
+def measure_runtime(binary_path: Path, timeout: float = RUN_TIMEOUT):
+    ok, elapsed, _, error = run_binary(binary_path, timeout)
+    return ok, elapsed, error
+
+
+def _t95(n: int) -> float:
+    df = n - 1
+    if df > max(T95):
+        return 1.96
+    return T95[max(k for k in T95 if k <= df)]
+
+
+def runtime_stats(samples: list) -> dict:
+    """Median, mean, stddev and 95% CI half-width of runtime samples."""
+    n = len(samples)
+    mean = statistics.fmean(samples)
+    stddev = statistics.stdev(samples) if n > 1 else 0.0
+    ci = _t95(n) * stddev / math.sqrt(n) if n > 1 else None
+    return {
+        "runtime": round(statistics.median(samples), 6),
+        "runtime_mean": round(mean, 6),
+        "runtime_stddev": round(stddev, 6),
+        "runtime_ci95": round(ci, 6) if ci is not None else None,
+        "runs": n,
+    }
+
+
+def measure_runtime_stats(binary_path: Path, timeout: float = RUN_TIMEOUT, warmup: int = 1,
+                          min_runs: int = 5, max_runs: int = 50,
+                          target_ci: float = 0.02, budget: float = 10.0):
+    """
+    Robust runtime measurement.
+
+    Does `warmup` untimed runs, then repeats the binary until the 95%
+    confidence interval half-width is within `target_ci` of the mean
+    (after at least `min_runs`), or `max_runs` / `budget` seconds is hit.
+
+    Returns (ok, stats, error) where stats has runtime (median),
+    runtime_mean, runtime_stddev, runtime_ci95, runs and cpu_time
+    (median child user+sys time).
+    """
+    for _ in range(warmup):
+        ok, _, _, error = run_binary(binary_path, timeout)
+        if not ok:
+            return False, None, error
+
+    samples = []
+    cpu = []
+    deadline = time.perf_counter() + budget
+    while True:
+        ok, elapsed, usage, error = run_binary(binary_path, timeout)
+        if not ok:
+            return False, None, error
+        samples.append(elapsed)
+        cpu.append(usage.ru_utime + usage.ru_stime)
+
+        n = len(samples)
+        if n >= max_runs or time.perf_counter() >= deadline:
+            break
+        if n >= min_runs:
+            stats = runtime_stats(samples)
+            if stats["runtime_ci95"] <= target_ci * stats["runtime_mean"]:
+                break
+
+    stats = runtime_stats(samples)
+    stats["cpu_time"] = round(statistics.median(cpu), 6)
+    return True, stats, ""
+
+
+def race_binaries(binaries: dict, best: float = None, factor: float = RACE_FACTOR,
+                  timeout: float = RUN_TIMEOUT, min_timeout: float = RACE_MIN_TIMEOUT,
+                  rounds: int = 1, warmup: int = 0) -> dict:
+    """
+    Time several binaries against each other, cutting slow ones short.
+
+    `binaries` maps a key (e.g. a flag) to a binary, in the order to run
+    them: likeliest winner first. Runs are interleaved round-robin
+    (`warmup` untimed rounds, then `rounds` timed ones), so drift hits
+    every candidate alike. Each run's timeout adapts to the fastest run
+    seen so far: `factor` x that, clamped to [min_timeout, timeout].
+    `best` seeds it with an already known runtime (e.g. from the cache).
+
+    A run killed by the adaptive limit makes its binary "dominated" and
+    drops it from the race; that is a result, not an error.
+
+    Returns {key: (status, stats)}: status "ok" with runtime stats (as
+    measure_runtime_stats when rounds > 1), "dominated" with
+    {"runtime_limit": seconds}, or "runtime_error: ..." with None.
+    """
+    samples = {key: [] for key in binaries}
+    cpu = {key: [] for key in binaries}
+    outcome = {}
+    alive = list(binaries)
+
+    for round_no in range(warmup + rounds):
+        for key in list(alive):
+            limit = timeout if best is None else min(timeout, max(min_timeout, factor * best))
+            ok, elapsed, usage, error = run_binary(binaries[key], limit)
+            if not ok:
+                alive.remove(key)
+                if error == "TimeoutExpired" and limit < timeout:
+                    outcome[key] = ("dominated", {"runtime_limit": round(limit, 6)})
+                else:
+                    outcome[key] = (f"runtime_error: {error}", None)
+                continue
+            best = elapsed if best is None else min(best, elapsed)
+            if round_no >= warmup:
+                samples[key].append(elapsed)
+                cpu[key].append(usage.ru_utime + usage.ru_stime)
+
+    for key in alive:
+        if rounds > 1:
+            stats = runtime_stats(samples[key])
+            stats["cpu_time"] = round(statistics.median(cpu[key]), 6)
+        else:
+            stats = {"runtime": round(samples[key][0], 5)}
+        outcome[key] = ("ok", stats)
+    return outcome
+
+
+def rusage_metrics(usage) -> dict:
+    """Peak RSS (KiB on Linux), user/sys seconds and page faults of one run."""
+    return {
+        "peak_rss_kb": usage.ru_maxrss,
+        "user_time": round(usage.ru_utime, 6),
+        "sys_time": round(usage.ru_stime, 6),
+        "minor_faults": usage.ru_minflt,
+        "major_faults": usage.ru_majflt,
+    }
+
+
+def _parse_perf_csv(text: str) -> dict:
+    """Counter values from `perf stat -x,` output; unsupported events are None."""
+    counts = {}
+    for line in text.splitlines():
+        fields = line.split(",")
+        if len(fields) < 3 or line.startswith("#"):
+            continue
+        event = fields[2].split(":")[0]
+        if event not in PERF_EVENTS:
+            continue
+        try:
+            counts[PERF_EVENTS[event]] = int(float(fields[0]))
+        except ValueError:  # "<not supported>" / "<not counted>"
+            counts[PERF_EVENTS[event]] = None
+    return counts
+
+
+@lru_cache(maxsize=None)
+def perf_available() -> bool:
+    """
+    True when `perf stat` exists and may count events here (it is missing
+    in most containers, and perf_event_paranoid can forbid it).
+    """
+    perf = shutil.which("perf")
+    if perf is None:
+        return False
     try:
-        subprocess.run([str(binary_path)], check=True,
-                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       timeout=timeout)
-        return True, time.time() - start, ""
-    except subprocess.TimeoutExpired:
-        return False, None, "TimeoutExpired"
-    except subprocess.CalledProcessError as e:
-        return False, None, e.stderr.decode("utf-8", errors="ignore")
+        out = subprocess.run([perf, "stat", "-x,", "-e", "instructions", "true"],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                             timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    counts = _parse_perf_csv(out.stderr.decode("utf-8", errors="ignore"))
+    return out.returncode == 0 and counts.get("instructions") is not None
+
+
+def perf_counters(binary_path: Path, timeout: float = RUN_TIMEOUT) -> dict:
+    """
+    Instructions, cycles, cache and branch misses of one run under
+    `perf stat`, plus IPC. Returns {} when perf is unavailable or fails.
+    """
+    if not perf_available():
+        return {}
+    with tempfile.NamedTemporaryFile(suffix=".perf") as out:
+        command = ["perf", "stat", "-x,", "-o", out.name,
+                   "-e", ",".join(PERF_EVENTS), str(binary_path)]
+        try:
+            proc = subprocess.run(command, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {}
+        if proc.returncode != 0:
+            return {}
+        counts = _parse_perf_csv(Path(out.name).read_text(errors="ignore"))
 
+    if counts.get("instructions") and counts.get("cycles"):
+        counts["ipc"] = round(counts["instructions"] / counts["cycles"], 4)
+    return counts
 
-def build_compile_command(src_file: Path, flag: str, bin_path: Path):
+
+def collect_metrics(binary_path: Path, timeout: float = RUN_TIMEOUT):
+    """
+    Resource metrics of one extra, untimed run of a binary.
+
+    Returns (ok, metrics, error); metrics has every METRIC_COLUMNS key.
+    rusage columns always come from wait4(); hardware counters need
+    `perf stat` and are None where it is not available. The counters run
+    separately so perf's overhead never touches the timed runs.
+    """
+    ok, _, usage, error = run_binary(binary_path, timeout)
+    if not ok:
+        return False, None, error
+
+    metrics = dict.fromkeys(METRIC_COLUMNS)
+    metrics.update(rusage_metrics(usage))
+    metrics.update(perf_counters(binary_path, timeout))
+    return True, metrics, ""
+
+
+@lru_cache(maxsize=None)
+def compiler_identity(ext: str) -> str:
+    """
+    First line of `<compiler> --version` for a source extension.
+    Used to key caches so a toolchain upgrade invalidates old entries.
+    """
+    compiler = COMPILERS.get(ext)
+    if compiler is None:
+        raise ValueError(f"Unsupported source extension: {ext}")
+    try:
+        out = subprocess.run([compiler, "--version"], stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, timeout=30)
+    except (FileNotFoundError, subprocess.TimeoutExpired):
+        return f"{compiler} (unavailable)"
+    lines = out.stdout.decode("utf-8", errors="ignore").strip().splitlines()
+    return lines[0] if lines else compiler
+
+
+def build_compile_command(src_file: Path, flag: str, bin_path: Path,
+                          extra_flags: tuple = ()):
+    """
+    Compiler command for one flag. `extra_flags` are passed through as-is
+    and must already be in the target compiler's syntax. Creates the
+    output directory if needed.
+    """
+    Path(bin_path).parent.mkdir(parents=True, exist_ok=True)
     ext = src_file.suffix
     if ext == ".c":
-        return ["clang", flag, str(src_file), "-o", str(bin_path)]
+        return ["clang", flag, *extra_flags, str(src_file), "-o", str(bin_path)]
     elif ext == ".cpp":
-        return ["clang++", flag, str(src_file), "-o", str(bin_path)]
+        return ["clang++", flag, *extra_flags, str(src_file), "-o", str(bin_path)]
     elif ext == ".rs":
         opt = RUST_OPT_MAP[flag]
         # rustc uses -C opt-level=<0|1|2|3|s|z>
-        return ["rustc", str(src_file), f"-Copt-level={opt}", "-o", str(bin_path)]
+        return ["rustc", str(src_file), f"-Copt-level={opt}", *extra_flags,
+                "-o", str(bin_path)]
     else:
         raise ValueError(f"Unsupported source extension: {ext}")
 
 
-def benchmark_file(src_file: Path):
-    results = []
-    base_name = src_file.stem
-    lang = src_file.suffix
+def build_ir_pipeline(ir_file: Path, src_file: Path, flag: str, bin_path: Path):
+    """
+    Commands that turn shared unoptimized IR into a binary for `flag`:
+    opt (middle end) → llc (code generation) → clang/clang++ (link only).
+    Returns (commands, intermediate files to clean up).
+    """
+    linker = IR_PIPELINE_LINKERS.get(src_file.suffix)
+    if linker is None:
+        raise ValueError(f"No IR pipeline for source extension: {src_file.suffix}")
 
-    for flag in FLAGS:
-        bin_name = f"{base_name}_{flag.replace('-', '')}"
-        bin_path = BIN_DIR / bin_name
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+    opt_bc = bin_path.with_name(bin_path.name + ".opt.bc")
+    obj = bin_path.with_name(bin_path.name + ".o")
+    commands = [
+        ["opt", flag, str(ir_file), "-o", str(opt_bc)],
+        ["llc", LLC_OPT_MAP[flag], "-filetype=obj", "-relocation-model=pic",
+         str(opt_bc), "-o", str(obj)],
+        [linker, str(obj), "-o", str(bin_path)],
+    ]
+    return commands, [opt_bc, obj]
+
+
+def _run_pipeline(commands: list, intermediates: list):
+    total = 0.0
+    try:
+        for cmd in commands:
+            ok, elapsed, error = run_command(cmd)
+            if not ok:
+                return False, None, error
+            total += elapsed
+        return True, total, ""
+    finally:
+        for path in intermediates:
+            path.unlink(missing_ok=True)
 
-        compile_cmd = build_compile_command(src_file, flag, bin_path)
 
-        # Compile
+def compile_flag(src_file: Path, flag: str, bin_path: Path, ir_file: Path = None):
+    """
+    Compile one (file, flag) pair.
+    Returns (ok, row) where row is the metrics dict for this flag.
+
+    If `ir_file` (from generate_ir(optimizable=True)) is given and the
+    language supports it, the binary is built from that shared IR instead
+    of re-running the front end; compile_time is then opt + llc + link.
+    """
+    if ir_file is not None and src_file.suffix in IR_PIPELINE_LINKERS:
+        commands, intermediates = build_ir_pipeline(ir_file, src_file, flag, bin_path)
+        ok, compile_time, error = _run_pipeline(commands, intermediates)
+    else:
+        compile_cmd = build_compile_command(src_file, flag, bin_path)
         ok, compile_time, error = run_command(compile_cmd)
-        if not ok:
-            results.append({
-                "file": base_name,
-                "language": lang,
-                "flag": flag,
-                "compile_time": None,
-                "runtime": None,
-                "binary_size": None,
-                "status": f"compile_error: {error}",
-            })
-            continue
+    if not ok:
+        return False, {
+            "flag": flag,
+            "compile_time": None,
+            "runtime": None,
+            "binary_size": None,
+            "status": f"compile_error: {error}",
+        }
+
+    return True, {
+        "flag": flag,
+        "compile_time": round(compile_time, 5),
+        "runtime": None,
+        "binary_size": bin_path.stat().st_size if bin_path.exists() else None,
+        "status": "compiled",
+    }
+
 
-        # Run
+def run_flag(row: dict, bin_path: Path, robust: bool = False,
+             metrics: bool = None) -> dict:
+    """
+    Run a compiled binary and fill in the runtime columns of its row.
+    With robust=True the binary is repeated (see measure_runtime_stats)
+    and the row also gets the mean/stddev/CI/cpu_time columns.
+    With metrics=True (default: SMARTOPT_METRICS) it also gets the
+    METRIC_COLUMNS from collect_metrics(); if that extra run fails they
+    stay None and the timing still counts.
+    """
+    if metrics is None:
+        metrics = COLLECT_METRICS
+    if robust:
+        ok, stats, error = measure_runtime_stats(bin_path)
+    else:
         ok, runtime, error = measure_runtime(bin_path)
-        if not ok:
-            results.append({
-                "file": base_name,
-                "language": lang,
-                "flag": flag,
-                "compile_time": round(compile_time, 5),
-                "runtime": None,
-                "binary_size": bin_path.stat().st_size if bin_path.exists() else None,
-                "status": f"runtime_error: {error}",
-            })
-            continue
+        stats = {"runtime": round(runtime, 5)} if ok else None
 
-        # Success
-        results.append({
-            "file": base_name,
-            "language": lang,
-            "flag": flag,
-            "compile_time": round(compile_time, 5),
-            "runtime": round(runtime, 5),
-            "binary_size": bin_path.stat().st_size,
-            "status": "ok",
-        })
+    if not ok:
+        row["status"] = f"runtime_error: {error}"
+        return row
+
+    row.update(stats)
+    if metrics:
+        ok, extra, _ = collect_metrics(bin_path)
+        row.update(extra if ok else dict.fromkeys(METRIC_COLUMNS))
+    row["status"] = "ok"
+    return row
+
+
+def benchmark_flag(src_file: Path, flag: str, bin_path: Path,
+                   robust: bool = False, ir_file: Path = None,
+                   metrics: bool = None) -> dict:
+    ok, row = compile_flag(src_file, flag, bin_path, ir_file=ir_file)
+    if not ok:
+        return row
+    return run_flag(row, bin_path, robust=robust, metrics=metrics)
+
+
+def _bin_path(src_file: Path, flag: str) -> Path:
+    return BIN_DIR / f"{src_file.stem}_{flag.replace('-', '')}"
+
+
+def _with_file(src_file: Path, row: dict) -> dict:
+    return {"file": src_file.stem, "language": src_file.suffix, **row}
+
+
+def shared_ir(src_file: Path, pipeline: str = "source"):
+    """
+    For pipeline="ir", lower `src_file` once to optimizable IR and return
+    the .ll path to build every flag from. Returns None when each flag
+    should compile from source (pipeline="source", Rust, or IR failure).
+    """
+    if pipeline not in COMPILE_PIPELINES:
+        raise ValueError(f"Unknown compile pipeline: {pipeline}")
+    if pipeline == "source" or src_file.suffix not in IR_PIPELINE_LINKERS:
+        return None
+
+    try:
+        from .feature_extractor import generate_ir
+    except ImportError:  # run as a script: python3 src/benchmark_runner.py
+        from feature_extractor import generate_ir
+
+    try:
+        return generate_ir(src_file, optimizable=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def benchmark_file(src_file: Path, robust: bool = False, pipeline: str = "source",
+                   metrics: bool = None):
+    results = []
+    ir_file = shared_ir(src_file, pipeline)
+
+    for flag in FLAGS:
+        row = benchmark_flag(src_file, flag, _bin_path(src_file, flag),
+                             robust=robust, ir_file=ir_file, metrics=metrics)
+        results.append(_with_file(src_file, row))
 
     return results
 
 
-def main():
-    print("Running SmartOpt Benchmark Runner...\n")
+def benchmark_files(src_files: list, jobs: int = 1, run_jobs: int = 1,
+                    robust: bool = False, pipeline: str = "source",
+                    metrics: bool = None):
+    """
+    Benchmark many files in parallel.
+
+    Compiles for every (file, flag) pair are scheduled on a pool of `jobs`
+    workers. Binaries are only run once every compile has finished, through
+    a separate lane of `run_jobs` workers (default 1), so timings are not
+    skewed by concurrent compiles. Rows come back in (file, FLAGS) order.
+    """
+    tasks = [(src, flag) for src in src_files for flag in FLAGS]
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        ir_files = dict(zip(src_files, pool.map(
+            lambda src: shared_ir(src, pipeline), src_files
+        )))
+        compiled = list(pool.map(
+            lambda t: compile_flag(t[0], t[1], _bin_path(t[0], t[1]),
+                                   ir_file=ir_files[t[0]]),
+            tasks,
+        ))
+
+    rows = [row for _, row in compiled]
+    runnable = [i for i, (ok, _) in enumerate(compiled) if ok]
 
-    all_results = []
+    with ThreadPoolExecutor(max_workers=max(1, run_jobs)) as lane:
+        list(lane.map(
+            lambda i: run_flag(rows[i], _bin_path(*tasks[i]), robust=robust,
+                               metrics=metrics),
+            runnable,
+        ))
 
+    return [_with_file(src, row) for (src, _), row in zip(tasks, rows)]
+
+
+def collect_sources(src_dir: Path = SRC_DIR) -> list:
+    sources = []
     for ext in ("*.c", "*.cpp", "*.rs"):
-        for src in SRC_DIR.glob(ext):
+        sources.extend(sorted(src_dir.glob(ext)))
+    return sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartOpt Benchmark Runner")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of parallel compile workers")
+    parser.add_argument("--run-jobs", type=int, default=1,
+                        help="Number of binaries measured concurrently")
+    parser.add_argument("--robust", action="store_true",
+                        help="Warm up and repeat each run until the 95%% CI is tight")
+    parser.add_argument("--ir-pipeline", action="store_true",
+                        help="Run the C/C++ front end once and build each flag with opt/llc")
+    parser.add_argument("--metrics", action="store_true", default=None,
+                        help="Also record peak RSS, page faults and (with perf) hardware counters")
+    parser.add_argument("--csv", action="store_true",
+                        help="Also export the latest results to data/results.csv")
+    args = parser.parse_args(argv)
+
+    try:
+        from . import result_store
+    except ImportError:  # run as a script: python3 src/benchmark_runner.py
+        import result_store
+
+    print("Running SmartOpt Benchmark Runner...\n")
+
+    sources = collect_sources()
+    pipeline = "ir" if args.ir_pipeline else "source"
+
+    if args.jobs > 1:
+        print(f"Benchmarking {len(sources)} files with {args.jobs} compile workers")
+        all_results = benchmark_files(sources, jobs=args.jobs,
+                                      run_jobs=args.run_jobs, robust=args.robust,
+                                      pipeline=pipeline, metrics=args.metrics)
+    else:
+        all_results = []
+        for src in sources:
             print(f"Benchmarking {src.name}")
-            file_results = benchmark_file(src)
-            all_results.extend(file_results)
+            all_results.extend(benchmark_file(src, robust=args.robust, pipeline=pipeline,
+                                              metrics=args.metrics))
 
-    df = pd.DataFrame(all_results)
-    df.to_csv(OUTPUT_CSV, index=False)
+    part = result_store.append("results", all_results, compiler_version=compiler_identity)
 
     print(f"\n✅ Benchmarking completed!")
-    print(f"📄 Results saved to: {OUTPUT_CSV}")
+    print(f"🗄️ Results appended to: {part}")
+    if args.csv:
+        result_store.export_csv("results", OUTPUT_CSV)
+        print(f"📄 Results exported to: {OUTPUT_CSV}")
     print(f"📦 Binaries stored in: {BIN_DIR}")
 
 
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Outside the source tree by default: ~/.cache/smartopt (or $XDG_CACHE_HOME)
+XDG_CACHE_HOME = Path(os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache")
+CACHE_DIR = Path(os.getenv("SMARTOPT_CACHE_DIR", XDG_CACHE_HOME / "smartopt"))
+
+# Total bytes (json entries + cached binaries) kept before LRU eviction
+DEFAULT_MAX_BYTES = int(os.getenv("SMARTOPT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# SMARTOPT_CACHE=0 disables the cache for the whole process
+CACHE_ENABLED = os.getenv("SMARTOPT_CACHE", "1") != "0"
+
+# Eviction frees down to this share of max_bytes, so a full cache is not
+# rescanned on every put
+EVICT_TO = 0.9
+
+# A .tmp file this old belongs to a writer that crashed mid-put
+STALE_TMP_SECONDS = 3600
+
+
+def source_digest(src_path: Path) -> str:
+    """sha256 of the raw source bytes."""
+    return hashlib.sha256(Path(src_path).read_bytes()).hexdigest()
+
+
+def cache_key(*parts) -> str:
+    """Content address for an entry built from its identifying parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class AnalysisCache:
+    """
+    Persistent content-addressed cache for analyze_source().
+
+    Each entry is `<key>.json`, optionally with a `<key>.bin` binary next to
+    it. Reads touch the entry's mtime so eviction drops the least recently
+    used entries once the directory grows past `max_bytes`. The total size
+    is kept in memory; the directory is only scanned on the first put and
+    whenever that total goes over `max_bytes`.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = None  # unknown until the first scan
+        self._lock = threading.Lock()
+
+    def _json_path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def binary_path(self, key: str) -> Path:
+        return self.root / f"{key}.bin"
+
+    def get(self, key: str):
+        path = self._json_path(key)
+        try:
+            value = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # evicted since the read
+            pass
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: dict, binary: Path = None):
+        self.root.mkdir(parents=True, exist_ok=True)
+        added = 0
+
+        if binary is not None and Path(binary).exists():
+            tmp_bin = self._tmp_path()
+            shutil.copyfile(binary, tmp_bin)
+            added += _size(tmp_bin) - _size(self.binary_path(key))
+            os.replace(tmp_bin, self.binary_path(key))
+
+        # Write json last: an entry only exists once it is complete
+        tmp = self._tmp_path()
+        tmp.write_text(json.dumps(value))
+        added += _size(tmp) - _size(self._json_path(key))
+        os.replace(tmp, self._json_path(key))
+
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += added
+            scan = self._bytes is None or self._bytes > self.max_bytes
+        if scan:
+            self.evict()
+
+    def _tmp_path(self) -> Path:
+        # Unique per call: threads may put the same key at once
+        fd, name = tempfile.mkstemp(suffix=".tmp", dir=self.root)
+        os.close(fd)
+        return Path(name)
+
+    def restore_binary(self, key: str, dest: Path) -> bool:
+        """Copy a cached binary back to `dest`. Returns False if none is cached."""
+        try:
+            shutil.copyfile(self.binary_path(key), dest)
+        except FileNotFoundError:  # never cached, or evicted meanwhile
+            return False
+        os.chmod(dest, 0o755)
+        return True
+
+    def evict(self):
+        """
+        Rescan the directory: remove .tmp files left behind by crashed
+        writers, recount the total and, once it is over max_bytes, drop
+        least recently used entries until it is back under EVICT_TO of it.
+        """
+        stale = time.time() - STALE_TMP_SECONDS
+        for path in self.root.glob("*.tmp"):
+            try:
+                if path.stat().st_mtime < stale:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+        entries = []
+        total = 0
+        for path in self.root.glob("*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            size = st.st_size
+            try:
+                size += self.binary_path(path.stem).stat().st_size
+            except FileNotFoundError:
+                pass
+            entries.append((st.st_mtime, path, size))
+            total += size
+
+        if total > self.max_bytes:
+            for _, path, size in sorted(entries, key=lambda e: e[0]):
+                path.unlink(missing_ok=True)
+                self.binary_path(path.stem).unlink(missing_ok=True)
+                total -= size
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+
+        with self._lock:
+            self._bytes = total
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        with self._lock:
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache = None
+
+
+def get_cache() -> AnalysisCache:
+    """Process-wide cache instance."""
+    global _cache
+    if _cache is None:
+        _cache = AnalysisCache(CACHE_DIR)
+    return _cache
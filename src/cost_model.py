@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+try:
+    from . import model_trainer
+    from .benchmark_runner import FLAGS
+    from .ir_analysis import STRUCTURAL_FEATURES
+    from .model_registry import COST_MODEL_PATH, ModelRegistry
+except ImportError:  # run as a script: python3 src/cost_model.py
+    import model_trainer
+    from benchmark_runner import FLAGS
+    from ir_analysis import STRUCTURAL_FEATURES
+    from model_registry import COST_MODEL_PATH, ModelRegistry
+
+# Predicted per (program, flag), in log space so relative errors count
+TARGETS = ("runtime", "binary_size", "compile_time")
+LOG_FLOOR = 1e-6
+
+# Share of trees that must agree on the fastest flag before analyses in
+# "cost" mode trust the prediction and skip benchmarking
+COST_CONFIDENCE = float(os.getenv("SMARTOPT_COST_CONFIDENCE", "0.8"))
+
+COST_TREES = 100
+
+
+def design_matrix(X: np.ndarray, n_flags: int) -> np.ndarray:
+    """One row per (program, flag): the program's features plus a one-hot flag."""
+    n = len(X)
+    return np.hstack([np.repeat(X, n_flags, axis=0),
+                      np.tile(np.eye(n_flags, dtype=np.float32), (n, 1))]).astype(np.float32)
+
+
+def _fit(X: np.ndarray, metrics: np.ndarray, n_estimators: int, n_jobs: int):
+    y = metrics.reshape(-1, len(TARGETS))
+    measured = np.isfinite(y).all(axis=1)
+    rows = design_matrix(X, metrics.shape[1])[measured]
+    y = np.log(np.maximum(y[measured], LOG_FLOOR))
+    cap = model_trainer.TREE_SAMPLES
+    model = RandomForestRegressor(n_estimators=n_estimators, min_samples_leaf=2,
+                                  max_samples=cap if len(rows) > cap else None,
+                                  random_state=42, n_jobs=n_jobs)
+    model.fit(rows, y)
+    # Serving predicts one program at a time; don't fan that out over threads
+    model.set_params(n_jobs=None)
+    return model
+
+
+def _tree_predictions(artifact: dict, X: np.ndarray) -> np.ndarray:
+    """Log-space predictions of every tree, shaped (trees, programs, flags, targets)."""
+    model = artifact["model"]
+    n_flags = len(artifact["flags"])
+    rows = design_matrix(np.asarray(X, dtype=np.float32), n_flags)
+    preds = np.stack([tree.predict(rows) for tree in model.estimators_])
+    return preds.reshape(len(model.estimators_), len(X), n_flags, len(TARGETS))
+
+
+def predict_many(artifact: dict, feats: list) -> list:
+    """
+    Predicted costs of every flag for each feature dict in `feats`, from
+    one pass over the forest. Each program gets a list of
+        {"flag", "predicted_runtime", "predicted_binary_size",
+         "predicted_compile_time", "runtime_uncertainty", "probability"}
+    sorted fastest first. runtime_uncertainty is the spread of the trees'
+    log runtimes (roughly a relative standard deviation); probability is
+    the share of trees that rank that flag fastest.
+    """
+    X = np.array([[float(f[col]) for col in artifact["feature_columns"]] for f in feats],
+                 dtype=np.float32)
+    trees = _tree_predictions(artifact, X)
+    predicted = np.exp(trees.mean(axis=0))
+    spread = trees[..., 0].std(axis=0)
+    wins = trees[..., 0].argmin(axis=2)
+    votes = (wins[..., None] == np.arange(len(artifact["flags"]))).mean(axis=0)
+
+    out = []
+    for p in range(len(X)):
+        costs = [{
+            "flag": flag,
+            "predicted_runtime": round(float(predicted[p, i, 0]), 6),
+            "predicted_binary_size": int(round(float(predicted[p, i, 1]))),
+            "predicted_compile_time": round(float(predicted[p, i, 2]), 5),
+            "runtime_uncertainty": round(float(spread[p, i]), 4),
+            "probability": round(float(votes[p, i]), 4),
+        } for i, flag in enumerate(artifact["flags"])]
+        out.append(sorted(costs, key=lambda c: c["predicted_runtime"]))
+    return out
+
+
+def predict_costs(artifact: dict, feats: dict) -> list:
+    """predict_many() for a single program."""
+    return predict_many(artifact, [feats])[0]
+
+
+def confident(costs: list, threshold: float = COST_CONFIDENCE) -> bool:
+    """True when enough trees agree the predicted fastest flag is fastest."""
+    return bool(costs) and costs[0]["probability"] >= threshold
+
+
+def flags_to_benchmark(costs: list, top_k: int, threshold: float = COST_CONFIDENCE) -> list:
+    """
+    Flags worth measuring, in FLAGS order: none when the prediction is
+    confident, else the top_k predicted fastest.
+    """
+    if confident(costs, threshold):
+        return []
+    chosen = {c["flag"] for c in costs[:top_k]}
+    return [flag for flag in FLAGS if flag in chosen]
+
+
+def evaluate(artifact: dict, X: np.ndarray, metrics: np.ndarray,
+             threshold: float = COST_CONFIDENCE) -> dict:
+    """
+    Held-out quality: median relative error per target, and how often the
+    predicted fastest flag is the measured fastest (overall and among
+    the predictions confident enough to skip benchmarking).
+    """
+    trees = _tree_predictions(artifact, X)
+    predicted = np.exp(trees.mean(axis=0))
+    errors = {}
+    for i, target in enumerate(TARGETS):
+        actual = metrics[:, :, i]
+        ok = np.isfinite(actual) & (actual > 0)
+        rel = np.abs(predicted[:, :, i][ok] - actual[ok]) / actual[ok]
+        errors[target] = round(float(np.median(rel)), 4) if len(rel) else None
+
+    runtimes = metrics[:, :, TARGETS.index("runtime")]
+    timed = np.isfinite(runtimes).any(axis=1)
+    best = predicted[timed, :, 0].argmin(axis=1)
+    report = {"median_relative_error": errors,
+              **model_trainer.regret_report(runtimes[timed], runtimes[timed], best)}
+
+    wins = trees[..., 0][:, timed].argmin(axis=2)
+    share = (wins == best).mean(axis=0)
+    sure = share >= threshold
+    correct = best == np.nanargmin(runtimes[timed], axis=1)
+    report["confident_share"] = round(float(sure.mean()), 4) if len(sure) else None
+    report["confident_accuracy"] = round(float(correct[sure].mean()), 4) if sure.any() else None
+    return report
+
+
+def train(feature_columns=model_trainer.FEATURE_COLUMNS, chunk_rows=model_trainer.CHUNK_ROWS,
+          test_size=model_trainer.TEST_SIZE, n_estimators=COST_TREES, n_jobs=-1):
+    """
+    Fit the cost model on every measured (program, flag) pair of the
+    benchmark corpus, streamed like the flag classifier's. With enough
+    programs a held-out split is evaluated first. Returns (artifact,
+    report); the artifact is a plain dict so it unpickles without this
+    module's classes.
+    """
+    feature_columns = list(feature_columns)
+    files, X, metrics = model_trainer.stream_corpus(feature_columns, TARGETS, chunk_rows)
+    keep = np.isfinite(metrics).all(axis=2).any(axis=1)
+    X, metrics = X[keep], metrics[keep]
+    if not len(X):
+        raise SystemExit("❌ No program has features and complete benchmark results")
+
+    def artifact_for(model):
+        return {"model": model, "feature_columns": feature_columns,
+                "flags": list(FLAGS), "targets": list(TARGETS)}
+
+    report = {
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "programs": int(len(X)),
+        "pairs": int(np.isfinite(metrics).all(axis=2).sum()),
+        "feature_columns": feature_columns,
+    }
+    if len(X) >= model_trainer.MIN_PROGRAMS_TO_VALIDATE:
+        train_idx, test_idx = train_test_split(np.arange(len(X)), test_size=test_size,
+                                               random_state=42)
+        held_out = artifact_for(_fit(X[train_idx], metrics[train_idx], n_estimators, n_jobs))
+        report["test"] = evaluate(held_out, X[test_idx], metrics[test_idx])
+
+    return artifact_for(_fit(X, metrics, n_estimators, n_jobs)), report
+
+
+def save(artifact: dict, report: dict, path: Path = COST_MODEL_PATH) -> Path:
+    """Atomically replace the served cost model; the report goes next to it as .json."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    joblib.dump(artifact, tmp)
+    os.replace(tmp, path)
+    path.with_suffix(".json").write_text(json.dumps(report, indent=2) + "\n")
+    return path
+
+
+_registry = ModelRegistry(COST_MODEL_PATH, prefer_compiled=False)
+
+
+def get_cost_model() -> dict:
+    """The resident cost model, reloaded when data/cost_model.pkl changes."""
+    try:
+        return _registry.get()
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"No cost model at {COST_MODEL_PATH}; train one with python3 src/cost_model.py")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Train the runtime/size/compile-time cost model")
+    parser.add_argument("--structural", action="store_true",
+                        help="also train on the structural IR features (ir_analysis)")
+    parser.add_argument("--trees", type=int, default=COST_TREES)
+    parser.add_argument("--chunk-rows", type=int, default=model_trainer.CHUNK_ROWS,
+                        help="raw result/feature rows read at a time")
+    parser.add_argument("--jobs", "-j", type=int, default=-1,
+                        help="cores for training (default: all)")
+    parser.add_argument("--output", type=Path, default=COST_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    feature_columns = model_trainer.FEATURE_COLUMNS
+    if args.structural:
+        feature_columns = model_trainer.FEATURE_COLUMNS + STRUCTURAL_FEATURES
+
+    print("🔍 Streaming corpus and training the cost model...")
+    artifact, report = train(feature_columns, chunk_rows=args.chunk_rows,
+                             n_estimators=args.trees, n_jobs=args.jobs)
+    path = save(artifact, report, args.output)
+
+    print(f"\n🎉 Cost model saved to: {path}")
+    print(f"➡️ {report['programs']} programs, "
+          f"{report['pairs']} measured (program, flag) pairs")
+    if "test" in report:
+        test = report["test"]
+        print(f"📊 Median relative error: {test['median_relative_error']}")
+        print(f"📊 Fastest flag predicted for {test['accuracy']:.0%} of held-out programs "
+              f"(runtime slowdown vs oracle {test['runtime_slowdown']}x)")
+        print(f"📊 Confident (skips benchmarking) for {test['confident_share']} of them, "
+              f"right {test['confident_accuracy']} of the time")
+
+
+if __name__ == "__main__":
+    main()
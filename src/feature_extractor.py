@@ -1,15 +1,26 @@
+import argparse
+import json
 import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import pandas as pd
 import re
 
+try:
+    from .benchmark_runner import compiler_identity
+    from .cache import source_digest
+except ImportError:  # run as a script: python3 src/feature_extractor.py
+    from benchmark_runner import compiler_identity
+    from cache import source_digest
+
 ROOT = Path(__file__).resolve().parent.parent
 SRC_DIR = ROOT / "data" / "benchmarks"
 IR_DIR = ROOT / "data" / "ir"
 OUTPUT_CSV = ROOT / "data" / "features.csv"
+MANIFEST_PATH = ROOT / "data" / "features_manifest.json"
 
-IR_DIR.mkdir(exist_ok=True)
+# Bump whenever extraction logic changes so --incremental redoes every file
+FEATURE_EXTRACTOR_VERSION = "3"
 
 FEATURES = [
     "instruction_count",
@@ -24,18 +35,25 @@ FEATURES = [
 ]
 
 
-def generate_ir(src_file: Path) -> Path:
+def generate_ir(src_file: Path, optimizable: bool = False, out_dir: Path = None) -> Path:
     """
-    Generate LLVM IR for C / C++ / Rust source file.
-    Returns path to the .ll file.
+    Generate LLVM IR for C / C++ / Rust source file into `out_dir`
+    (default: data/ir). Returns path to the .ll file.
+
+    With optimizable=True, C/C++ IR is emitted without the `optnone`
+    attribute clang puts on -O0 functions, so the same file can be fed to
+    `opt`/`llc` for every flag (see benchmark_runner.compile_flag).
     """
     src_file = Path(src_file)
-    ll_file = IR_DIR / (src_file.stem + ".ll")
+    out_dir = Path(out_dir or IR_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ll_file = out_dir / (src_file.stem + ".ll")
+    keep_optimizable = ["-Xclang", "-disable-O0-optnone"] if optimizable else []
 
     if src_file.suffix == ".c":
-        cmd = ["clang", "-O0", "-emit-llvm", "-S", str(src_file), "-o", str(ll_file)]
+        cmd = ["clang", "-O0", *keep_optimizable, "-emit-llvm", "-S", str(src_file), "-o", str(ll_file)]
     elif src_file.suffix == ".cpp":
-        cmd = ["clang++", "-O0", "-emit-llvm", "-S", str(src_file), "-o", str(ll_file)]
+        cmd = ["clang++", "-O0", *keep_optimizable, "-emit-llvm", "-S", str(src_file), "-o", str(ll_file)]
     elif src_file.suffix == ".rs":
         # rustc outputs <name>.ll by default when using --emit=llvm-ir
         cmd = ["rustc", str(src_file), "--emit=llvm-ir", "-o", str(ll_file)]
@@ -46,8 +64,78 @@ def generate_ir(src_file: Path) -> Path:
     return ll_file
 
 
+# Instruction-like words; needs whitespace on both sides, so it is counted
+# separately from the token pattern below.
+_INSN_RE = re.compile(r"\s[a-zA-Z]+\s")
+
+# All other categories in a single alternation. Each branch matches text the
+# others cannot, so one pass gives the same counts as separate findall()s.
+# The leading lookahead lets the engine skip positions that cannot start
+# any token without trying every branch.
+_TOKEN_RE = re.compile(
+    r"(?=[lsadmbif])(?:"
+    r"\b(?:load|store|add|mul|sub|div|br|define|label)\b"
+    r"|\bicmp|fcmp\b"
+    r"|llvm.loop"
+    r")"
+)
+
+_TOKEN_FEATURE = {
+    "load": "load_count",
+    "store": "store_count",
+    "add": "arith_count",
+    "mul": "arith_count",
+    "sub": "arith_count",
+    "div": "arith_count",
+    "br": "branch_count",
+    "icmp": "cmp_count",
+    "fcmp": "cmp_count",
+    "define": "function_count",
+    "label": "basic_blocks",
+}
+
+# Lines are read in batches of roughly this many bytes
+SCAN_CHUNK_BYTES = 1 << 20
+
+
 def extract_features_from_ir(ir_file: Path) -> dict:
-    """Parse LLVM IR and extract features."""
+    """
+    Parse LLVM IR and extract features.
+
+    Streams the file in line-aligned chunks so memory stays bounded, and
+    counts every category in one tokenizer pass per chunk.
+    """
+    features = dict.fromkeys(FEATURES, 0)
+    carry = ""
+
+    with open(ir_file) as f:
+        while True:
+            lines = f.readlines(SCAN_CHUNK_BYTES)
+            if not lines:
+                break
+            chunk = "".join(lines)
+
+            # A match may start on the newline that ended the previous chunk,
+            # unless the previous chunk's last match already consumed it.
+            text = carry + chunk
+            end = -1
+            for m in _INSN_RE.finditer(text):
+                features["instruction_count"] += 1
+                end = m.end()
+            carry = "\n" if text.endswith("\n") and end != len(text) else ""
+
+            for token in _TOKEN_RE.findall(chunk):
+                name = _TOKEN_FEATURE.get(token, "loop_markers")
+                features[name] += 1
+
+    return features
+
+
+def extract_features_regex(ir_file: Path) -> dict:
+    """
+    Reference implementation of extract_features_from_ir(): one findall per
+    feature over the whole file. Kept for equivalence tests and benchmarks.
+    """
     text = Path(ir_file).read_text()
 
     features = {
@@ -64,35 +152,131 @@ def extract_features_from_ir(ir_file: Path) -> dict:
     return features
 
 
-def extract_features(ll_path: Path) -> pd.DataFrame:
+def extract_all_features(ir_file: Path, structural: bool = True) -> dict:
+    """
+    Legacy FEATURES (what the shipped model was trained on) plus, unless
+    structural=False, the structural STRUCTURAL_FEATURES from ir_analysis.
+    """
+    feats = extract_features_from_ir(ir_file)
+    if not structural:
+        return feats
+
+    # numpy is only needed once IR is actually analyzed
+    try:
+        from .ir_analysis import structural_features
+    except ImportError:  # run as a script
+        from ir_analysis import structural_features
+
+    feats.update(structural_features(ir_file))
+    return feats
+
+
+def extract_features(ll_path: Path):
     """
     Wrapper used by SmartOpt CLI.
     Takes .ll file path and returns a 1-row DataFrame.
     """
+    import pandas as pd
+
     feats = extract_features_from_ir(ll_path)
     df = pd.DataFrame([feats])
     return df
 
 
-def main():
-    print("🔍 Extracting LLVM IR features...")
+def source_fingerprint(src_file: Path) -> dict:
+    """What a features.csv row depends on; any change means re-extract."""
+    return {
+        "hash": source_digest(src_file),
+        "compiler": compiler_identity(src_file.suffix),
+        "extractor": FEATURE_EXTRACTOR_VERSION,
+    }
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def extract_file(src: Path) -> tuple:
+    """IR for one source and its legacy FEATURES row: (ir_file, feats)."""
+    print(f"➡️ Processing {src.name}")
+    ir_file = generate_ir(src)
+    feats = extract_features_from_ir(ir_file)
+    feats["file"] = src.stem
+    feats["language"] = src.suffix  # optional feature
+    return ir_file, feats
+
+
+def extract_corpus(sources: list, jobs: int = 1) -> list:
+    """
+    Feature rows for many sources: IR and legacy FEATURES per file on
+    `jobs` threads, then the structural features of the whole corpus as
+    one matrix (ir_analysis.build_feature_matrix).
+    """
+    try:
+        from .ir_analysis import STRUCTURAL_FEATURES, build_feature_matrix
+    except ImportError:  # run as a script
+        from ir_analysis import STRUCTURAL_FEATURES, build_feature_matrix
 
-    all_rows = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        extracted = list(pool.map(extract_file, sources))
 
+    matrix = build_feature_matrix([ir_file for ir_file, _ in extracted], jobs)
+    rows = []
+    for (_, feats), structural in zip(extracted, matrix.tolist()):
+        feats.update(zip(STRUCTURAL_FEATURES, structural))
+        rows.append(feats)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SmartOpt feature extractor")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-extract sources that changed since the last run")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="Number of files processed in parallel")
+    parser.add_argument("--csv", action="store_true",
+                        help="Also export the latest features to data/features.csv")
+    args = parser.parse_args(argv)
+
+    try:
+        from . import result_store
+    except ImportError:  # run as a script: python3 src/feature_extractor.py
+        import result_store
+
+    print("🔍 Extracting LLVM IR features...")
+
+    sources = []
     for ext in ("*.c", "*.cpp", "*.rs"):
-        for src in SRC_DIR.glob(ext):
-            print(f"➡️ Processing {src.name}")
-            ir_file = generate_ir(src)
-            feats = extract_features_from_ir(ir_file)
-            feats["file"] = src.stem
-            feats["language"] = src.suffix  # optional feature
-            all_rows.append(feats)
+        sources.extend(sorted(SRC_DIR.glob(ext)))
+
+    fingerprints = {src.name: source_fingerprint(src) for src in sources}
+
+    stored = set(result_store.read("features", columns=[])["file"])
+    manifest = load_manifest(MANIFEST_PATH) if args.incremental else {}
+
+    todo = [src for src in sources
+            if manifest.get(src.name) != fingerprints[src.name] or src.stem not in stored]
+    print(f"{len(todo)} of {len(sources)} sources need extraction")
+
+    fresh = extract_corpus(todo, args.jobs)
+
+    metadata = result_store.run_metadata()
+    result_store.append("features", fresh, metadata, compiler_version=compiler_identity)
+
+    removed = stored - {src.stem for src in sources}
+    if removed:
+        result_store.delete("features", [{"file": f} for f in sorted(removed)], metadata)
 
-    df = pd.DataFrame(all_rows)
-    df.to_csv(OUTPUT_CSV, index=False)
+    MANIFEST_PATH.write_text(json.dumps(fingerprints, indent=2, sort_keys=True))
 
     print(f"\n✅ Feature extraction complete!")
-    print(f"📄 features.csv saved to: {OUTPUT_CSV}")
+    print(f"🗄️ {len(fresh)} rows appended, {len(removed)} removed in: {result_store.STORE_DIR}")
+    if args.csv:
+        result_store.export_csv("features", OUTPUT_CSV)
+        print(f"📄 features.csv saved to: {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,155 @@
+import math
+import random
+import statistics
+import time
+from pathlib import Path
+
+from .benchmark_runner import (
+    FLAGS,
+    build_compile_command,
+    run_binary,
+    run_command,
+)
+from .workspace import Workspace
+
+# Independent option groups per language. Each candidate picks one entry
+# per group (None = leave the compiler default) on top of an -O level.
+C_FAMILY_SPACE = {
+    "march": [None, "-march=native"],
+    "unroll": [None, "-funroll-loops"],
+    "vectorize": [None, "-fno-vectorize", "-fno-slp-vectorize"],
+    "lto": [None, "-flto"],
+}
+
+SEARCH_SPACE = {
+    ".c": C_FAMILY_SPACE,
+    ".cpp": {**C_FAMILY_SPACE, "exceptions": [None, "-fno-exceptions"]},
+    ".rs": {
+        "target_cpu": [None, "-Ctarget-cpu=native"],
+        "lto": [None, "-Clto=fat"],
+        "codegen_units": [None, "-Ccodegen-units=1"],
+        "panic": [None, "-Cpanic=abort"],
+    },
+}
+
+
+def sample_configs(lang: str, population: int, rng: random.Random) -> list:
+    """
+    Candidate configurations as (flag, extra_flags) tuples.
+
+    The five plain FLAGS always come first, so the search can never do
+    worse than the standard -O levels; the rest are random draws from the
+    language's SEARCH_SPACE without duplicates.
+    """
+    space = SEARCH_SPACE.get(lang)
+    if space is None:
+        raise ValueError(f"Unsupported source extension: {lang}")
+
+    configs = [(flag, ()) for flag in FLAGS]
+    seen = set(configs)
+    total = len(FLAGS) * math.prod(len(v) for v in space.values())
+    target = min(max(population, len(FLAGS)), total)
+
+    while len(configs) < target:
+        flag = rng.choice(FLAGS)
+        extra = tuple(opt for opt in (rng.choice(v) for v in space.values()) if opt)
+        if (flag, extra) not in seen:
+            seen.add((flag, extra))
+            configs.append((flag, extra))
+
+    return configs
+
+
+def _median_runtime(bin_path: Path, reps: int, timeout: float):
+    samples = []
+    for _ in range(reps):
+        ok, elapsed, _, _ = run_binary(bin_path, timeout)
+        if not ok:
+            return None
+        samples.append(elapsed)
+    return statistics.median(samples)
+
+
+def search_flags(src_file: Path, budget: float = 60.0, population: int = 16,
+                 eta: int = 2, seed: int = 0, timeout: float = 10.0) -> dict:
+    """
+    Budgeted search over flag combinations with successive halving.
+
+    All sampled candidates are compiled, then raced in rungs: every
+    survivor is run `reps` times, the fastest 1/eta by median runtime move
+    on, and `reps` grows by eta each rung. The search stops when one
+    candidate is left or `budget` wall-clock seconds are used up, and
+    returns the best configuration measured so far. If the budget runs
+    out mid-rung, the last rung's survivors are compared on their latest
+    runtimes.
+    """
+    src_file = Path(src_file)
+    deadline = time.perf_counter() + budget
+    configs = sample_configs(src_file.suffix, population, random.Random(seed))
+
+    history = []
+    with Workspace(prefix="search-") as workspace:
+        candidates = []
+        for i, (flag, extra) in enumerate(configs):
+            if time.perf_counter() >= deadline:
+                break
+            bin_path = workspace.path / f"{src_file.stem}_{i}"
+            cmd = build_compile_command(src_file, flag, bin_path, extra_flags=extra)
+            ok, compile_time, _ = run_command(cmd)
+            if ok:
+                workspace.track(bin_path)
+                candidates.append({
+                    "flags": [flag, *extra],
+                    "bin_path": bin_path,
+                    "compile_time": round(compile_time, 5),
+                    "runtime": None,
+                })
+
+        alive = candidates
+        reps = 1
+        while alive and time.perf_counter() < deadline:
+            measured, failed, cut_short = [], [], False
+            for cand in alive:
+                if time.perf_counter() >= deadline:
+                    cut_short = True
+                    break
+                runtime = _median_runtime(cand["bin_path"], reps, timeout)
+                if runtime is None:
+                    failed.append(cand)
+                else:
+                    cand["runtime"] = round(runtime, 6)
+                    measured.append(cand)
+
+            measured.sort(key=lambda c: c["runtime"])
+            history.append({
+                "reps": reps,
+                "candidates": [(c["flags"], c["runtime"]) for c in measured],
+            })
+            if cut_short:
+                # Unfinished rung: every survivor competes on its latest runtime,
+                # re-measured or not
+                alive = sorted((c for c in alive if c["runtime"] is not None
+                                and c not in failed), key=lambda c: c["runtime"])
+                break
+            if len(measured) <= 1:
+                alive = measured
+                break
+            alive = measured[:math.ceil(len(measured) / eta)]
+            reps *= eta
+
+        finished = [c for c in candidates if c["runtime"] is not None]
+
+    if not finished:
+        return {"flags": None, "runtime": None, "compiled": len(candidates),
+                "sampled": len(configs), "rungs": history}
+
+    # Prefer the survivor of the deepest rung; fall back to fastest seen
+    best = alive[0] if alive else min(finished, key=lambda c: c["runtime"])
+    return {
+        "flags": best["flags"],
+        "runtime": best["runtime"],
+        "compile_time": best["compile_time"],
+        "compiled": len(candidates),
+        "sampled": len(configs),
+        "rungs": history,
+    }
@@ -0,0 +1,199 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+MODEL_PATH = ROOT / "data" / "model.pkl"
+FOREST_PATH = ROOT / "data" / "model.npz"
+
+# Bump when the npz layout changes; NumpyForest refuses other versions
+FOREST_FORMAT = 1
+
+# Rows walked through the forest at a time; bounds the (rows, trees) temporaries
+CHUNK_ROWS = 4096
+
+
+def export_forest(model, path: Path = FOREST_PATH) -> Path:
+    """
+    Flatten a fitted RandomForestClassifier into packed arrays.
+
+    All trees are concatenated into one node table (feature, threshold,
+    left/right child, missing-goes-left, leaf class probabilities); child
+    indices are global and leaves point to themselves, so traversal is a
+    fixed number of gathers with no per-tree Python loop.
+    """
+    trees = [est.tree_ for est in model.estimators_]
+    n_classes = len(model.classes_)
+
+    roots, features, thresholds, lefts, rights, missing_left, values = [], [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        idx = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+
+        roots.append(offset)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, np.inf, tree.threshold))
+        lefts.append(np.where(leaf, idx, tree.children_left) + offset)
+        rights.append(np.where(leaf, idx, tree.children_right) + offset)
+        missing = getattr(tree, "missing_go_to_left", None)
+        missing_left.append(np.zeros(tree.node_count, bool) if missing is None
+                            else missing.astype(bool))
+
+        # Same normalization as DecisionTreeClassifier.predict_proba
+        value = tree.value[:, 0, :n_classes].astype(np.float64)
+        total = value.sum(axis=1, keepdims=True)
+        total[total == 0.0] = 1.0
+        values.append(value / total)
+        offset += tree.node_count
+
+    names = getattr(model, "feature_names_in_", None)
+    np.savez(
+        path,
+        format=np.int32(FOREST_FORMAT),
+        roots=np.asarray(roots, dtype=np.int32),
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        missing_left=np.concatenate(missing_left),
+        value=np.concatenate(values),
+        depth=np.int32(max(tree.max_depth for tree in trees)),
+        classes=np.asarray(model.classes_).astype(str),
+        feature_names=np.asarray([] if names is None else names).astype(str),
+    )
+    return Path(path)
+
+
+class NumpyForest:
+    """
+    Pure-NumPy stand-in for the exported RandomForestClassifier.
+
+    Provides predict, predict_proba, classes_ and feature_names_in_, so it
+    can be used wherever smartopt expects the sklearn model. Inputs are
+    cast to float32 like sklearn does, so splits land identically.
+
+    All trees are walked at once, `depth` steps of integer gathers: each
+    step compares every (row, tree) pair against the split of the node it
+    is at, so memory is rows x trees per step, in CHUNK_ROWS row chunks.
+    """
+
+    def __init__(self, arrays):
+        if int(arrays["format"]) != FOREST_FORMAT:
+            raise ValueError(f"Unsupported forest format: {int(arrays['format'])}")
+        self.roots = arrays["roots"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.missing_left = arrays["missing_left"]
+        self.value = arrays["value"]
+        self.depth = int(arrays["depth"])
+        self.classes_ = arrays["classes"].astype(object)
+        names = arrays["feature_names"].astype(object)
+        if len(names):
+            self.feature_names_in_ = names
+        self.n_features_in_ = len(names) if len(names) else int(self.feature.max()) + 1
+
+        # children[2 * node + went_left]; leaf values laid out per class
+        self._children = np.stack([self.right, self.left], axis=1).ravel().astype(np.intp)
+        self._feature = self.feature.astype(np.intp)
+        self._roots = self.roots.astype(np.intp)
+        self._value_by_class = np.ascontiguousarray(self.value.T)
+
+    @classmethod
+    def load(cls, path: Path = FOREST_PATH):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    @property
+    def n_estimators(self) -> int:
+        return len(self.roots)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+    def _matrix(self, X):
+        if hasattr(X, "columns"):
+            columns = None
+            if hasattr(self, "feature_names_in_"):
+                columns = X.columns.get_indexer(self.feature_names_in_)
+                if (columns < 0).any():
+                    raise KeyError(f"Missing feature columns: "
+                                   f"{list(self.feature_names_in_[columns < 0])}")
+            X = X.to_numpy(dtype=np.float32)
+            if columns is not None:
+                X = X[:, columns]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        return X.astype(np.float64)
+
+    def _leaves(self, X):
+        """Leaf reached in every tree by each row of a float64 matrix."""
+        rows = np.arange(len(X), dtype=np.intp)[:, None]
+        check_missing = np.isnan(X).any()
+        nodes = np.tile(self._roots, (len(X), 1))
+        for _ in range(self.depth):
+            x = X[rows, self._feature.take(nodes)]
+            went_left = x <= self.threshold.take(nodes)
+            if check_missing:
+                went_left |= np.isnan(x) & self.missing_left.take(nodes)
+            nodes = self._children.take(2 * nodes + went_left)
+        return nodes
+
+    def _chunks(self, X):
+        X = self._matrix(X)
+        for start in range(0, len(X), CHUNK_ROWS):
+            yield self._leaves(X[start:start + CHUNK_ROWS])
+
+    def apply(self, X):
+        """Leaf node index reached in every tree: (n_samples, n_estimators)."""
+        leaves = list(self._chunks(X))
+        return np.concatenate(leaves) if leaves else np.empty((0, self.n_estimators), np.intp)
+
+    def predict_proba(self, X):
+        proba = [np.stack([v.take(nodes).sum(axis=1) for v in self._value_by_class], axis=1)
+                 for nodes in self._chunks(X)]
+        if not proba:
+            return np.empty((0, len(self.classes_)))
+        return np.concatenate(proba) / self.n_estimators
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export data/model.pkl as a NumPy forest")
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument("--out", type=Path, default=FOREST_PATH)
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    print(f"🔍 Loading {args.model}...")
+    model = joblib.load(args.model)
+
+    print("➡️ Exporting forest...")
+    export_forest(model, args.out)
+    forest = NumpyForest.load(args.out)
+
+    # Random rows around the split thresholds exercise every branch
+    rng = np.random.default_rng(0)
+    X = rng.choice(forest.threshold[np.isfinite(forest.threshold)],
+                   size=(2000, forest.n_features_in_))
+    X += rng.choice([-0.5, 0.0, 0.5], size=X.shape)
+    if hasattr(forest, "feature_names_in_"):
+        import pandas as pd
+        X = pd.DataFrame(X, columns=forest.feature_names_in_)
+
+    if not np.array_equal(forest.predict(X), model.predict(X)):
+        raise SystemExit("❌ NumPy forest predictions differ from sklearn")
+
+    print(f"✅ {forest.n_estimators} trees, {forest.node_count} nodes → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# Opcode → histogram category. Anything unlisted counts as "other".
+OPCODE_CATEGORIES = {
+    "memory": ("load", "store", "alloca", "getelementptr", "atomicrmw",
+               "cmpxchg", "fence"),
+    "int_arith": ("add", "sub", "mul", "udiv", "sdiv", "urem", "srem",
+                  "shl", "lshr", "ashr", "and", "or", "xor"),
+    "float_arith": ("fadd", "fsub", "fmul", "fdiv", "frem", "fneg"),
+    "compare": ("icmp", "fcmp"),
+    "control": ("br", "switch", "indirectbr", "ret", "unreachable",
+                "resume", "callbr", "catchswitch", "catchret", "cleanupret"),
+    "call": ("call", "invoke"),
+    "cast": ("trunc", "zext", "sext", "fptrunc", "fpext", "fptoui", "fptosi",
+             "uitofp", "sitofp", "ptrtoint", "inttoptr", "bitcast",
+             "addrspacecast"),
+    "phi_select": ("phi", "select"),
+    "vector": ("extractelement", "insertelement", "shufflevector",
+               "extractvalue", "insertvalue"),
+    "other": (),
+}
+
+CATEGORIES = list(OPCODE_CATEGORIES)
+_CATEGORY_INDEX = {
+    op: CATEGORIES.index(cat) for cat, ops in OPCODE_CATEGORIES.items() for op in ops
+}
+_OTHER = CATEGORIES.index("other")
+
+TERMINATORS = set(OPCODE_CATEGORIES["control"]) | {"invoke"}
+
+STRUCTURAL_FEATURES = [
+    "ir_functions",
+    "ir_blocks",
+    "ir_edges",
+    "ir_instructions",
+    "ir_max_blocks_per_function",
+    "ir_cyclomatic",
+    "ir_loops",
+    "ir_max_loop_depth",
+    "ir_mean_loop_depth",
+    "ir_callgraph_nodes",
+    "ir_callgraph_edges",
+    "ir_external_callees",
+    "ir_indirect_calls",
+    "ir_mem_ratio",
+    *[f"ir_op_{cat}" for cat in CATEGORIES],
+]
+
+_NAME = r'(?:"(?:[^"\\]|\\.)*"|[-\w.$]+)'
+_DEFINE_RE = re.compile(r"^define\b[^@]*@(" + _NAME + r")")
+_LABEL_RE = re.compile(r"^(" + _NAME + r"):")
+_ASSIGN_RE = re.compile(r"^%" + _NAME + r"\s*=\s*")
+_OPCODE_RE = re.compile(r"(?:(?:tail|musttail|notail)\s+)?([a-z][a-z0-9_]*)")
+_LABEL_REF_RE = re.compile(r"label\s+%(" + _NAME + r")")
+_CALLEE_RE = re.compile(r"@(" + _NAME + r")\s*\(")
+
+
+class FunctionInfo:
+    """
+    One defined function. Blocks are numbered in source order (0 = entry);
+    CFG edges are parallel `edge_src`/`edge_dst` int32 arrays and per-block
+    data lives in NumPy arrays.
+    """
+
+    def __init__(self, name: str, block_names: list, block_insts, edge_src, edge_dst,
+                 op_hist, callees: list, indirect_calls: int):
+        self.name = name
+        self.block_names = block_names
+        self.block_insts = block_insts
+        self.edge_src = edge_src
+        self.edge_dst = edge_dst
+        self.op_hist = op_hist
+        self.callees = callees
+        self.indirect_calls = indirect_calls
+        self.loop_depth, self.loops = loop_nesting(len(block_names), edge_src, edge_dst)
+
+    @property
+    def n_blocks(self) -> int:
+        return len(self.block_names)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edge_src)
+
+    @property
+    def n_instructions(self) -> int:
+        return int(self.block_insts.sum())
+
+
+class _FunctionBuilder:
+    def __init__(self, name: str):
+        self.name = name
+        self.block_names = []
+        self.block_insts = []
+        self.edges = []
+        self.op_hist = np.zeros(len(CATEGORIES), dtype=np.int64)
+        self.callees = []
+        self.indirect_calls = 0
+        self.in_switch = False
+
+    def start_block(self, name: str):
+        self.block_names.append(name)
+        self.block_insts.append(0)
+
+    def add_instruction(self, line: str):
+        if not self.block_names:
+            self.start_block("")  # unlabeled entry block
+
+        body = _ASSIGN_RE.sub("", line, count=1)
+        m = _OPCODE_RE.match(body)
+        opcode = m.group(1) if m else ""
+
+        self.block_insts[-1] += 1
+        self.op_hist[_CATEGORY_INDEX.get(opcode, _OTHER)] += 1
+
+        if opcode in ("call", "invoke", "callbr"):
+            callee = _CALLEE_RE.search(body)
+            if callee:
+                self.callees.append(callee.group(1))
+            else:
+                self.indirect_calls += 1
+
+        if opcode in TERMINATORS:
+            self.add_successors(body)
+            self.in_switch = opcode in ("switch", "indirectbr", "catchswitch") \
+                and body.rstrip().endswith("[")
+
+    def add_successors(self, text: str):
+        src = len(self.block_names) - 1
+        for target in _LABEL_REF_RE.findall(text):
+            self.edges.append((src, target))
+
+    def build(self) -> FunctionInfo:
+        index = {name: i for i, name in enumerate(self.block_names)}
+        pairs = [(src, index[dst]) for src, dst in self.edges if dst in index]
+        edge_src = np.array([p[0] for p in pairs], dtype=np.int32)
+        edge_dst = np.array([p[1] for p in pairs], dtype=np.int32)
+        return FunctionInfo(
+            self.name,
+            self.block_names,
+            np.array(self.block_insts, dtype=np.int64),
+            edge_src,
+            edge_dst,
+            self.op_hist,
+            self.callees,
+            self.indirect_calls,
+        )
+
+
+def parse_ir(ir_file: Path) -> list:
+    """Parse a textual .ll file into a list of FunctionInfo, streaming by line."""
+    functions = []
+    current = None
+
+    with open(ir_file) as f:
+        for raw in f:
+            line = raw.split(";", 1)[0].rstrip() if ";" in raw else raw.rstrip()
+
+            if current is None:
+                m = _DEFINE_RE.match(line)
+                if m and line.endswith("{"):
+                    current = _FunctionBuilder(m.group(1).strip('"'))
+                continue
+
+            if line == "}":
+                functions.append(current.build())
+                current = None
+                continue
+
+            if not line.strip():
+                continue
+
+            if current.in_switch:
+                current.add_successors(line)
+                if line.strip().startswith("]") or line.rstrip().endswith("]"):
+                    current.in_switch = False
+                continue
+
+            if not line[0].isspace():
+                m = _LABEL_RE.match(line)
+                if m:
+                    current.start_block(m.group(1).strip('"'))
+                continue
+
+            stripped = line.strip()
+            if stripped.startswith(("to label", "unwind ")):
+                # invoke/callbr successors printed on a continuation line
+                current.add_successors(stripped)
+                continue
+
+            current.add_instruction(stripped)
+
+    return functions
+
+
+def _dominators(n: int, succs: list, preds: list):
+    """Immediate dominators (Cooper/Harvey/Kennedy). -1 = unreachable."""
+    order = []
+    seen = np.zeros(n, dtype=bool)
+    stack = [(0, iter(succs[0]))]
+    seen[0] = True
+    while stack:
+        node, it = stack[-1]
+        for nxt in it:
+            if not seen[nxt]:
+                seen[nxt] = True
+                stack.append((nxt, iter(succs[nxt])))
+                break
+        else:
+            order.append(node)
+            stack.pop()
+
+    rpo = order[::-1]
+    rpo_index = np.full(n, -1, dtype=np.int64)
+    rpo_index[rpo] = np.arange(len(rpo))
+
+    idom = np.full(n, -1, dtype=np.int64)
+    idom[0] = 0
+    changed = True
+    while changed:
+        changed = False
+        for b in rpo[1:]:
+            new = -1
+            for p in preds[b]:
+                if idom[p] == -1:
+                    continue
+                if new == -1:
+                    new = p
+                    continue
+                a, c = p, new
+                while a != c:
+                    while rpo_index[a] > rpo_index[c]:
+                        a = idom[a]
+                    while rpo_index[c] > rpo_index[a]:
+                        c = idom[c]
+                new = a
+            if new != -1 and idom[b] != new:
+                idom[b] = new
+                changed = True
+    return idom
+
+
+def _dominates(idom, a: int, b: int) -> bool:
+    while True:
+        if a == b:
+            return True
+        if b == 0 or idom[b] == -1:
+            return False
+        b = idom[b]
+
+
+def loop_nesting(n: int, edge_src, edge_dst):
+    """
+    Natural loops from back edges (u → h where h dominates u).
+    Returns (depth per block as an int array, number of loops); loops that
+    share a header are merged, as LLVM's LoopInfo does.
+    """
+    depth = np.zeros(n, dtype=np.int64)
+    if n == 0 or len(edge_src) == 0:
+        return depth, 0
+
+    succs = [[] for _ in range(n)]
+    preds = [[] for _ in range(n)]
+    for u, v in zip(edge_src.tolist(), edge_dst.tolist()):
+        succs[u].append(v)
+        preds[v].append(u)
+
+    idom = _dominators(n, succs, preds)
+
+    bodies = {}
+    for u, h in zip(edge_src.tolist(), edge_dst.tolist()):
+        if idom[u] == -1 or not _dominates(idom, h, u):
+            continue
+        body = bodies.setdefault(h, {h})
+        stack = [u]
+        while stack:
+            b = stack.pop()
+            if b not in body:
+                body.add(b)
+                stack.extend(preds[b])
+
+    for body in bodies.values():
+        depth[list(body)] += 1
+    return depth, len(bodies)
+
+
+def structural_features(ir_file: Path) -> dict:
+    """Module-level structural features (STRUCTURAL_FEATURES) for one .ll file."""
+    functions = parse_ir(ir_file)
+
+    op_hist = np.zeros(len(CATEGORIES), dtype=np.int64)
+    blocks = edges = insts = loops = max_depth = indirect = 0
+    weighted_depth = 0
+    max_blocks = 0
+    call_edges = set()
+    defined = {fn.name for fn in functions}
+
+    for fn in functions:
+        op_hist += fn.op_hist
+        blocks += fn.n_blocks
+        edges += fn.n_edges
+        insts += fn.n_instructions
+        loops += fn.loops
+        indirect += fn.indirect_calls
+        max_blocks = max(max_blocks, fn.n_blocks)
+        if fn.n_blocks:
+            max_depth = max(max_depth, int(fn.loop_depth.max()))
+            weighted_depth += int((fn.loop_depth * fn.block_insts).sum())
+        call_edges.update((fn.name, callee.strip('"')) for callee in fn.callees)
+
+    callees = {callee for _, callee in call_edges}
+    external = {c for c in callees if c not in defined and not c.startswith("llvm.")}
+    memory = op_hist[CATEGORIES.index("memory")]
+
+    feats = {
+        "ir_functions": len(functions),
+        "ir_blocks": blocks,
+        "ir_edges": edges,
+        "ir_instructions": insts,
+        "ir_max_blocks_per_function": max_blocks,
+        "ir_cyclomatic": edges - blocks + 2 * len(functions),
+        "ir_loops": loops,
+        "ir_max_loop_depth": max_depth,
+        "ir_mean_loop_depth": round(weighted_depth / insts, 6) if insts else 0.0,
+        "ir_callgraph_nodes": len(defined | callees),
+        "ir_callgraph_edges": len(call_edges),
+        "ir_external_callees": len(external),
+        "ir_indirect_calls": indirect,
+        "ir_mem_ratio": round(float(memory) / insts, 6) if insts else 0.0,
+    }
+    for cat, count in zip(CATEGORIES, op_hist.tolist()):
+        feats[f"ir_op_{cat}"] = count
+    return feats
+
+
+def build_feature_matrix(ir_files: list, jobs: int = 1):
+    """
+    Structural features for a whole corpus as an (n_files, n_features)
+    float64 matrix, columns in STRUCTURAL_FEATURES order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        rows = list(pool.map(structural_features, ir_files))
+
+    matrix = np.empty((len(rows), len(STRUCTURAL_FEATURES)), dtype=np.float64)
+    for i, row in enumerate(rows):
+        matrix[i] = [row[name] for name in STRUCTURAL_FEATURES]
+    return matrix
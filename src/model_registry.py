@@ -0,0 +1,122 @@
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+
+try:
+    from . import telemetry
+except ImportError:  # run as a script
+    import telemetry
+
+ROOT = Path(__file__).resolve().parent.parent
+MODEL_PATH = ROOT / "data" / "model.pkl"
+COST_MODEL_PATH = ROOT / "data" / "cost_model.pkl"
+
+# Serve the exported NumPy forest (data/model.npz) when it is at least as
+# new as model.pkl; set SMARTOPT_NUMPY_FOREST=0 to always unpickle sklearn.
+NUMPY_FOREST_ENABLED = os.getenv("SMARTOPT_NUMPY_FOREST", "1") != "0"
+
+
+class ModelRegistry:
+    """
+    Keeps one deserialized model resident per process.
+
+    Every get() stats the model file; the model is only reloaded when its
+    mtime or size changed, so retraining data/model.pkl is picked up
+    without a restart while normal requests pay nothing but a stat().
+
+    When a compiled forest (see forest_inference; model.npz next to the
+    pickle by default) exists and is not older than the pickle, it is
+    loaded instead: no sklearn import, no unpickling.
+    """
+
+    def __init__(self, path: Path = MODEL_PATH, compiled_path: Path = None,
+                 prefer_compiled: bool = NUMPY_FOREST_ENABLED):
+        self.path = Path(path)
+        self.compiled_path = Path(compiled_path or self.path.with_suffix(".npz"))
+        self.prefer_compiled = prefer_compiled
+        self._lock = threading.Lock()
+        self._model = None
+        self._stamp = None
+        self._version = None
+        self._source = None
+        self._engine = None
+        self.loads = 0
+
+    def _stat(self, path: Path):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _current_stamp(self):
+        pkl = self._stat(self.path)
+        if self.prefer_compiled:
+            npz = self._stat(self.compiled_path)
+            if npz is not None and (pkl is None or npz[0] >= pkl[0]):
+                return self.compiled_path, *npz
+        if pkl is None:
+            raise FileNotFoundError(self.path)
+        return self.path, *pkl
+
+    def _load(self, path: Path, data: bytes):
+        # Imported on first load so importing the registry stays cheap
+        if path == self.compiled_path:
+            try:
+                from .forest_inference import NumpyForest
+            except ImportError:  # run as a script
+                from forest_inference import NumpyForest
+            return "numpy", NumpyForest.load(io.BytesIO(data))
+
+        import joblib
+        return "sklearn", joblib.load(io.BytesIO(data))
+
+    def get(self):
+        stamp = self._current_stamp()
+        if self._model is not None and stamp == self._stamp:
+            return self._model
+
+        with self._lock:
+            # Another thread may have reloaded while we waited
+            if self._model is None or stamp != self._stamp:
+                path = stamp[0]
+                with telemetry.stage("model_load"):
+                    data = path.read_bytes()
+                    self._version = hashlib.sha256(data).hexdigest()[:12]
+                    self._engine, self._model = self._load(path, data)
+                self._source = path
+                self._stamp = stamp
+                self.loads += 1
+            return self._model
+
+    @property
+    def version(self) -> str:
+        """Short sha256 of the loaded model file (None before first load)."""
+        return self._version
+
+    def info(self) -> dict:
+        return {
+            "path": str(self._source or self.path),
+            "version": self._version,
+            "loaded": self._model is not None,
+            "engine": self._engine,
+            "loads": self.loads,
+        }
+
+
+_registry = ModelRegistry()
+
+
+def get_model():
+    """Return the resident model, reloading it if data/model.pkl (or .npz) changed."""
+    return _registry.get()
+
+
+def model_version() -> str:
+    return _registry.version
+
+
+def model_info() -> dict:
+    return _registry.info()
@@ -1,42 +1,113 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from sklearn.preprocessing import MinMaxScaler
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.model_selection import RandomizedSearchCV, StratifiedKFold, train_test_split
+from sklearn.metrics import classification_report
 import joblib
 
+try:
+    from . import result_store
+    from .benchmark_runner import FLAGS
+    from .forest_inference import FOREST_PATH, export_forest
+    from .ir_analysis import STRUCTURAL_FEATURES
+except ImportError:  # run as a script: python3 src/model_trainer.py
+    import result_store
+    from benchmark_runner import FLAGS
+    from forest_inference import FOREST_PATH, export_forest
+    from ir_analysis import STRUCTURAL_FEATURES
+
 ROOT = Path(__file__).resolve().parent.parent
 
 FEATURES_CSV = ROOT / "data" / "features.csv"
 RESULTS_CSV = ROOT / "data" / "results.csv"
 MODEL_PATH = ROOT / "data" / "model.pkl"
 
+FEATURE_COLUMNS = [
+    "instruction_count", "load_count", "store_count", "arith_count",
+    "branch_count", "cmp_count", "function_count", "basic_blocks",
+    "loop_markers"
+]
+
+# Versioned artifacts: data/models/<version>/{model.pkl, model.npz, metrics.json}
+MODELS_DIR = ROOT / "data" / "models"
+
+# Raw rows read per chunk; the reduced corpus adds a few hundred bytes per program
+CHUNK_ROWS = int(os.getenv("SMARTOPT_TRAIN_CHUNK_ROWS", "65536"))
+
+# Hyperparameter search: SEARCH_ITER random draws, CV_FOLDS-fold CV each
+SEARCH_ITER = int(os.getenv("SMARTOPT_TRAIN_SEARCH_ITER", "8"))
+CV_FOLDS = 5
+PARAM_SPACE = {
+    "n_estimators": [100, 200, 400],
+    "max_depth": [None, 8, 16, 32],
+    "min_samples_leaf": [1, 2, 4],
+    "max_features": ["sqrt", 0.5, None],
+}
+
+# Bootstrap rows per tree, and programs the search cross-validates on.
+# Both cap tree size and fit time however large the corpus grows.
+TREE_SAMPLES = int(os.getenv("SMARTOPT_TRAIN_TREE_SAMPLES", "20000"))
+SEARCH_SAMPLES = int(os.getenv("SMARTOPT_TRAIN_SEARCH_SAMPLES", "20000"))
+
+# Held-out share of programs for accuracy/regret
+TEST_SIZE = 0.2
+
+# Below this many programs there is nothing meaningful to validate on
+MIN_PROGRAMS_TO_VALIDATE = 20
+
 
-def compute_balanced_metric(df):
+# Balanced-score weight per result column (lower is better for each).
+# Any numeric results column works, e.g. peak_rss_kb or cache_misses
+# from benchmark_runner --metrics.
+DEFAULT_WEIGHTS = {"runtime": 0.6, "binary_size": 0.3, "compile_time": 0.1}
+
+# Historical names of the normalized default columns
+NORM_COLUMNS = {"runtime": "runtime_norm", "binary_size": "binary_norm",
+                "compile_time": "compile_norm"}
+
+
+def compute_balanced_metric(df, weights=None):
     """
-    Compute normalized runtime, size, compile time, and balanced score.
+    Min-max normalize each weighted column and sum them into balanced_score.
+    `weights` maps result columns to weights (default: DEFAULT_WEIGHTS).
     """
+    weights = weights or DEFAULT_WEIGHTS
+    missing = [col for col in weights if col not in df.columns]
+    if missing:
+        raise KeyError(f"Missing metric columns: {missing}")
+
+    columns = list(weights)
+    norm = [NORM_COLUMNS.get(col, f"{col}_norm") for col in columns]
 
     scaler = MinMaxScaler()
+    df[norm] = scaler.fit_transform(df[columns].astype("float64"))
 
-    df[["runtime_norm", "binary_norm", "compile_norm"]] = scaler.fit_transform(
-        df[["runtime", "binary_size", "compile_time"]]
-    )
+    df["balanced_score"] = sum(weights[col] * df[n] for col, n in zip(columns, norm))
 
-    # Define weights (runtime=60%, size=30%, compile time=10%)
-    w_runtime = 0.6
-    w_size = 0.3
-    w_compile = 0.1
+    return df
 
-    df["balanced_score"] = (
-        w_runtime * df["runtime_norm"]
-        + w_size * df["binary_norm"]
-        + w_compile * df["compile_norm"]
-    )
 
-    return df
+def parse_weights(specs) -> dict:
+    """["runtime=0.5", "peak_rss_kb=0.2"] -> DEFAULT_WEIGHTS with overrides."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for spec in specs or ():
+        col, sep, value = spec.partition("=")
+        try:
+            if not (col and sep):
+                raise ValueError
+            weights[col] = float(value)
+        except ValueError:
+            raise ValueError(f"weight must be COLUMN=NUMBER, got {spec!r}") from None
+    return {col: w for col, w in weights.items() if w}
 
 
 def label_best_flags(df):
@@ -52,60 +123,302 @@ def label_best_flags(df):
     return best_rows[["file", "flag"]]
 
 
-def main():
-    print("🔍 Loading datasets...")
+class _LatestTable:
+    """
+    Latest values per key in a preallocated NaN-filled array that grows by
+    doubling; assigning a key again overwrites its previous values.
+    """
+
+    def __init__(self, shape: tuple, dtype=np.float64):
+        self.index = {}
+        self.data = np.full((1024, *shape), np.nan, dtype=dtype)
 
-    feats = pd.read_csv(FEATURES_CSV)
-    results = pd.read_csv(RESULTS_CSV)
+    def rows(self, keys) -> np.ndarray:
+        index = self.index
+        rows = np.fromiter((index.setdefault(k, len(index)) for k in keys),
+                           dtype=np.intp, count=len(keys))
+        if len(index) > len(self.data):
+            grown = np.full((max(len(index), 2 * len(self.data)), *self.data.shape[1:]),
+                            np.nan, dtype=self.data.dtype)
+            grown[:len(self.data)] = self.data
+            self.data = grown
+        return rows
 
-    print("➡️ Merging features + results...")
-    df = pd.merge(results, feats, on="file")
 
-    print("➡️ Computing balanced metric...")
-    df = compute_balanced_metric(df)
+def _chunks(dataset: str, csv_path: Path, columns: list, chunk_rows: int):
+    if result_store.exists(dataset):
+        yield from result_store.iter_batches(dataset, columns, chunk_rows)
+    else:
+        yield from pd.read_csv(csv_path, usecols=["file", *columns], chunksize=chunk_rows)
 
-    print("➡️ Determining best flags for each file...")
-    best_flags = label_best_flags(df)
 
-    df = pd.merge(df, best_flags, on=["file", "flag"], how="left", indicator=True)
-    df["is_best"] = df["_merge"] == "both"
-    df.drop(columns=["_merge"], inplace=True)
+def _tombstones(chunk) -> np.ndarray:
+    if "deleted" not in chunk.columns:
+        return np.zeros(len(chunk), dtype=bool)
+    return chunk["deleted"].fillna(False).astype(bool).to_numpy()
 
-    print("➡️ Preparing training data...")
 
-    feature_columns = [
-        "instruction_count", "load_count", "store_count", "arith_count",
-        "branch_count", "cmp_count", "function_count", "basic_blocks",
-        "loop_markers"
-    ]
+def stream_corpus(feature_columns=FEATURE_COLUMNS, metric_columns=("runtime",),
+                  chunk_rows=CHUNK_ROWS):
+    """
+    Reduce the benchmark corpus to one row per program, chunk by chunk.
+
+    Results and features are read `chunk_rows` raw rows at a time (from
+    the store, else the CSVs); only the latest value of each (file, flag)
+    metric and each file's features are kept, in compact arrays. Returns
+    (files, X, metrics): X is (programs, features) float32 and metrics is
+    (programs, len(FLAGS), len(metric_columns)), NaN where not measured.
+    Only programs with both features and results are returned.
+    """
+    metric_columns = list(metric_columns)
+    flag_index = {flag: i for i, flag in enumerate(FLAGS)}
+
+    results = _LatestTable((len(FLAGS), len(metric_columns)))
+    for chunk in _chunks("results", RESULTS_CSV, ["flag", *metric_columns], chunk_rows):
+        chunk = chunk[chunk["flag"].isin(flag_index)]
+        values = chunk.reindex(columns=metric_columns).astype("float64").to_numpy()
+        values[_tombstones(chunk)] = np.nan
+        rows = results.rows(chunk["file"].astype(str).tolist())
+        results.data[rows, chunk["flag"].map(flag_index).to_numpy()] = values
+
+    feats = _LatestTable((len(feature_columns),), dtype=np.float32)
+    for chunk in _chunks("features", FEATURES_CSV, list(feature_columns), chunk_rows):
+        values = chunk.reindex(columns=feature_columns).astype("float32").to_numpy()
+        values[_tombstones(chunk)] = np.nan
+        rows = feats.rows(chunk["file"].astype(str).tolist())
+        feats.data[rows] = values
+
+    files = [f for f in results.index if f in feats.index]
+    X = feats.data[[feats.index[f] for f in files]]
+    metrics = results.data[[results.index[f] for f in files]]
+    keep = ~np.isnan(X).any(axis=1) & ~np.isnan(metrics).all(axis=(1, 2))
+    return [f for f, k in zip(files, keep) if k], X[keep], metrics[keep]
+
+
+def score_programs(metrics: np.ndarray, metric_columns: list, weights: dict):
+    """
+    compute_balanced_metric() and label_best_flags() over the reduced
+    (programs, flags, columns) corpus, one row per (program, flag) with the
+    program's index as `file`. Returns the (programs, flags) balanced
+    scores, NaN where not measured, and the labels of every program with
+    at least one score.
+    """
+    n, n_flags = metrics.shape[:2]
+    df = pd.DataFrame(metrics.reshape(n * n_flags, -1), columns=metric_columns)
+    df.insert(0, "file", np.repeat(np.arange(n), n_flags))
+    df.insert(1, "flag", np.tile(np.asarray(FLAGS, dtype=object), n))
+    df = compute_balanced_metric(df, weights)
+    scores = df["balanced_score"].to_numpy().reshape(n, n_flags)
+    return scores, label_best_flags(df.dropna(subset=["balanced_score"]))
+
 
-    X = df[feature_columns]
-    y = df["is_best"].astype(int)
+def regret_report(scores: np.ndarray, runtimes: np.ndarray, predicted: np.ndarray) -> dict:
+    """
+    Accuracy and regret of predicted flag indices against the oracle
+    (lowest balanced score). Regret is the balanced-score gap to the
+    oracle (a flag that was never measured counts as the program's worst);
+    slowdown is the geometric mean runtime ratio where both were measured.
+    """
+    n = len(scores)
+    oracle = np.nanargmin(scores, axis=1)
+    worst = np.nanmax(scores, axis=1)
+    chosen = scores[np.arange(n), predicted]
+    chosen = np.where(np.isnan(chosen), worst, chosen)
+    regret = chosen - scores[np.arange(n), oracle]
+
+    ratio = runtimes[np.arange(n), predicted] / runtimes[np.arange(n), oracle]
+    ratio = ratio[np.isfinite(ratio) & (ratio > 0)]
+    return {
+        "programs": int(n),
+        "accuracy": round(float(np.mean(predicted == oracle)), 4),
+        "mean_regret": round(float(regret.mean()), 6),
+        "max_regret": round(float(regret.max()), 6),
+        "runtime_slowdown": round(float(np.exp(np.log(ratio).mean())), 4) if len(ratio) else None,
+    }
+
+
+def forest(n_samples: int, n_jobs: int = -1, **params) -> RandomForestClassifier:
+    """RandomForestClassifier whose trees each see at most TREE_SAMPLES rows."""
+    max_samples = TREE_SAMPLES if n_samples > TREE_SAMPLES else None
+    return RandomForestClassifier(random_state=42, n_jobs=n_jobs, max_samples=max_samples,
+                                  **params)
+
+
+def search_hyperparameters(X, y, n_iter: int = SEARCH_ITER, folds: int = CV_FOLDS,
+                           n_jobs: int = -1):
+    """
+    Randomized search over PARAM_SPACE with stratified k-fold CV on at most
+    SEARCH_SAMPLES programs, candidates and folds evaluated in parallel.
+    Returns (best_params, best_cv_accuracy), or ({}, None) when search is
+    off or no class can fill every fold (rarer classes only draw a
+    warning from StratifiedKFold).
+    """
+    if n_iter <= 0 or folds < 2 or pd.Series(y).value_counts().max() < folds:
+        return {}, None
+    if len(X) > SEARCH_SAMPLES:
+        sample = np.random.default_rng(42).choice(len(X), SEARCH_SAMPLES, replace=False)
+        X, y = X[sample], y[sample]
+    search = RandomizedSearchCV(
+        forest(len(X), n_jobs=1),
+        PARAM_SPACE, n_iter=n_iter, scoring="accuracy", n_jobs=n_jobs, refit=False,
+        cv=StratifiedKFold(n_splits=folds, shuffle=True, random_state=42),
+        random_state=42,
+    )
+    search.fit(X, y)
+    return search.best_params_, round(float(search.best_score_), 4)
 
-    # We convert flag into a class label
-    df["flag_class"] = df["flag"].astype("category").cat.codes
-    y_flag = df["flag_class"]
 
-    # Train only on rows where that flag is best
-    train_df = df.loc[df["is_best"] == True]
-    X_train = train_df[feature_columns]
-    y_train = train_df["flag"]
+def _json_value(value):
+    # NumPy scalars from sklearn reports
+    return value.item() if hasattr(value, "item") else str(value)
 
-    print("➡️ Training RandomForest model...")
-    model = RandomForestClassifier(n_estimators=200, random_state=42)
-    model.fit(X_train, y_train)
 
-    print("➡️ Saving model...")
-    joblib.dump(model, MODEL_PATH)
+def _replace(write, path: Path):
+    """write(tmp_path), then atomically move it over `path`."""
+    tmp = path.with_name(f".{path.stem}.tmp{path.suffix}")
+    write(tmp)
+    os.replace(tmp, path)
 
-    print("\n🎉 Training Completed!")
-    print(f"📦 Model saved to: {MODEL_PATH}\n")
 
-    print("➡️ Best flags found per file:")
-    print(best_flags)
+def save_artifacts(model, metrics: dict, models_dir: Path = MODELS_DIR,
+                   promote: bool = True) -> Path:
+    """
+    Write model.pkl, model.npz and metrics.json to models_dir/<version>,
+    and with promote=True atomically replace the served data/model.pkl and
+    data/model.npz (the .npz last, so the registry serves it).
+    """
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    # Build in a private directory; the version only appears once complete
+    tmp = Path(tempfile.mkdtemp(prefix=f".{stamp}-", dir=models_dir))
+    tmp.chmod(0o755)
+    joblib.dump(model, tmp / "model.pkl")
+    export_forest(model, tmp / "model.npz")
+    digest = hashlib.sha256((tmp / "model.pkl").read_bytes()).hexdigest()[:12]
+
+    version = f"{stamp}-{digest}"
+    n = 0
+    while (models_dir / version).exists():  # same model saved twice in one second
+        n += 1
+        version = f"{stamp}-{digest}-{n}"
+
+    metrics = {"version": version, **metrics}
+    (tmp / "metrics.json").write_text(json.dumps(metrics, indent=2, default=_json_value) + "\n")
+    out = tmp.rename(models_dir / version)
+
+    if promote:
+        _replace(lambda tmp: joblib.dump(model, tmp), MODEL_PATH)
+        _replace(lambda tmp: export_forest(model, tmp), FOREST_PATH)
+    return out
+
+
+def train(feature_columns=FEATURE_COLUMNS, weights=None, chunk_rows=CHUNK_ROWS,
+          search_iter=SEARCH_ITER, folds=CV_FOLDS, test_size=TEST_SIZE, n_jobs=-1):
+    """
+    The training pipeline: stream the corpus into one row per program,
+    label each with its oracle flag (lowest balanced score), search
+    hyperparameters with parallel CV on a training split, report accuracy
+    and regret on the held-out programs, then refit on every program with
+    all cores. Returns (model, metrics).
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    metric_columns = list(dict.fromkeys(["runtime", *weights]))
+
+    files, X, metrics = stream_corpus(feature_columns, metric_columns, chunk_rows)
+    scores, best = score_programs(metrics, metric_columns, weights)
+    if not len(best):
+        raise SystemExit("❌ No program has both features and benchmark results")
+
+    labelled = best["file"].to_numpy()
+    X, metrics, scores = X[labelled], metrics[labelled], scores[labelled]
+    flags = np.asarray(FLAGS, dtype=object)
+    y = best["flag"].to_numpy(dtype=object)
+    runtimes = metrics[:, :, metric_columns.index("runtime")]
+    report = {
+        "trained_at": datetime.now(timezone.utc).isoformat(),
+        "programs": int(len(X)),
+        "feature_columns": list(feature_columns),
+        "weights": weights,
+        "label_counts": {flag: int(n) for flag, n in pd.Series(y).value_counts().items()},
+    }
+
+    counts = pd.Series(y).value_counts()
+    params, cv_accuracy = {}, None
+    if len(X) >= MIN_PROGRAMS_TO_VALIDATE:
+        stratify = y if counts.min() >= 2 else None
+        train_idx, test_idx = train_test_split(np.arange(len(X)), test_size=test_size,
+                                               random_state=42, stratify=stratify)
+        params, cv_accuracy = search_hyperparameters(X[train_idx], y[train_idx],
+                                                     search_iter, folds, n_jobs)
+        held_out = forest(len(train_idx), n_jobs, **params)
+        held_out.fit(X[train_idx], y[train_idx])
+        predicted = np.array([FLAGS.index(f) for f in held_out.predict(X[test_idx])])
+        report["test"] = regret_report(scores[test_idx], runtimes[test_idx], predicted)
+        report["test"]["classification"] = classification_report(
+            y[test_idx], flags[predicted], output_dict=True, zero_division=0)
+        report["static_flag_regret"] = {
+            flag: regret_report(scores[test_idx], runtimes[test_idx],
+                                np.full(len(test_idx), i))["mean_regret"]
+            for i, flag in enumerate(FLAGS)
+        }
+    report["params"] = params
+    report["cv_accuracy"] = cv_accuracy
+
+    model = forest(len(X), n_jobs, **{"n_estimators": 200, **params})
+    model.fit(pd.DataFrame(X, columns=feature_columns), y)
+    # Serving predicts one row at a time; don't fan that out over threads
+    model.set_params(n_jobs=None)
+    return model, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the flag prediction model")
+    parser.add_argument("--structural", action="store_true",
+                        help="also train on the structural IR features (ir_analysis)")
+    parser.add_argument("--weight", action="append", metavar="COLUMN=W",
+                        help="balanced-score weight of a results column, e.g. "
+                             "peak_rss_kb=0.1 (repeatable; 0 drops a default)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help="raw result/feature rows read at a time")
+    parser.add_argument("--search-iter", type=int, default=SEARCH_ITER,
+                        help="hyperparameter candidates to cross-validate (0: defaults)")
+    parser.add_argument("--cv", type=int, default=CV_FOLDS, help="cross-validation folds")
+    parser.add_argument("--jobs", "-j", type=int, default=-1,
+                        help="cores for search and training (default: all)")
+    parser.add_argument("--models-dir", type=Path, default=MODELS_DIR)
+    parser.add_argument("--no-promote", action="store_true",
+                        help="only write the versioned artifact, keep serving the old model")
+    args = parser.parse_args(argv)
+    try:
+        weights = parse_weights(args.weight)
+    except ValueError as e:
+        parser.error(str(e))
+
+    feature_columns = FEATURE_COLUMNS
+    if args.structural:
+        feature_columns = FEATURE_COLUMNS + STRUCTURAL_FEATURES
+
+    print("🔍 Streaming corpus and training...")
+    model, report = train(feature_columns, weights, chunk_rows=args.chunk_rows,
+                          search_iter=args.search_iter, folds=args.cv, n_jobs=args.jobs)
+
+    out = save_artifacts(model, report, args.models_dir, promote=not args.no_promote)
 
-    print("\n📊 Full dataset with scores ready for analysis.")
-    print("You can view it in a notebook or CSV.")
+    print("\n🎉 Training Completed!")
+    print(f"📦 Model {out.name} saved to: {out}")
+    if not args.no_promote:
+        print(f"🚀 Now serving: {MODEL_PATH} (serving copy: {FOREST_PATH})")
+
+    print(f"\n➡️ {report['programs']} programs, best flags: {report['label_counts']}")
+    if report["params"]:
+        print(f"➡️ Best parameters: {report['params']} (CV accuracy {report['cv_accuracy']})")
+    if "test" in report:
+        test = report["test"]
+        print(f"📊 Held-out accuracy {test['accuracy']}, mean regret {test['mean_regret']}, "
+              f"runtime slowdown vs oracle {test['runtime_slowdown']}x")
+    else:
+        print(f"⚠️ Fewer than {MIN_PROGRAMS_TO_VALIDATE} programs: trained without validation")
 
 
 if __name__ == "__main__":
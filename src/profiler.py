@@ -0,0 +1,338 @@
+import argparse
+import bisect
+import ctypes
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from .benchmark_runner import BASELINE_FLAG, perf_available
+except ImportError:  # run as a script: python3 src/profiler.py
+    from benchmark_runner import BASELINE_FLAG, perf_available
+
+# Samples per second; 999 rather than 1000 to avoid lockstep with timer work
+PROFILE_HZ = int(os.getenv("SMARTOPT_PROFILE_HZ", "999"))
+
+# Hot functions kept per flag
+PROFILE_TOP = int(os.getenv("SMARTOPT_PROFILE_TOP", "10"))
+
+# linux/ptrace.h, linux/elf.h
+PTRACE_CONT = 7
+PTRACE_GETREGSET = 0x4204
+PTRACE_SEIZE = 0x4206
+PTRACE_INTERRUPT = 0x4207
+PTRACE_EVENT_STOP = 128
+NT_PRSTATUS = 1
+
+# Index of the program counter in the NT_PRSTATUS register set
+PC_INDEX = {"x86_64": 16, "aarch64": 32}
+
+# nm symbol types that live in code
+TEXT_SYMBOL_TYPES = set("TtWwi")
+
+ET_EXEC = 2
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("base", ctypes.c_void_p), ("len", ctypes.c_size_t)]
+
+
+def ptrace_available() -> bool:
+    return sys.platform.startswith("linux") and platform.machine() in PC_INDEX
+
+
+@lru_cache(maxsize=128)
+def _symbols(path: str, mtime_ns: int, size: int) -> tuple:
+    """(sorted start addresses, sizes, names) of the code symbols in an ELF file."""
+    for extra in ([], ["-D"]):  # stripped libraries still have dynamic symbols
+        try:
+            out = subprocess.run(["nm", "-n", "-S", "-C", "--defined-only", *extra, path],
+                                 capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            return (), (), ()
+        addrs, sizes, names = [], [], []
+        for line in out.stdout.splitlines():
+            fields = line.split(" ", 3)
+            if len(fields) >= 3 and len(fields[1]) == 1:  # no size column
+                fields = [fields[0], "0", *line.split(" ", 2)[1:]]
+            if len(fields) == 4 and fields[2] in TEXT_SYMBOL_TYPES:
+                addrs.append(int(fields[0], 16))
+                sizes.append(int(fields[1], 16))
+                names.append(fields[3])
+        if addrs:
+            return tuple(addrs), tuple(sizes), tuple(names)
+    return (), (), ()
+
+
+def symbols(path: str) -> tuple:
+    st = os.stat(path)
+    return _symbols(path, st.st_mtime_ns, st.st_size)
+
+
+def _is_fixed_address(path: str) -> bool:
+    """True for non-PIE executables, whose symbols are absolute addresses."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(18)
+    except OSError:
+        return False
+    return header[:4] == b"\x7fELF" and int.from_bytes(header[16:18], "little") == ET_EXEC
+
+
+def _address_map(pid: int) -> list:
+    """[(start, end, path, load_bias)] for the executable mappings of `pid`."""
+    bases = {}
+    mappings = []
+    with open(f"/proc/{pid}/maps") as f:
+        for line in f:
+            fields = line.split(maxsplit=5)
+            if len(fields) < 6:
+                continue
+            span, perms, offset, path = fields[0], fields[1], int(fields[2], 16), fields[5].strip()
+            start, end = (int(x, 16) for x in span.split("-"))
+            if offset == 0:
+                bases.setdefault(path, start)
+            if "x" in perms:
+                mappings.append((start, end, path))
+
+    return [(start, end, path,
+             0 if path.startswith("[") or _is_fixed_address(path) else bases.get(path, 0))
+            for start, end, path in mappings]
+
+
+def _resolve(address_map: list, pc: int):
+    for start, end, path, bias in address_map:
+        if start <= pc < end:
+            return path, pc - bias
+    return None
+
+
+def label(path: str, address: int, binary: str) -> str:
+    """Function name for a file-relative address; library names are suffixed."""
+    if path.startswith("["):  # [vdso], [heap], ...
+        return path
+    addrs, sizes, names = symbols(path)
+    i = bisect.bisect_right(addrs, address) - 1
+    # Past the end of the nearest symbol: a local function nm cannot see
+    if i < 0 or (sizes[i] and address >= addrs[i] + sizes[i]):
+        return f"[{Path(path).name}]"
+    name = names[i]
+    return name if path == binary else f"{name} ({Path(path).name})"
+
+
+def _perf_samples(binary: str, timeout: float, hz: int):
+    with tempfile.TemporaryDirectory(prefix="smartopt-perf-") as tmp:
+        data = str(Path(tmp) / "perf.data")
+        try:
+            record = subprocess.run(["perf", "record", "-q", "-F", str(hz), "-o", data,
+                                     "--", binary], stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL, timeout=timeout)
+            if record.returncode != 0:
+                return None
+            out = subprocess.run(["perf", "script", "-i", data, "-F", "sym,dso"],
+                                 capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None
+
+    counts = Counter()
+    for line in out.stdout.splitlines():
+        sym, _, dso = line.strip().rpartition(" (")
+        if not dso:
+            continue
+        dso = dso.rstrip(")")
+        name = sym.strip() or "[unknown]"
+        counts[name if dso == binary else f"{name} ({Path(dso).name})"] += 1
+    return counts
+
+
+def _ptrace_samples(binary: str, timeout: float, hz: int):
+    """
+    Sample the program counter of a fresh run of `binary` by interrupting
+    it `hz` times a second with PTRACE_INTERRUPT. Only the main thread is
+    sampled. Returns a Counter of function labels, or None if it cannot
+    be traced.
+    """
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.ptrace.argtypes = [ctypes.c_long, ctypes.c_long, ctypes.c_void_p, ctypes.c_void_p]
+    libc.ptrace.restype = ctypes.c_long
+    regs = (ctypes.c_ulong * 64)()
+    iov = _IOVec(ctypes.cast(regs, ctypes.c_void_p), ctypes.sizeof(regs))
+    pc_index = PC_INDEX[platform.machine()]
+
+    # Popen returns only after exec, so every sample is in the binary itself
+    proc = subprocess.Popen([binary], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    pid = proc.pid
+    if libc.ptrace(PTRACE_SEIZE, pid, None, None) != 0:
+        proc.kill()
+        proc.wait()
+        return None
+
+    raw = Counter()
+    address_map = []
+    deadline = time.monotonic() + timeout
+    interval = 1.0 / hz
+    running = True
+    while running:
+        time.sleep(interval)
+        if time.monotonic() > deadline:
+            proc.kill()
+        libc.ptrace(PTRACE_INTERRUPT, pid, None, None)
+        while True:
+            _, status = os.waitpid(pid, 0)
+            if os.WIFEXITED(status) or os.WIFSIGNALED(status):
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                running = False
+                break
+            sig = os.WSTOPSIG(status)
+            if status >> 16 != PTRACE_EVENT_STOP:
+                # Signal-delivery stop: hand the signal on, our stop follows
+                libc.ptrace(PTRACE_CONT, pid, None, sig)
+                continue
+            if sig == signal.SIGTRAP and libc.ptrace(PTRACE_GETREGSET, pid,
+                                                     NT_PRSTATUS, ctypes.byref(iov)) == 0:
+                pc = regs[pc_index]
+                resolved = _resolve(address_map, pc)
+                if resolved is None:
+                    # Libraries appear after exec; refresh while stopped
+                    address_map = _address_map(pid)
+                    resolved = _resolve(address_map, pc)
+                raw[resolved or ("[unknown]", 0)] += 1
+            libc.ptrace(PTRACE_CONT, pid, None, None)
+            break
+
+    counts = Counter()
+    for (path, address), n in raw.items():
+        counts[label(path, address, binary)] += n
+    return counts
+
+
+def profile_binary(binary_path: Path, timeout: float = 10, hz: int = PROFILE_HZ,
+                   top: int = PROFILE_TOP):
+    """
+    Sample where a binary spends its time, with `perf record` when perf
+    works here and a ptrace program-counter sampler otherwise.
+
+    Returns {"sampler", "samples", "functions", "counts"} where functions
+    is the `top` hottest [{"function", "samples", "percent"}] and counts
+    maps every sampled function to its samples, or None when neither
+    sampler can run.
+    """
+    binary = str(Path(binary_path).resolve())
+    counts, sampler = None, None
+    if perf_available():
+        counts, sampler = _perf_samples(binary, timeout, hz), "perf"
+    if counts is None and ptrace_available():
+        counts, sampler = _ptrace_samples(binary, timeout, hz), "ptrace"
+    if counts is None:
+        return None
+
+    total = sum(counts.values())
+    return {
+        "sampler": sampler,
+        "samples": total,
+        "functions": [
+            {"function": name, "samples": n, "percent": round(100.0 * n / total, 2)}
+            for name, n in counts.most_common(top)
+        ],
+        "counts": dict(counts.most_common()),
+    }
+
+
+def profile_diff(results: list, best_flag: str, baseline_flag: str = BASELINE_FLAG,
+                 top: int = PROFILE_TOP):
+    """
+    Compare the hot functions of the best flag's profile with the baseline's.
+
+    Samples are taken at a fixed rate, so per-function sample counts are
+    proportional to time. Every sampled function is diffed, ordered by
+    samples saved (baseline - best), and the `top` are returned; a
+    function with 0 samples under the best flag was typically inlined or
+    optimized away. Profiles without full `counts` only know their top
+    list, so functions outside it get None rather than 0. Returns None
+    unless both rows carry a profile.
+    """
+    rows = {row["flag"]: row for row in results}
+    best = (rows.get(best_flag) or {}).get("profile")
+    base = (rows.get(baseline_flag) or {}).get("profile")
+    if not best or not base:
+        return None
+
+    best_counts, base_counts = _counts(best), _counts(base)
+    functions = []
+    for name in dict.fromkeys([*base_counts, *best_counts]):
+        b = _samples(best, best_counts, name)
+        o = _samples(base, base_counts, name)
+        functions.append({
+            "function": name,
+            "best_samples": b,
+            "baseline_samples": o,
+            "best_percent": _percent(b, best["samples"]),
+            "baseline_percent": _percent(o, base["samples"]),
+        })
+    functions.sort(key=lambda f: (f["best_samples"] or 0) - (f["baseline_samples"] or 0))
+
+    return {
+        "best_flag": best_flag,
+        "baseline_flag": baseline_flag,
+        "best_samples": best["samples"],
+        "baseline_samples": base["samples"],
+        "functions": functions[:top],
+    }
+
+
+def _counts(profile: dict) -> dict:
+    if "counts" in profile:
+        return profile["counts"]
+    return {f["function"]: f["samples"] for f in profile["functions"]}
+
+
+def _samples(profile: dict, counts: dict, name: str):
+    # Absent from full counts means never sampled; from a top list, unknown
+    return counts.get(name, 0 if "counts" in profile else None)
+
+
+def _percent(samples, total: int):
+    return None if samples is None else round(100.0 * samples / total, 2) if total else 0.0
+
+
+def format_profile(profile: dict) -> list:
+    """Hot-function table rows as printable lines."""
+    return [f"{f['percent']:>6.1f}%  {f['samples']:>6}  {f['function']}"
+            for f in profile["functions"]]
+
+
+def format_profile_diff(diff: dict) -> list:
+    lines = [f"{'function':<40}{diff['baseline_flag']:>10}{diff['best_flag']:>10}"]
+    for f in diff["functions"]:
+        base, best = (("?" if n is None else n) for n in (f["baseline_samples"], f["best_samples"]))
+        lines.append(f"{f['function'][:39]:<40}{base:>10}{best:>10}")
+    lines.append(f"{'total samples':<40}{diff['baseline_samples']:>10}{diff['best_samples']:>10}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hot-function profile of a binary")
+    parser.add_argument("binary", type=Path)
+    parser.add_argument("--hz", type=int, default=PROFILE_HZ)
+    parser.add_argument("--top", type=int, default=PROFILE_TOP)
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args(argv)
+
+    profile = profile_binary(args.binary, timeout=args.timeout, hz=args.hz, top=args.top)
+    if profile is None:
+        raise SystemExit("❌ Neither perf nor ptrace sampling is available here")
+
+    print(f"🔥 {profile['samples']} samples via {profile['sampler']}:")
+    for line in format_profile(profile):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+ROOT = Path(__file__).resolve().parent.parent
+STORE_DIR = Path(os.getenv("SMARTOPT_STORE_DIR", ROOT / "data" / "store"))
+
+# Columns that identify a row; the newest row per key wins on read
+DATASET_KEYS = {
+    "results": ["file", "flag"],
+    "features": ["file"],
+}
+
+# Typed columns per dataset. Anything else is stored as pandas infers it.
+SCHEMAS = {
+    "results": {
+        "file": "string",
+        "language": "string",
+        "flag": "string",
+        "compile_time": "float64",
+        "runtime": "float64",
+        "binary_size": "Int64",
+        "status": "string",
+        # Optional benchmark_runner.collect_metrics() columns
+        "peak_rss_kb": "Int64",
+        "user_time": "float64",
+        "sys_time": "float64",
+        "minor_faults": "Int64",
+        "major_faults": "Int64",
+        "instructions": "Int64",
+        "cycles": "Int64",
+        "cache_misses": "Int64",
+        "branch_misses": "Int64",
+        "ipc": "float64",
+    },
+    "features": {
+        "file": "string",
+        "language": "string",
+        "instruction_count": "Int64",
+        "load_count": "Int64",
+        "store_count": "Int64",
+        "arith_count": "Int64",
+        "branch_count": "Int64",
+        "cmp_count": "Int64",
+        "function_count": "Int64",
+        "basic_blocks": "Int64",
+        "loop_markers": "Int64",
+    },
+}
+
+META_COLUMNS = ["run_id", "host", "timestamp", "compiler_version", "deleted"]
+
+
+def _dataset_dir(dataset: str) -> Path:
+    if dataset not in DATASET_KEYS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    return STORE_DIR / dataset
+
+
+def run_metadata() -> dict:
+    """run_id, host and UTC timestamp shared by every row of one run."""
+    return {
+        "run_id": uuid.uuid4().hex,
+        "host": socket.gethostname(),
+        "timestamp": pd.Timestamp(datetime.now(timezone.utc)),
+    }
+
+
+def append(dataset: str, rows: list, metadata: dict = None, compiler_version=None) -> Path:
+    """
+    Append rows to a dataset as one new Parquet part file.
+
+    Nothing already stored is rewritten. `compiler_version` may be a string
+    or a callable taking the row's language (e.g. compiler_identity).
+    Returns the written part path, or None when there is nothing to write.
+    """
+    if not rows:
+        return None
+
+    metadata = metadata or run_metadata()
+    df = pd.DataFrame(rows)
+    for col, dtype in SCHEMAS[dataset].items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+
+    df["run_id"] = metadata["run_id"]
+    df["host"] = metadata["host"]
+    df["timestamp"] = metadata["timestamp"]
+    if callable(compiler_version):
+        df["compiler_version"] = df["language"].map(compiler_version)
+    else:
+        df["compiler_version"] = compiler_version
+    df["compiler_version"] = df["compiler_version"].astype("string")
+    if "deleted" not in df.columns:
+        df["deleted"] = False
+
+    out_dir = _dataset_dir(dataset)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = metadata["timestamp"].strftime("%Y%m%dT%H%M%S%f")
+    path = out_dir / f"part-{stamp}-{metadata['run_id'][:8]}-{uuid.uuid4().hex[:6]}.parquet"
+
+    tmp = path.with_suffix(".parquet.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def delete(dataset: str, keys: list, metadata: dict = None) -> Path:
+    """Append tombstones so the given key dicts disappear from read()."""
+    rows = [{**key, "deleted": True} for key in keys]
+    return append(dataset, rows, metadata)
+
+
+def parts(dataset: str) -> list:
+    return sorted(_dataset_dir(dataset).glob("part-*.parquet"))
+
+
+def exists(dataset: str) -> bool:
+    return bool(parts(dataset))
+
+
+def read(dataset: str, columns: list = None, latest: bool = True) -> pd.DataFrame:
+    """
+    Read a dataset, loading only `columns` (plus keys and bookkeeping) from
+    each part. With latest=True only the newest row per key is kept and
+    deleted keys are dropped.
+    """
+    keys = DATASET_KEYS[dataset]
+    wanted = None
+    if columns is not None:
+        wanted = list(dict.fromkeys([*keys, *columns, "timestamp", "deleted"]))
+
+    frames = []
+    for path in parts(dataset):
+        available = pq.read_schema(path).names
+        cols = [c for c in wanted if c in available] if wanted else None
+        frames.append(pq.read_table(path, columns=cols).to_pandas())
+
+    if not frames:
+        return pd.DataFrame(columns=wanted or keys)
+
+    df = pd.concat(frames, ignore_index=True)
+    if latest:
+        df = df.sort_values("timestamp", kind="stable")
+        df = df.drop_duplicates(keys, keep="last")
+        df = df[~df["deleted"].fillna(False).astype(bool)]
+
+    if columns is not None:
+        df = df[[c for c in dict.fromkeys([*keys, *columns]) if c in df.columns]]
+    return df.reset_index(drop=True)
+
+
+def iter_batches(dataset: str, columns: list = None, batch_rows: int = 65536):
+    """
+    Yield a dataset as DataFrames of at most `batch_rows` rows, part by
+    part in write order, without loading a whole part. Rows are raw: a
+    later row for the same key supersedes an earlier one and rows with
+    `deleted` set are tombstones, so callers resolve both themselves.
+    """
+    wanted = None
+    if columns is not None:
+        wanted = list(dict.fromkeys([*DATASET_KEYS[dataset], *columns, "deleted"]))
+
+    for path in parts(dataset):
+        part = pq.ParquetFile(path)
+        available = part.schema_arrow.names
+        cols = [c for c in wanted if c in available] if wanted else None
+        for batch in part.iter_batches(batch_size=batch_rows, columns=cols):
+            yield batch.to_pandas()
+
+
+def compact(dataset: str) -> Path:
+    """Rewrite a dataset as a single part holding only its latest rows."""
+    old = parts(dataset)
+    df = read(dataset)
+    if df.empty:
+        for path in old:
+            path.unlink()
+        return None
+
+    stamp = df["timestamp"].max().strftime("%Y%m%dT%H%M%S%f")
+    out = _dataset_dir(dataset) / f"part-{stamp}-compact-{uuid.uuid4().hex[:6]}.parquet"
+    df.to_parquet(out, index=False)
+    for path in old:
+        path.unlink()
+    return out
+
+
+def export_csv(dataset: str, path: Path):
+    """Write the latest rows, without bookkeeping columns, as a legacy CSV."""
+    df = read(dataset)
+    df.drop(columns=[c for c in META_COLUMNS if c in df.columns]).to_csv(path, index=False)
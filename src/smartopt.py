@@ -1,19 +1,76 @@
-import joblib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from pathlib import Path
-import pandas as pd
+import os
 
-from .feature_extractor import generate_ir, extract_features_from_ir
+from .feature_extractor import (
+    FEATURE_EXTRACTOR_VERSION,
+    FEATURES,
+    generate_ir,
+    extract_all_features,
+)
 from .benchmark_runner import (
+    BASELINE_FLAG,
+    COLLECT_METRICS,
+    COMPILE_PIPELINES,
     FLAGS,
-    build_compile_command,
-    measure_runtime,
-    run_command,
-    BIN_DIR
+    IR_PIPELINE_LINKERS,
+    METRIC_COLUMNS,
+    RACE_ROBUST_ROUNDS,
+    benchmark_flag,
+    collect_metrics,
+    compile_flag,
+    compiler_identity,
+    race_binaries,
 )
+from .model_registry import get_model
+from .flag_search import search_flags
+from .cache import CACHE_ENABLED, cache_key, get_cache, source_digest
+from .workspace import Workspace
+from . import telemetry
+from .profiler import format_profile, format_profile_diff, profile_binary, profile_diff
+
+ANALYSIS_MODES = ("full", "fast", "cost")
+
+# Source kinds analyze_batch picks up from a directory
+SOURCE_EXTENSIONS = (".c", ".cpp", ".rs")
+
+
+def model_input(model, feats):
+    """
+    DataFrame with exactly the columns the model was trained on, so models
+    trained with or without structural features both work. `feats` is one
+    feature dict or a list of them (one row each).
+    """
+    import pandas as pd
+
+    rows = [feats] if isinstance(feats, dict) else feats
+    columns = list(getattr(model, "feature_names_in_", FEATURES))
+    return pd.DataFrame(rows)[columns]
 
 
-ROOT = Path(__file__).resolve().parent.parent
-MODEL_PATH = ROOT / "data" / "model.pkl"
+def model_columns(mode: str = "full") -> list:
+    """Feature columns the model serving `mode` was trained on."""
+    if mode == "cost":
+        from .cost_model import get_cost_model
+
+        return list(get_cost_model()["feature_columns"])
+    return list(getattr(get_model(), "feature_names_in_", FEATURES))
+
+
+def needs_structural(columns: list) -> bool:
+    """Whether any of `columns` comes from ir_analysis rather than FEATURES."""
+    return not set(columns) <= set(FEATURES)
+
+
+def warmup():
+    """
+    Load the model and the pandas/NumPy stack ahead of the first request.
+    Safe to call more than once.
+    """
+    model = get_model()
+    names = getattr(model, "feature_names_in_", FEATURES)
+    model.predict(model_input(model, {name: 0.0 for name in names}))
 
 
 def predict_flag(src_path: Path) -> str:
@@ -21,91 +78,630 @@ def predict_flag(src_path: Path) -> str:
     Legacy function — only returns single prediction.
     """
     src_path = Path(src_path)
+    model = get_model()
     ll_path = generate_ir(src_path)
-    feats = extract_features_from_ir(ll_path)
-    X = pd.DataFrame([feats])
+    feats = extract_all_features(ll_path, needs_structural(model_columns()))
+
+    return model.predict(model_input(model, feats))[0]
+
+
+class SharedIR:
+    """
+    Lowers a source file to LLVM IR at most once per analysis, on first use.
+    With pipeline="ir" the IR is emitted optimizable and reused to build
+    every flag's binary (C/C++ only) as well as for feature extraction.
+
+    The IR and binaries go into `workspace` (never data/ir or data/bin)
+    and count against the workspace quota.
+    """
+
+    def __init__(self, src_path: Path, pipeline: str, workspace: Workspace):
+        if pipeline not in COMPILE_PIPELINES:
+            raise ValueError(f"Unknown compile pipeline: {pipeline}")
+        self.src_path = src_path
+        self.pipeline = pipeline
+        self.workspace = workspace
+        self._ll_path = None
+
+    @property
+    def bin_dir(self) -> Path:
+        return self.workspace.path
+
+    def track(self, path: Path):
+        self.workspace.track(path)
+
+    def ll_path(self) -> Path:
+        if self._ll_path is None:
+            with telemetry.stage("ir"):
+                self._ll_path = generate_ir(self.src_path, optimizable=self.pipeline == "ir",
+                                            out_dir=self.workspace.path)
+            self.track(self._ll_path)
+        return self._ll_path
+
+    def for_compile(self):
+        """IR to build binaries from, or None to compile from source."""
+        if self.pipeline != "ir" or self.src_path.suffix not in IR_PIPELINE_LINKERS:
+            return None
+        return self.ll_path()
+
+
+def _cached_features(ir: SharedIR, digest: str, cache, structural: bool = True):
+    """
+    Feature dict for the source; the structural ir_analysis features
+    (CFG, dominators, loops) are only computed when `structural`.
+    """
+    lang = ir.src_path.suffix
+    key = cache_key("features", digest, lang, compiler_identity(lang), ir.pipeline,
+                    FEATURE_EXTRACTOR_VERSION, "structural" if structural else "legacy")
+    if cache is not None:
+        feats = cache.get(key)
+        if feats is not None:
+            return feats
+
+    ll_path = ir.ll_path()
+    with telemetry.stage("features"):
+        feats = extract_all_features(ll_path, structural)
+    if cache is not None:
+        cache.put(key, feats)
+    return feats
+
+
+def _flag_key(ir: SharedIR, flag: str, digest: str, robust: bool) -> str:
+    lang = ir.src_path.suffix
+    mode = "robust" if robust else "single"
+    if COLLECT_METRICS:
+        mode += "+metrics"
+    return cache_key("flag", digest, flag, lang, compiler_identity(lang), mode, ir.pipeline)
+
+
+def _cached_benchmark(ir: SharedIR, flag: str, bin_path: Path, digest: str, cache,
+                      robust: bool = False):
+    key = _flag_key(ir, flag, digest, robust)
+    if cache is not None:
+        row = cache.get(key)
+        if row is not None:
+            cache.restore_binary(key, bin_path)
+            return row
+
+    row = benchmark_flag(ir.src_path, flag, bin_path, robust=robust, ir_file=ir.for_compile())
+    if cache is not None and (_cacheable(row) or row["status"].startswith("compile_error")):
+        cache.put(key, row, binary=bin_path if row["status"] == "ok" else None)
+    return row
+
+
+def _cacheable(row: dict) -> bool:
+    # Runtime errors (e.g. timeouts) may be transient, and so may a failed
+    # metrics run, so only cache complete successful runs; callers add
+    # deterministic compile errors.
+    return row["status"] == "ok" and not (COLLECT_METRICS and row.get("peak_rss_kb") is None)
+
+
+def _race_flags(ir: SharedIR, digest: str, cache, order: list, robust: bool,
+                bin_paths: dict) -> dict:
+    """
+    Rows for the flags in `order` (likeliest winner first), measured with
+    race_binaries(): slow candidates are cut short as "dominated" once a
+    faster flag has finished. Cached rows are reused and seed the race
+    with their runtime. Rows share cache entries with unraced runs, but
+    "dominated" rows are never cached since they depend on the other flags.
+    """
+    rows, keys, racing = {}, {}, {}
+    for flag in order:
+        keys[flag] = _flag_key(ir, flag, digest, robust)
+        row = cache.get(keys[flag]) if cache is not None else None
+        if row is not None:
+            cache.restore_binary(keys[flag], bin_paths[flag])
+            rows[flag] = row
+            continue
+        ok, row = compile_flag(ir.src_path, flag, bin_paths[flag], ir_file=ir.for_compile())
+        ir.track(bin_paths[flag])
+        rows[flag] = row
+        if ok:
+            racing[flag] = bin_paths[flag]
+        elif cache is not None:
+            cache.put(keys[flag], row)
+
+    known = [row["runtime"] for row in rows.values() if row.get("runtime") is not None]
+    outcome = race_binaries(racing, best=min(known, default=None),
+                            rounds=RACE_ROBUST_ROUNDS if robust else 1,
+                            warmup=1 if robust else 0)
+
+    for flag, (status, stats) in outcome.items():
+        row = rows[flag]
+        row.update(stats or {})
+        row["status"] = status
+        if status == "ok" and COLLECT_METRICS:
+            ok, extra, _ = collect_metrics(bin_paths[flag])
+            row.update(extra if ok else dict.fromkeys(METRIC_COLUMNS))
+        if _cacheable(row) and cache is not None:
+            cache.put(keys[flag], row, binary=bin_paths[flag])
+    return rows
+
+
+def _ranked(classes, proba_row) -> list:
+    proba = dict(zip(classes, proba_row))
+    ranked = [(flag, float(proba.get(flag, 0.0))) for flag in FLAGS]
+    return sorted(ranked, key=lambda fp: -fp[1])
+
+
+def rank_flags(model, X) -> list:
+    """
+    All FLAGS as (flag, probability) pairs, most likely first.
+    Flags the model never saw in training get probability 0.
+    """
+    return _ranked(model.classes_, model.predict_proba(X)[0])
+
+
+def flags_to_verify(ranked: list, mode: str, top_k: int, baseline: bool,
+                    costs: list = None) -> list:
+    """
+    Flags to actually benchmark, in FLAGS order. mode="cost" takes the
+    cost model's `costs` and picks its flags with
+    cost_model.flags_to_benchmark().
+    """
+    if not 1 <= top_k <= len(FLAGS):
+        raise ValueError(f"top_k must be between 1 and {len(FLAGS)}, got {top_k}")
+    if mode == "full":
+        return list(FLAGS)
+    if mode == "fast":
+        chosen = {flag for flag, _ in ranked[:top_k]}
+    elif mode == "cost":
+        from .cost_model import flags_to_benchmark
+
+        chosen = set(flags_to_benchmark(costs, top_k))
+    else:
+        raise ValueError(f"Unknown analysis mode: {mode}")
+
+    if baseline:
+        chosen.add(BASELINE_FLAG)
+    return [flag for flag in FLAGS if flag in chosen]
+
+
+def _cost_flags(costs: list, top_k: int, baseline: bool, profile: bool = False):
+    """
+    (ranked, verify, compile_only) for mode="cost": the predicted fastest
+    flag is only compiled unless it is benchmarked anyway (the model is
+    unsure, or profile=True, which needs a run).
+    """
+    ranked = [(c["flag"], c["probability"]) for c in costs]
+    verify = flags_to_verify(ranked, "cost", top_k, baseline, costs)
+    best = costs[0]["flag"]
+    if profile and best not in verify:
+        verify = [flag for flag in FLAGS if flag in verify or flag == best]
+    return ranked, verify, [] if best in verify else [best]
+
+
+def _compile_only(ir: SharedIR, flag: str, bin_path: Path, digest: str, cache,
+                  robust: bool):
+    """(row, measured): a cached benchmark row if there is one, else a compile-only row."""
+    key = _flag_key(ir, flag, digest, robust)
+    if cache is not None:
+        row = cache.get(key)
+        if row is not None:
+            cache.restore_binary(key, bin_path)
+            return row, True
+    _, row = compile_flag(ir.src_path, flag, bin_path, ir_file=ir.for_compile())
+    return row, False
+
 
-    model = joblib.load(MODEL_PATH)
-    return model.predict(X)[0]
+def _iter_flags(ir: SharedIR, digest: str, cache, ranked: list, verify: list,
+                robust: bool, bin_stem: str, profile: bool = False, race: bool = False,
+                costs: list = None, compile_only: list = ()):
+    """
+    Yield one row per FLAGS entry as soon as it is ready: "predicted"
+    placeholders for flags not in `verify` or `compile_only` first, then
+    the compile-only flags, then each benchmarked flag in FLAGS order as
+    it finishes.
+    With profile=True each successfully run binary also gets a `profile`.
+    With race=True the flags are raced (see _race_flags) instead of each
+    running to its own timeout; their rows then arrive after the race.
+    With `costs` (cost_model predictions) every row also carries its
+    predicted_* values and runtime_uncertainty.
+    """
+    probability = dict(ranked)
+    predicted = {c["flag"]: {k: v for k, v in c.items() if k not in ("flag", "probability")}
+                 for c in costs or []}
+    for flag in FLAGS:
+        if flag not in verify and flag not in compile_only:
+            yield {
+                "flag": flag,
+                "compile_time": None,
+                "runtime": None,
+                "binary_size": None,
+                "status": "predicted",
+                "probability": round(probability[flag], 4),
+                "verified": False,
+                **predicted.get(flag, {}),
+            }
+
+    for flag in compile_only:
+        bin_path = ir.bin_dir / f"{bin_stem}_tmp_{flag.replace('-', '')}"
+        row, measured = _compile_only(ir, flag, bin_path, digest, cache, robust)
+        ir.track(bin_path)
+        row["probability"] = round(probability[flag], 4)
+        row["verified"] = measured
+        row.update(predicted.get(flag, {}))
+        yield row
+
+    bin_paths = {flag: ir.bin_dir / f"{bin_stem}_tmp_{flag.replace('-', '')}"
+                 for flag in verify}
+    raced = {}
+    if race:
+        order = [flag for flag, _ in ranked if flag in verify]
+        raced = _race_flags(ir, digest, cache, order, robust, bin_paths)
+
+    for flag in verify:
+        bin_path = bin_paths[flag]
+        if race:
+            row = raced[flag]
+        else:
+            row = _cached_benchmark(ir, flag, bin_path, digest, cache, robust=robust)
+        ir.track(bin_path)
+        row["probability"] = round(probability[flag], 4)
+        row["verified"] = True
+        row.update(predicted.get(flag, {}))
+        if profile and row["status"] == "ok":
+            row["profile"] = profile_binary(bin_path)
+        yield row
+
+
+def _verify_flags(ir: SharedIR, digest: str, cache, ranked: list, verify: list,
+                  robust: bool, bin_stem: str, progress=None, profile: bool = False,
+                  race: bool = False, costs: list = None, compile_only: list = ()) -> list:
+    """
+    Every _iter_flags row, in FLAGS order. progress() counts the predict
+    step as 1.
+    """
+    total = 1 + len(verify)
+    done = 1
+    rows = {}
+    for row in _iter_flags(ir, digest, cache, ranked, verify, robust, bin_stem,
+                           profile=profile, race=race, costs=costs,
+                           compile_only=compile_only):
+        rows[row["flag"]] = row
+        if row["verified"]:
+            done += 1
+            if progress:
+                progress(done, total, row["flag"])
+    return [rows[flag] for flag in FLAGS]
+
+
+def iter_analysis(src_path: Path, use_cache: bool = True, robust: bool = False,
+                  mode: str = "full", top_k: int = 2, baseline: bool = True,
+                  pipeline: str = "source", workspace: Workspace = None,
+                  profile: bool = False, race: bool = False):
+    """
+    analyze_source() as a stream of events, each yielded as soon as known:
+
+        {"event": "prediction", "best_flag", "ranked", "verify", "costs"}
+            right after the model has predicted, before any compile
+            (costs is the cost model's ranking in mode="cost", else None)
+        {"event": "flag", "row"}
+            one per FLAGS entry: "predicted" placeholders, then every
+            benchmarked flag as soon as its compile/run is done
+        {"event": "done", "best_flag", "flags"}
+            all rows in FLAGS order
+
+    `ranked` is [(flag, probability)], most likely first. Options are as
+    for analyze_source(). Closing the generator early abandons the
+    remaining flags and removes the workspace.
+    """
+    src_path = Path(src_path)
+    cache = get_cache() if (use_cache and CACHE_ENABLED) else None
+    digest = source_digest(src_path)
+
+    with telemetry.ANALYSES, \
+            (nullcontext(workspace) if workspace else Workspace(prefix="analysis-")) as ws:
+        ir = SharedIR(src_path, pipeline, workspace=ws)
+
+        # 1️⃣ Extract features → ML predict best flag
+        feats = _cached_features(ir, digest, cache, needs_structural(model_columns(mode)))
+
+        costs, compile_only = None, []
+        if mode == "cost":
+            from .cost_model import get_cost_model, predict_costs
 
+            artifact = get_cost_model()
+            with telemetry.stage("predict"):
+                costs = predict_costs(artifact, feats)
+            best_flag = costs[0]["flag"]
+            ranked, verify, compile_only = _cost_flags(costs, top_k, baseline, profile)
+        else:
+            model = get_model()
+            with telemetry.stage("predict"):
+                X = model_input(model, feats)
+                best_flag = model.predict(X)[0]
+                ranked = rank_flags(model, X)
+            verify = flags_to_verify(ranked, mode, top_k, baseline)
+        yield {"event": "prediction", "best_flag": best_flag, "ranked": ranked,
+               "verify": verify, "costs": costs}
 
-def analyze_source(src_path: Path):
+        # 2️⃣ Benchmark the chosen flags
+        rows = {}
+        for row in _iter_flags(ir, digest, cache, ranked, verify, robust,
+                               src_path.stem, profile=profile, race=race, costs=costs,
+                               compile_only=compile_only):
+            rows[row["flag"]] = row
+            yield {"event": "flag", "row": row}
+
+    yield {"event": "done", "best_flag": best_flag,
+           "flags": [rows[flag] for flag in FLAGS]}
+
+
+def analyze_source(src_path: Path, use_cache: bool = True, robust: bool = False,
+                   progress=None, mode: str = "full", top_k: int = 2,
+                   baseline: bool = True, pipeline: str = "source", on_predict=None,
+                   workspace: Workspace = None, profile: bool = False,
+                   race: bool = False):
     """
     New SmartOpt engine:
     - Extracts LLVM IR features
     - Predicts best optimization flag
-    - Benchmarks all flags for this file
+    - Benchmarks all flags for this file (mode="full"), or only the model's
+      top_k most likely flags plus the -O0 baseline (mode="fast")
+
+    Every row has the model's `probability` for that flag and `verified`.
+    Flags skipped in fast mode come back with status "predicted" and no
+    measurements.
+
+    mode="cost" ranks the flags with the cost model (cost_model.py)
+    instead: every row gets predicted_runtime, predicted_binary_size,
+    predicted_compile_time and runtime_uncertainty, and `probability` is
+    the share of its trees that rank the flag fastest. When that share
+    reaches COST_CONFIDENCE for the predicted fastest flag, that flag is
+    only compiled (status "compiled"); otherwise the top_k predicted
+    fastest are benchmarked. The -O0 baseline is benchmarked as in fast
+    mode unless baseline=False, which makes a confident analysis
+    compile-only.
+
+    Features and per-flag results are cached on disk, keyed by the source
+    hash, flag, language and compiler version. Pass use_cache=False (or set
+    SMARTOPT_CACHE=0) to always recompute.
+
+    With robust=True every binary is warmed up and repeated until its 95%
+    confidence interval is tight; rows then also carry runtime_mean,
+    runtime_stddev, runtime_ci95, runs and cpu_time.
+
+    pipeline="ir" runs the C/C++ front end once and builds every flag from
+    that IR with opt/llc + link, instead of compiling from source per flag.
+
+    With profile=True every verified binary is run once more under a
+    sampling profiler (perf, else ptrace) and its row gets a `profile`
+    with the hottest functions; see profiler.profile_diff() to compare
+    the best flag against the baseline.
+
+    With race=True the chosen flags are compiled first, then run
+    interleaved, likeliest winner first; a run taking RACE_FACTOR x the
+    fastest so far is killed and its row gets status "dominated" (with
+    runtime_limit) instead of running to the fixed timeout.
+
+    `progress(done, total, stage)` is called after each step, if given.
+    For results as they happen, iterate iter_analysis() instead.
+    `on_predict(best_flag, ranked)` is called right after the prediction,
+    before any benchmarking, so callers can start dependent work early.
+
+    IR and binaries live in a private Workspace (RAM-backed when possible)
+    that is removed when the analysis ends. Pass `workspace` to use one the
+    caller owns and cleans up instead.
 
     Returns:
         best_flag : str
         flags : list[dict] (metrics table)
     """
-    src_path = Path(src_path)
+    total = done = 1
+    for event in iter_analysis(src_path, use_cache=use_cache, robust=robust, mode=mode,
+                               top_k=top_k, baseline=baseline, pipeline=pipeline,
+                               workspace=workspace, profile=profile, race=race):
+        if event["event"] == "prediction":
+            if on_predict:
+                on_predict(event["best_flag"], event["ranked"])
+            total = 1 + len(event["verify"])
+            if progress:
+                progress(1, total, "predict")
+        elif event["event"] == "flag" and event["row"]["verified"]:
+            done += 1
+            if progress:
+                progress(done, total, event["row"]["flag"])
+        elif event["event"] == "done":
+            return event["best_flag"], event["flags"]
 
-    # 1️⃣ Extract features → ML predict best flag
-    ll_path = generate_ir(src_path)
-    feats = extract_features_from_ir(ll_path)
-    X = pd.DataFrame([feats])
 
-    model = joblib.load(MODEL_PATH)
-    best_flag = model.predict(X)[0]
+def collect_batch_sources(root: Path) -> list:
+    """Every C/C++/Rust source file under a directory, sorted."""
+    return sorted(p for p in Path(root).rglob("*")
+                  if p.is_file() and p.suffix in SOURCE_EXTENSIONS)
 
-    # 2️⃣ Benchmark all flags
-    results = []
-    for flag in FLAGS:
-        bin_name = f"{src_path.stem}_tmp_{flag.replace('-', '')}"
-        bin_path = BIN_DIR / bin_name
-
-        # compile
-        compile_cmd = build_compile_command(src_path, flag, bin_path)
-        ok, compile_time, err = run_command(compile_cmd)
-        if not ok:
-            results.append({
-                "flag": flag,
-                "compile_time": None,
-                "runtime": None,
-                "binary_size": None,
-                "status": f"compile_error: {err}"
-            })
-            continue
 
-        # run
-        ok, runtime, err = measure_runtime(bin_path)
-        if not ok:
-            size = bin_path.stat().st_size if bin_path.exists() else None
-            results.append({
-                "flag": flag,
-                "compile_time": round(compile_time, 5),
-                "runtime": None,
-                "binary_size": size,
-                "status": f"runtime_error: {err}"
-            })
-            continue
+def _batch_features(src_path: Path, cache, pipeline: str, structural: bool):
+    digest = source_digest(src_path)
+    workspace = Workspace(prefix="batch-")
+    try:
+        ir = SharedIR(src_path, pipeline, workspace=workspace)
+        return ir, digest, _cached_features(ir, digest, cache, structural)
+    except BaseException:
+        workspace.close()
+        raise
+
 
-        results.append({
-            "flag": flag,
-            "compile_time": round(compile_time, 5),
-            "runtime": round(runtime, 5),
-            "binary_size": bin_path.stat().st_size,
-            "status": "ok"
-        })
+def _close_workspace(ir: SharedIR):
+    ir.workspace.close()
 
-    return best_flag, results
+
+def analyze_batch(src_paths: list, use_cache: bool = True, robust: bool = False,
+                  mode: str = "fast", top_k: int = 2, baseline: bool = True,
+                  pipeline: str = "source", benchmark: bool = True,
+                  jobs: int = None, bench_jobs: int = 1):
+    """
+    analyze_source for many files, yielding one dict per file as soon as
+    it is done:
+        {"index", "source", "best_flag", "flags", "error"}
+
+    IR lowering and feature extraction run on `jobs` threads, then the
+    whole batch is predicted with a single predict_proba call (one cost
+    model pass for mode="cost") over the stacked feature matrix. With
+    benchmark=True the chosen flags are verified on `bench_jobs` threads
+    (keep 1 for undisturbed timings); with benchmark=False every row is
+    "predicted". A file that fails is yielded with `error` set instead of
+    aborting the batch.
+
+    Each file gets its own Workspace, removed as soon as that file is done.
+    """
+    src_paths = [Path(p) for p in src_paths]
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode: {mode}")
+    cache = get_cache() if (use_cache and CACHE_ENABLED) else None
+    jobs = jobs or os.cpu_count() or 1
+
+    def failed(i, error):
+        return {"index": i, "source": str(src_paths[i]), "best_flag": None,
+                "flags": [], "error": error}
+
+    structural = needs_structural(model_columns(mode))
+    extracted = {}
+    try:
+        # 1️⃣ Lower + extract features in parallel
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(_batch_features, p, cache, pipeline, structural): i
+                       for i, p in enumerate(src_paths)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    extracted[i] = future.result()
+                except Exception as e:
+                    yield failed(i, str(e))
+
+        if not extracted:
+            return
+
+        # 2️⃣ One prediction over the stacked feature matrix
+        order = sorted(extracted)
+        feats = [extracted[i][2] for i in order]
+        if mode == "cost":
+            from .cost_model import get_cost_model, predict_many
+
+            costs = predict_many(get_cost_model(), feats)
+            best = [c[0]["flag"] for c in costs]
+        else:
+            model = get_model()
+            proba = model.predict_proba(model_input(model, feats))
+            best = model.classes_[proba.argmax(axis=1)]
+
+        def verify_one(row, i):
+            ir, digest, _ = extracted[i]
+            try:
+                if mode == "cost":
+                    ranked, verify, compile_only = _cost_flags(costs[row], top_k, baseline)
+                    if not benchmark:
+                        verify, compile_only = [], []
+                    flags = _verify_flags(ir, digest, cache, ranked, verify, robust,
+                                          f"{ir.src_path.stem}_b{i}", costs=costs[row],
+                                          compile_only=compile_only)
+                else:
+                    ranked = _ranked(model.classes_, proba[row])
+                    verify = flags_to_verify(ranked, mode, top_k, baseline) if benchmark else []
+                    flags = _verify_flags(ir, digest, cache, ranked, verify, robust,
+                                          f"{ir.src_path.stem}_b{i}")
+            finally:
+                _close_workspace(ir)
+            return {"index": i, "source": str(ir.src_path), "best_flag": str(best[row]),
+                    "flags": flags, "error": None}
+
+        # 3️⃣ Verify, streaming each file's result as it finishes
+        pool = ThreadPoolExecutor(max_workers=max(1, bench_jobs))
+        try:
+            futures = {pool.submit(verify_one, row, i): i for row, i in enumerate(order)}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield failed(futures[future], str(e))
+        finally:
+            # Stop queued work if the consumer goes away mid-stream
+            pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        for ir, _, _ in extracted.values():
+            _close_workspace(ir)
 
 
 def cli():
     import argparse
     parser = argparse.ArgumentParser(description="SmartOpt CLI")
-    parser.add_argument("source", help="Path to C/C++/Rust source file")
+    parser.add_argument("source", help="Path to a C/C++/Rust source file, or a directory")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached results and re-run everything")
+    parser.add_argument("--robust", action="store_true",
+                        help="Repeat runs until timings are statistically stable")
+    parser.add_argument("--fast", action="store_true",
+                        help="Only benchmark the model's top-k flags plus -O0")
+    parser.add_argument("--top-k", type=int, default=2,
+                        help="Number of predicted flags to verify in --fast/--cost mode")
+    parser.add_argument("--cost", action="store_true",
+                        help="Rank flags with the cost model; benchmark only when it is unsure")
+    parser.add_argument("--ir-pipeline", action="store_true",
+                        help="Run the C/C++ front end once and build each flag with opt/llc")
+    parser.add_argument("--search", action="store_true",
+                        help="Search flag combinations beyond -O levels (successive halving)")
+    parser.add_argument("--budget", type=float, default=60.0,
+                        help="Wall-clock seconds for --search")
+    parser.add_argument("--race", action="store_true",
+                        help="Race the flags and cut runs much slower than the best short")
+    parser.add_argument("--profile", action="store_true",
+                        help="Sample-profile each verified binary and show hot functions")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="Directory mode: parallel IR/feature workers (default: CPU count)")
+    parser.add_argument("--bench-jobs", type=int, default=1,
+                        help="Directory mode: files benchmarked at once")
+    parser.add_argument("--predict-only", action="store_true",
+                        help="Directory mode: skip benchmarking, only predict")
     args = parser.parse_args()
 
-    best_flag, stats = analyze_source(args.source)
+    if args.search:
+        result = search_flags(args.source, budget=args.budget)
+        print(f"\nSmartOpt flag search for {args.source}:")
+        print(f"Best configuration: {' '.join(result['flags'] or ['(none)'])}")
+        print(f"Runtime: {result['runtime']}s "
+              f"({result['compiled']}/{result['sampled']} candidates compiled)")
+        return
+
+    mode = "cost" if args.cost else "fast" if args.fast else "full"
+    pipeline = "ir" if args.ir_pipeline else "source"
+
+    if Path(args.source).is_dir():
+        sources = collect_batch_sources(args.source)
+        print(f"\nSmartOpt batch over {len(sources)} files in {args.source}:")
+        for item in analyze_batch(sources, use_cache=not args.no_cache,
+                                  robust=args.robust, mode=mode, top_k=args.top_k,
+                                  pipeline=pipeline, benchmark=not args.predict_only,
+                                  jobs=args.jobs, bench_jobs=args.bench_jobs):
+            if item["error"]:
+                print(f"❌ {item['source']}: {item['error']}")
+            else:
+                print(f"👉 {item['source']}: {item['best_flag']}")
+        return
+
+    best_flag, stats = analyze_source(args.source, use_cache=not args.no_cache,
+                                      robust=args.robust, mode=mode,
+                                      top_k=args.top_k, pipeline=pipeline,
+                                      profile=args.profile, race=args.race)
 
     print(f"\nSmartOpt result for {args.source}:")
     print(f"Best Flag: {best_flag}")
     print("All flags:")
     for row in stats:
-        print(row)
+        print({k: v for k, v in row.items() if k != "profile"})
+
+    if args.profile:
+        for row in stats:
+            if row.get("profile"):
+                print(f"\n🔥 Hot functions at {row['flag']} "
+                      f"({row['profile']['samples']} samples via {row['profile']['sampler']}):")
+                for line in format_profile(row["profile"]):
+                    print(line)
+        diff = profile_diff(stats, best_flag)
+        if diff:
+            print(f"\n🔬 Where {best_flag} saves time over {diff['baseline_flag']} (samples):")
+            for line in format_profile_diff(diff):
+                print(line)
 
 
 if __name__ == "__main__":
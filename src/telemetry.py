@@ -0,0 +1,229 @@
+import bisect
+import os
+import threading
+import time
+
+# Off by default so the CLI and library pay nothing; the backend turns it
+# on for /metrics unless SMARTOPT_TELEMETRY=0.
+TELEMETRY_ENABLED = os.getenv("SMARTOPT_TELEMETRY", "0") == "1"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = TELEMETRY_ENABLED
+_metrics = []
+_lock = threading.Lock()
+
+
+def enable(on: bool = True):
+    global _enabled
+    _enabled = on
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """
+    Base of all series. Each registers itself in `registry`, a plain list
+    that render() walks; the default is the process-wide one /metrics serves.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), registry: list = None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        with _lock:
+            (_metrics if registry is None else registry).append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}",
+                *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), registry: list = None):
+        super().__init__(name, help, labelnames, registry)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}"
+                for key, v in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """
+    A value read at scrape time from `fn`, which returns a number or a
+    {label values tuple: number} dict. Costs nothing between scrapes.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn, labelnames: tuple = (),
+                 registry: list = None):
+        super().__init__(name, help, labelnames, registry)
+        self.fn = fn
+
+    def _samples(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}"
+                for key, v in sorted(value.items()) if v is not None]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS, registry: list = None):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not _enabled:
+            return
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labels) if _enabled else _NOOP
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, n) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, c in zip((*self.buckets, "+Inf"), counts):
+                cumulative += c
+                le = 'le="%s"' % (bound if bound == "+Inf" else _number(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP = _NoopTimer()
+
+
+class InFlight:
+    """Counts blocks currently running; read it with a Gauge."""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self.value += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.value -= 1
+
+
+# Shared series instrumented across the engine and the backend
+STAGE_SECONDS = Histogram(
+    "smartopt_stage_seconds",
+    "Latency of analysis stages (ir, features, model_load, predict, compile, run, llm).",
+    ("stage",))
+FAILURES = Counter(
+    "smartopt_failures_total",
+    "Failed compiles, runs and LLM calls.",
+    ("stage",))
+ANALYSES = InFlight()
+Gauge("smartopt_analyses_in_flight", "analyze_source() calls currently running.",
+      lambda: ANALYSES.value)
+
+
+def stage(name: str):
+    """Time a block into smartopt_stage_seconds{stage=name}."""
+    return STAGE_SECONDS.time(stage=name)
+
+
+def render(registry: list = None) -> str:
+    """
+    All metrics of `registry` (default: the process-wide one) in the
+    Prometheus text exposition format.
+    """
+    with _lock:
+        metrics = list(_metrics if registry is None else registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
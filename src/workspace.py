@@ -0,0 +1,137 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+
+# Where workspaces live. Default: /dev/shm when it can hold the quota and
+# allows executing binaries (Docker mounts it noexec), else the temp dir.
+WORKSPACE_DIR = os.getenv("SMARTOPT_WORKSPACE_DIR")
+
+# Total bytes all live workspaces of this process may hold
+WORKSPACE_QUOTA_BYTES = int(os.getenv("SMARTOPT_WORKSPACE_QUOTA_BYTES", 512 * 1024 * 1024))
+
+RAM_BACKED_DIR = Path("/dev/shm")
+
+
+class WorkspaceQuotaExceeded(Exception):
+    """Raised when tracked artifacts would exceed the workspace quota."""
+
+
+def _can_execute_in(directory: Path) -> bool:
+    probe = directory / f".smartopt-exec-{uuid.uuid4().hex[:8]}"
+    try:
+        probe.write_text("#!/bin/sh\nexit 0\n")
+        probe.chmod(0o700)
+        return subprocess.run([str(probe)], timeout=5).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+    finally:
+        probe.unlink(missing_ok=True)
+
+
+_root = None
+_root_lock = threading.Lock()
+
+
+def workspace_root() -> Path:
+    """Parent directory of all workspaces, chosen once per process."""
+    global _root
+    with _root_lock:
+        if _root is None:
+            if WORKSPACE_DIR:
+                _root = Path(WORKSPACE_DIR)
+            elif (RAM_BACKED_DIR.is_dir() and os.access(RAM_BACKED_DIR, os.W_OK)
+                  and shutil.disk_usage(RAM_BACKED_DIR).free >= WORKSPACE_QUOTA_BYTES
+                  and _can_execute_in(RAM_BACKED_DIR)):
+                _root = RAM_BACKED_DIR / "smartopt"
+            else:
+                _root = Path(tempfile.gettempdir()) / "smartopt"
+            _root.mkdir(parents=True, exist_ok=True)
+        return _root
+
+
+class _Quota:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def charge(self, nbytes: int):
+        with self._lock:
+            if self.used + nbytes > self.limit:
+                raise WorkspaceQuotaExceeded(
+                    f"workspace quota of {self.limit} bytes exhausted "
+                    f"({self.used} in use, {nbytes} requested)")
+            self.used += nbytes
+
+    def release(self, nbytes: int):
+        with self._lock:
+            self.used -= nbytes
+
+
+_quota = _Quota(WORKSPACE_QUOTA_BYTES)
+
+
+class Workspace:
+    """
+    Private scratch directory for one analysis (IR, binaries, sources).
+
+    Use as a context manager: the directory and everything in it is
+    removed on exit, error or not. Files registered with track()/write()
+    count against a process-wide byte quota until the workspace closes;
+    going over raises WorkspaceQuotaExceeded.
+    """
+
+    def __init__(self, prefix: str = "ws-", quota: _Quota = None):
+        self.quota = quota or _quota
+        self.path = Path(tempfile.mkdtemp(prefix=prefix, dir=workspace_root()))
+        self.bytes = 0
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def track(self, path: Path) -> Path:
+        """Count a file written into the workspace (re-tracking updates it)."""
+        path = Path(path)
+        size = path.stat().st_size if path.exists() else 0
+        with self._lock:
+            delta = size - self._tracked.get(path, 0)
+            if delta > 0:
+                self.quota.charge(delta)
+            elif delta < 0:
+                self.quota.release(-delta)
+            self._tracked[path] = size
+            self.bytes += delta
+        return path
+
+    def write(self, name: str, content: bytes) -> Path:
+        path = self.path / name
+        path.write_bytes(content)
+        return self.track(path)
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.quota.release(self.bytes)
+            self.bytes = 0
+            self._tracked.clear()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def quota_stats() -> dict:
+    return {
+        "root": str(workspace_root()),
+        "quota_bytes": _quota.limit,
+        "used_bytes": _quota.used,
+    }
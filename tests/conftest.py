@@ -0,0 +1,19 @@
+import pytest
+
+import src.benchmark_runner as benchmark_runner
+import src.cache as cache
+import src.feature_extractor as feature_extractor
+import src.result_store as result_store
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dirs(monkeypatch, tmp_path):
+    """Point the analysis cache, result store, manifest, IR and binaries at tmp_path."""
+    monkeypatch.setenv("SMARTOPT_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("SMARTOPT_STORE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(result_store, "STORE_DIR", tmp_path / "store")
+    monkeypatch.setattr(feature_extractor, "MANIFEST_PATH", tmp_path / "features_manifest.json")
+    monkeypatch.setattr(feature_extractor, "IR_DIR", tmp_path / "ir")
+    monkeypatch.setattr(benchmark_runner, "BIN_DIR", tmp_path / "bin")
@@ -0,0 +1,24 @@
+from src.model_trainer import DEFAULT_WEIGHTS, compute_balanced_metric, parse_weights
+import pandas as pd
+import pytest
+
+def test_balanced_metric_extra_columns():
+    df = pd.DataFrame({
+        "file": ["a", "a"], "flag": ["-O2", "-O3"],
+        "runtime": [1.0, 1.0], "binary_size": [100, 100], "compile_time": [0.1, 0.1],
+        "peak_rss_kb": [5000, 9000],
+    })
+    weights = parse_weights(["peak_rss_kb=0.5", "compile_time=0"])
+    assert "compile_time" not in weights and weights["runtime"] == DEFAULT_WEIGHTS["runtime"]
+
+    df = compute_balanced_metric(df, weights)
+    assert list(df["peak_rss_kb_norm"]) == [0.0, 1.0]
+    assert df.loc[0, "balanced_score"] < df.loc[1, "balanced_score"]
+
+    # The default weights keep the historical column names
+    assert "runtime_norm" in compute_balanced_metric(df).columns
+
+def test_parse_weights_rejects_malformed_specs():
+    for spec in ("peak_rss_kb", "=0.5", "runtime=fast"):
+        with pytest.raises(ValueError):
+            parse_weights([spec])
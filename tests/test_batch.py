@@ -0,0 +1,103 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import backend.main as backend
+import src.smartopt as smartopt
+import src.workspace as workspace
+from src.workspace import Workspace
+
+
+class CountingModel:
+    classes_ = np.array(["-O1", "-O2", "-O3"])
+    feature_names_in_ = np.array(["size"])
+    calls = 0
+
+    def predict_proba(self, X):
+        CountingModel.calls += 1
+        # -O3 for big inputs, -O1 otherwise
+        big = (X["size"].to_numpy() > 10).astype(float)
+        return np.column_stack([1 - big, np.zeros(len(X)), big])
+
+
+def test_analyze_batch_predicts_once_and_reports_failures(monkeypatch, tmp_path):
+    sources = []
+    for name, size in [("a.c", 1), ("b.rs", 50), ("broken.c", 0)]:
+        path = tmp_path / name
+        path.write_text(" " * size)
+        sources.append(path)
+
+    workspaces = []
+
+    def fake_features(src_path, cache, pipeline, structural):
+        if src_path.name == "broken.c":
+            raise RuntimeError("IR generation failed")
+        workspaces.append(Workspace(prefix="batch-"))
+        ir = smartopt.SharedIR(src_path, pipeline, workspace=workspaces[-1])
+        return ir, "digest", {"size": src_path.stat().st_size}
+
+    monkeypatch.setattr(smartopt, "_batch_features", fake_features)
+    monkeypatch.setattr(smartopt, "get_model", CountingModel)
+
+    items = list(smartopt.analyze_batch(sources, use_cache=False, benchmark=False, jobs=2))
+    by_name = {item["source"].rsplit("/", 1)[-1]: item for item in items}
+
+    assert CountingModel.calls == 1
+    assert by_name["a.c"]["best_flag"] == "-O1"
+    assert by_name["b.rs"]["best_flag"] == "-O3"
+    assert all(not row["verified"] for row in by_name["b.rs"]["flags"])
+    assert by_name["broken.c"]["error"] == "IR generation failed"
+    # Every file built into its own workspace, removed once it was done
+    assert len(workspaces) == 2 and all(not ws.path.exists() for ws in workspaces)
+
+
+def test_analyze_batch_endpoint_streams_ndjson(monkeypatch):
+    def fake_batch(src_paths, **options):
+        for i, src in enumerate(src_paths):
+            yield {"index": i, "source": str(src), "best_flag": "-O2",
+                   "flags": [{"flag": "-O2", "verified": True}], "error": None}
+
+    monkeypatch.setattr(backend, "analyze_batch", fake_batch)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("repo/src/main.rs", "fn main() {}")
+        zf.writestr("repo/README.md", "not a source")
+
+    client = TestClient(backend.app)
+    response = client.post("/analyze-batch?benchmark=false", files=[
+        ("files", ("sort.c", b"int main(){}", "text/plain")),
+        ("files", ("repo.zip", archive.getvalue(), "application/zip")),
+    ])
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line["filename"] for line in lines) == ["archive_1/repo/src/main.rs", "sort.c"]
+    assert all(line["verified_flags"] == ["-O2"] for line in lines)
+
+
+def test_analyze_batch_rejects_archives_too_big_to_unpack(monkeypatch):
+    quota = workspace._Quota(64 * 1024)
+    monkeypatch.setattr(workspace, "_quota", quota)
+    client = TestClient(backend.app)
+
+    # Compresses to about 1 KiB, unpacks to 1 MiB
+    bomb = io.BytesIO()
+    with zipfile.ZipFile(bomb, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("big.c", b"\0" * (1024 * 1024))
+    response = client.post("/analyze-batch", files=[
+        ("files", ("bomb.zip", bomb.getvalue(), "application/zip"))])
+    assert response.status_code == 413 and "workspace quota" in response.json()["detail"]
+
+    monkeypatch.setattr(backend, "MAX_ARCHIVE_MEMBERS", 2)
+    many = io.BytesIO()
+    with zipfile.ZipFile(many, "w") as zf:
+        for i in range(3):
+            zf.writestr(f"f{i}.c", "int main(){}")
+    response = client.post("/analyze-batch", files=[
+        ("files", ("many.zip", many.getvalue(), "application/zip"))])
+    assert response.status_code == 413 and "at most 2" in response.json()["detail"]
+    assert quota.used == 0
@@ -0,0 +1,74 @@
+from src.cache import STALE_TMP_SECONDS, AnalysisCache, cache_key
+import os
+import threading
+import time
+from pathlib import Path
+import tempfile
+
+def test_cache_roundtrip_and_eviction():
+    cache = AnalysisCache(Path(tempfile.mkdtemp()), max_bytes=10_000)
+
+    key = cache_key("flag", "abc", "-O2", ".c", "clang 17")
+    assert cache.get(key) is None
+
+    cache.put(key, {"flag": "-O2", "runtime": 0.1, "status": "ok"})
+    assert cache.get(key)["runtime"] == 0.1
+    assert cache.stats()["hits"] == 1
+
+    # Newer entries push the oldest ones out once over max_bytes
+    for i in range(50):
+        cache.put(cache_key("flag", i), {"pad": "x" * 500})
+    assert cache.get(key) is None
+    assert sum(p.stat().st_size for p in cache.root.iterdir()) <= 10_000
+
+def test_concurrent_puts_of_the_same_key():
+    cache = AnalysisCache(Path(tempfile.mkdtemp()))
+    binary = cache.root / "src.bin"
+    cache.root.mkdir(parents=True, exist_ok=True)
+    binary.write_bytes(b"\x7fELF")
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(100):
+                cache.put("k", {"writer": n, "i": i}, binary=binary)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert cache.get("k")["i"] == 99
+    assert not list(cache.root.glob("*.tmp"))
+    # A binary evicted between lookup and copy is just a miss
+    assert cache.restore_binary("missing", cache.root / "out") is False
+
+def test_put_scans_only_at_startup_and_when_over_the_limit(monkeypatch):
+    root = Path(tempfile.mkdtemp())
+    stale = root / "crashed.tmp"
+    stale.write_bytes(b"x" * 100)
+    old = time.time() - STALE_TMP_SECONDS - 1
+    os.utime(stale, (old, old))
+    (root / "in-progress.tmp").write_bytes(b"x")
+
+    cache = AnalysisCache(root, max_bytes=10_000)
+    scans = []
+    evict = cache.evict
+    monkeypatch.setattr(cache, "evict", lambda: scans.append(1) or evict())
+
+    cache.put("first", {"pad": "x" * 100})
+    assert len(scans) == 1
+    # Left by a crashed writer: removed by the scan; a live writer's file stays
+    assert not stale.exists() and (root / "in-progress.tmp").exists()
+
+    for i in range(10):
+        cache.put(cache_key("flag", i), {"pad": "x" * 500})
+    assert len(scans) == 1
+    for i in range(10, 30):
+        cache.put(cache_key("flag", i), {"pad": "x" * 500})
+    assert len(scans) > 1
+    assert sum(p.stat().st_size for p in root.glob("*.json")) <= 10_000
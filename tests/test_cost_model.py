@@ -0,0 +1,66 @@
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+import backend.main as backend
+import src.cost_model as cost_model
+import src.result_store as store
+import src.smartopt as smartopt
+from src.benchmark_runner import FLAGS
+from src.model_trainer import FEATURE_COLUMNS
+
+
+def _train(monkeypatch):
+    monkeypatch.setattr(store, "STORE_DIR", Path(tempfile.mkdtemp()))
+    files = [f"p{i}" for i in range(30)]
+    store.append("features", [{"file": f, **{col: float(i + 1) for col in FEATURE_COLUMNS}}
+                              for i, f in enumerate(files)])
+    # -O3 is always twice as fast, -Os always smallest
+    store.append("results", [
+        {"file": f, "language": ".rs", "flag": flag, "compile_time": 0.1 * (j + 1),
+         "runtime": 0.01 * (i + 1) * (0.5 if flag == "-O3" else 1.0),
+         "binary_size": 8000 if flag == "-Os" else 10000, "status": "ok"}
+        for i, f in enumerate(files) for j, flag in enumerate(FLAGS)
+    ])
+    return cost_model.train(n_estimators=20, n_jobs=1)
+
+
+def test_cost_model_ranks_and_skips_benchmarks_when_confident(monkeypatch):
+    artifact, report = _train(monkeypatch)
+    assert report["pairs"] == 30 * len(FLAGS)
+    assert report["test"]["accuracy"] == 1.0
+
+    costs = cost_model.predict_costs(artifact, {col: 10.0 for col in FEATURE_COLUMNS})
+    assert [c["flag"] for c in costs][0] == "-O3" and len(costs) == len(FLAGS)
+    assert costs[0]["predicted_runtime"] < costs[1]["predicted_runtime"]
+    assert min(costs, key=lambda c: c["predicted_binary_size"])["flag"] == "-Os"
+    assert cost_model.flags_to_benchmark(costs, top_k=2) == []
+    assert cost_model.flags_to_benchmark(costs, top_k=2, threshold=1.01) == \
+        [f for f in FLAGS if f in {costs[0]["flag"], costs[1]["flag"]}]
+
+    monkeypatch.setattr(cost_model, "get_cost_model", lambda: artifact)
+    src = Path(tempfile.mkdtemp()) / "cost.rs"
+    src.write_text("fn main() { println!(\"{}\", (0..1000u64).sum::<u64>()); }\n")
+    best_flag, rows = smartopt.analyze_source(src, use_cache=False, mode="cost",
+                                              baseline=False)
+
+    assert best_flag == "-O3"
+    by_flag = {row["flag"]: row for row in rows}
+    # Confident: the predicted winner is only compiled, nothing is run
+    assert by_flag["-O3"]["status"] == "compiled" and by_flag["-O3"]["binary_size"] > 0
+    assert all(row["status"] == "predicted" for f, row in by_flag.items() if f != "-O3")
+    assert all(row["runtime"] is None and row["predicted_runtime"] > 0 for row in rows)
+
+    # The baseline is still measured by default, so the winner can be compared to it
+    _, rows = smartopt.analyze_source(src, use_cache=False, mode="cost")
+    by_flag = {row["flag"]: row for row in rows}
+    assert by_flag["-O0"]["status"] == "ok" and by_flag["-O0"]["runtime"] > 0
+    assert by_flag["-O3"]["status"] == "compiled"
+
+
+def test_cost_mode_without_a_model_is_unavailable(monkeypatch, tmp_path):
+    monkeypatch.setattr(backend, "COST_MODEL_PATH", tmp_path / "cost_model.pkl")
+    response = TestClient(backend.app).post(
+        "/analyze-code", json={"code": "fn main() {}", "language": "rust", "mode": "cost"})
+    assert response.status_code == 503 and "cost_model.py" in response.json()["detail"]
@@ -0,0 +1,31 @@
+from src.smartopt import flags_to_verify, rank_flags
+from backend.main import app
+from fastapi.testclient import TestClient
+import numpy as np
+import pytest
+
+class StubModel:
+    classes_ = np.array(["-O1", "-O2", "-O3"])
+
+    def predict_proba(self, X):
+        return np.array([[0.2, 0.5, 0.3]])
+
+def test_fast_mode_verifies_top_k_plus_baseline():
+    ranked = rank_flags(StubModel(), None)
+    assert [f for f, _ in ranked[:3]] == ["-O2", "-O3", "-O1"]
+    assert dict(ranked)["-Os"] == 0.0
+
+    assert flags_to_verify(ranked, "fast", top_k=2, baseline=True) == ["-O0", "-O2", "-O3"]
+    assert flags_to_verify(ranked, "fast", top_k=1, baseline=False) == ["-O2"]
+    assert len(flags_to_verify(ranked, "full", top_k=1, baseline=False)) == 5
+
+def test_top_k_out_of_range_is_rejected():
+    ranked = rank_flags(StubModel(), None)
+    for top_k in (-2, 0, 6):
+        with pytest.raises(ValueError):
+            flags_to_verify(ranked, "fast", top_k=top_k, baseline=True)
+
+    client = TestClient(app)
+    for top_k in (-2, 0, 6):
+        response = client.post("/analyze-code", json={"code": "int main(){}", "top_k": top_k})
+        assert response.status_code == 422
@@ -0,0 +1,30 @@
+import src.feature_extractor as fe
+from pathlib import Path
+import tempfile
+
+SAMPLE_IR = """define i32 @main() #0 {
+entry:
+  %0 = load i32, ptr %a, align 4
+  %add = add nsw i32 %0, 1
+  store i32 %add, ptr %a, align 4
+  %cmp = icmp slt i32 %add, 10
+  br i1 %cmp, label %loop, label %exit
+loop:
+  %f = fcmp olt double %x, %y
+  br label %entry, !llvm.loop !5
+exit:
+  ret i32 0
+}
+"""
+
+def test_streaming_scanner_matches_regex_reference(monkeypatch):
+    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".ll") as tmp:
+        tmp.write(SAMPLE_IR * 3)
+        path = Path(tmp.name)
+
+    expected = fe.extract_features_regex(path)
+
+    # Tiny chunks force matches across chunk boundaries
+    for chunk in (1, 64, 1 << 20):
+        monkeypatch.setattr(fe, "SCAN_CHUNK_BYTES", chunk)
+        assert fe.extract_features_from_ir(path) == expected
@@ -0,0 +1,61 @@
+from src.flag_search import SEARCH_SPACE, sample_configs
+from src.benchmark_runner import FLAGS
+from pathlib import Path
+import src.flag_search as flag_search
+import random
+import tempfile
+
+def test_sample_configs_starts_with_plain_flags_and_is_unique():
+    configs = sample_configs(".cpp", 20, random.Random(0))
+
+    assert configs[:len(FLAGS)] == [(flag, ()) for flag in FLAGS]
+    assert len(configs) == 20
+    assert len(set(configs)) == 20
+
+    allowed = {opt for group in SEARCH_SPACE[".cpp"].values() for opt in group if opt}
+    assert all(set(extra) <= allowed for _, extra in configs)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+def _fake_search(monkeypatch, budget):
+    clock = FakeClock()
+    calls = []
+
+    def median_runtime(bin_path, reps, timeout):
+        i = int(bin_path.name.rsplit("_", 1)[1])
+        calls.append((i, reps))
+        clock.now += reps
+        # Candidate 6 looks fastest until measured with more reps
+        if i == 6:
+            return 1.0 if reps < 4 else 3.0
+        return 1.5 if i == 7 else 2.0 + i
+
+    monkeypatch.setattr(flag_search, "time", clock)
+    monkeypatch.setattr(flag_search, "run_command", lambda cmd: (True, 0.1, ""))
+    monkeypatch.setattr(flag_search, "_median_runtime", median_runtime)
+    src = Path(tempfile.mkdtemp()) / "search.rs"
+    src.write_text("fn main() {}\n")
+    return flag_search.search_flags(src, budget=budget, population=8), calls
+
+def test_successive_halving_order_and_rep_growth(monkeypatch):
+    result, calls = _fake_search(monkeypatch, budget=1000)
+
+    assert [r["reps"] for r in result["rungs"]] == [1, 2, 4, 8]
+    assert [len(r["candidates"]) for r in result["rungs"]] == [8, 4, 2, 1]
+    # Fastest first in each rung, and only survivors are re-run
+    assert [i for i, reps in calls if reps == 2] == [6, 7, 0, 1]
+    assert result["runtime"] == 1.5 and calls[-1] == (7, 8)
+
+def test_budget_cut_mid_rung_compares_latest_runtimes(monkeypatch):
+    # Rungs 1 and 2 cost 8 + 8 seconds; rung 3 is cut after candidate 6
+    result, calls = _fake_search(monkeypatch, budget=18)
+
+    assert calls[-1] == (6, 4)
+    assert [r["reps"] for r in result["rungs"]] == [1, 2, 4]
+    # 6 re-measured at 3.0; 7 was never re-run but its 1.5 still wins
+    assert result["runtime"] == 1.5
@@ -0,0 +1,46 @@
+from pathlib import Path
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+import src.forest_inference as forest_inference
+from src.forest_inference import NumpyForest, export_forest
+from src.model_registry import ModelRegistry
+
+
+def test_numpy_forest_matches_sklearn(monkeypatch):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.integers(0, 200, size=(300, 4)).astype(float),
+                     columns=["a", "b", "c", "d"])
+    X.loc[::7, "c"] = np.nan  # exercise missing-value routing
+    y = np.where(X["a"] > X["b"], "-O3", np.where(X["d"] > 100, "-Os", "-O1"))
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+
+    out = Path(tempfile.mkdtemp())
+    joblib.dump(model, out / "model.pkl")
+    export_forest(model, out / "model.npz")
+    forest = NumpyForest.load(out / "model.npz")
+
+    X_test = pd.DataFrame(rng.integers(0, 200, size=(500, 4)).astype(float),
+                          columns=["a", "b", "c", "d"])
+    X_test.loc[::5, "c"] = np.nan
+
+    assert list(forest.classes_) == list(model.classes_)
+    assert np.array_equal(forest.predict(X_test), model.predict(X_test))
+    # Columns are selected by name
+    assert np.array_equal(forest.predict(X_test[["d", "c", "b", "a"]]),
+                          model.predict(X_test))
+    assert np.allclose(forest.predict_proba(X_test), model.predict_proba(X_test))
+    # Large batches are walked in row chunks with the same result
+    monkeypatch.setattr(forest_inference, "CHUNK_ROWS", 64)
+    assert np.array_equal(forest.apply(X_test), model.apply(X_test) + forest.roots)
+    assert np.allclose(forest.predict_proba(X_test), model.predict_proba(X_test))
+
+    registry = ModelRegistry(out / "model.pkl")
+    assert isinstance(registry.get(), NumpyForest)
+    assert registry.info()["engine"] == "numpy"
+    assert not isinstance(ModelRegistry(out / "model.pkl", prefer_compiled=False).get(),
+                          NumpyForest)
@@ -0,0 +1,45 @@
+import src.feature_extractor as fe
+import src.result_store as store
+from pathlib import Path
+import tempfile
+
+def test_incremental_extraction_only_redoes_changed_files(monkeypatch):
+    tmp = Path(tempfile.mkdtemp())
+    src_dir = tmp / "benchmarks"
+    src_dir.mkdir()
+    monkeypatch.setattr(fe, "SRC_DIR", src_dir)
+    monkeypatch.setattr(fe, "MANIFEST_PATH", tmp / "manifest.json")
+    monkeypatch.setattr(store, "STORE_DIR", tmp / "store")
+
+    extracted = []
+
+    def fake_extract(src):
+        extracted.append(src.name)
+        ir_file = tmp / f"{src.stem}.ll"
+        ir_file.write_text("define i32 @main() {\n  ret i32 0\n}\n")
+        return ir_file, {"instruction_count": len(src.read_text()), "file": src.stem,
+                         "language": src.suffix}
+
+    monkeypatch.setattr(fe, "extract_file", fake_extract)
+
+    (src_dir / "a.rs").write_text("fn main() {}")
+    (src_dir / "b.rs").write_text("fn main() {}")
+    fe.main(["--incremental", "--jobs", "2"])
+    assert sorted(extracted) == ["a.rs", "b.rs"]
+
+    extracted.clear()
+    (src_dir / "a.rs").write_text("fn main() { println!(); }")
+    (src_dir / "b.rs").unlink()
+    (src_dir / "c.rs").write_text("fn main() {}")
+    fe.main(["--incremental"])
+    assert sorted(extracted) == ["a.rs", "c.rs"]
+
+    df = store.read("features", columns=["instruction_count", "ir_functions"]).sort_values("file")
+    assert list(df["file"]) == ["a", "c"]
+    assert df.iloc[0]["instruction_count"] == len("fn main() { println!(); }")
+    # Structural features come from the one corpus-wide matrix pass
+    assert list(df["ir_functions"]) == [1, 1]
+
+    extracted.clear()
+    fe.main(["--incremental"])
+    assert extracted == []
@@ -0,0 +1,96 @@
+from pathlib import Path
+import tempfile
+
+import numpy as np
+
+import src.ir_analysis as ir_analysis
+import src.smartopt as smartopt
+from src.feature_extractor import FEATURES, extract_all_features
+from src.ir_analysis import (
+    STRUCTURAL_FEATURES,
+    build_feature_matrix,
+    parse_ir,
+    structural_features,
+)
+
+# Two nested counted loops in @kernel, called from @main
+NESTED_LOOPS_IR = """define void @kernel(ptr %a, i32 %n) {
+entry:
+  br label %outer
+outer:
+  %i = phi i32 [ 0, %entry ], [ %i.next, %outer.latch ]
+  br label %inner
+inner:
+  %j = phi i32 [ 0, %outer ], [ %j.next, %inner ]
+  %p = getelementptr i32, ptr %a, i32 %j
+  %v = load i32, ptr %p, align 4
+  %w = add nsw i32 %v, %i
+  store i32 %w, ptr %p, align 4
+  %j.next = add nsw i32 %j, 1
+  %jc = icmp slt i32 %j.next, %n
+  br i1 %jc, label %inner, label %outer.latch
+outer.latch:
+  %i.next = add nsw i32 %i, 1
+  %ic = icmp slt i32 %i.next, %n
+  br i1 %ic, label %outer, label %exit
+exit:
+  ret void
+}
+
+define i32 @main() {
+  %a = alloca [16 x i32], align 4
+  call void @kernel(ptr %a, i32 16)
+  %r = call i32 @puts(ptr null)
+  ret i32 0
+}
+
+declare i32 @puts(ptr)
+"""
+
+
+def _write_ir():
+    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".ll") as tmp:
+        tmp.write(NESTED_LOOPS_IR)
+    return Path(tmp.name)
+
+
+def test_structural_features_of_nested_loops():
+    path = _write_ir()
+
+    kernel, main = parse_ir(path)
+    assert kernel.name == "kernel"
+    assert kernel.n_blocks == 5
+    assert kernel.n_edges == 6
+    assert kernel.loops == 2
+    assert kernel.loop_depth.tolist() == [0, 1, 2, 1, 0]
+    assert main.n_blocks == 1
+
+    feats = structural_features(path)
+    assert feats["ir_functions"] == 2
+    assert feats["ir_max_loop_depth"] == 2
+    assert feats["ir_cyclomatic"] == 6 - 6 + 2 * 2
+    assert feats["ir_callgraph_edges"] == 2
+    assert feats["ir_external_callees"] == 1
+    assert feats["ir_op_memory"] == 4
+
+    matrix = build_feature_matrix([path, path], jobs=2)
+    assert matrix.shape == (2, len(STRUCTURAL_FEATURES))
+    assert np.array_equal(matrix[0], matrix[1])
+
+
+def test_structural_features_only_for_models_trained_on_them(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ir_analysis, "structural_features", lambda path: calls.append(path) or {})
+    path = _write_ir()
+
+    assert set(extract_all_features(path, structural=False)) == set(FEATURES)
+    assert calls == []
+    extract_all_features(path)
+    assert calls == [path]
+
+    class LegacyModel:
+        feature_names_in_ = np.array(FEATURES)
+
+    monkeypatch.setattr(smartopt, "get_model", LegacyModel)
+    assert not smartopt.needs_structural(smartopt.model_columns())
+    assert smartopt.needs_structural(FEATURES + ["ir_loops"])
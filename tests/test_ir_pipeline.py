@@ -0,0 +1,16 @@
+from src.benchmark_runner import build_ir_pipeline, shared_ir
+from pathlib import Path
+
+def test_ir_pipeline_commands():
+    commands, intermediates = build_ir_pipeline(
+        Path("sort.ll"), Path("sort.c"), "-Os", Path("bin/sort_Os")
+    )
+    opt, llc, link = commands
+
+    assert opt[:3] == ["opt", "-Os", "sort.ll"]
+    assert llc[0] == "llc" and "-O2" in llc and "-filetype=obj" in llc
+    assert link == ["clang", "bin/sort_Os.o", "-o", "bin/sort_Os"]
+    assert [p.name for p in intermediates] == ["sort_Os.opt.bc", "sort_Os.o"]
+
+def test_rust_always_builds_from_source():
+    assert shared_ir(Path("fib.rs"), "ir") is None
@@ -0,0 +1,74 @@
+from backend.jobs import JobManager, QueueFull
+from backend.main import app, code_options
+from fastapi.testclient import TestClient
+import threading
+import pytest
+
+def test_job_pool_backpressure_and_progress():
+    manager = JobManager(workers=1, max_pending=2)
+    release = threading.Event()
+
+    def work(x, progress=None):
+        progress(1, 2, "half")
+        release.wait(5)
+        return x * 2
+
+    first = manager.submit(work, 1)
+    second = manager.submit(work, 2)
+    with pytest.raises(QueueFull):
+        manager.submit(work, 3)
+
+    release.set()
+    assert first.future.result(5) == 2
+    assert second.future.result(5) == 4
+    assert first.to_dict()["status"] == "done"
+    assert first.progress == {"done": 1, "total": 2, "stage": "half"}
+
+    # Slots are freed once jobs finish
+    assert manager.submit(work, 4).future.result(5) == 8
+
+
+def test_identical_submissions_share_one_run():
+    from backend.main import source_key
+
+    manager = JobManager(workers=2, max_pending=4)
+    release = threading.Event()
+    runs = []
+
+    def work(x, progress=None):
+        runs.append(x)
+        release.wait(5)
+        return x
+
+    options = {"mode": "fast", "top_k": 2}
+    key = source_key(b"int main() {}\r\n", ".c", options)
+    # Line endings and trailing whitespace don't make a source different
+    assert source_key(b"int main() {}  \n\n", ".c", options) == key
+    assert source_key(b"int main() {}", ".cpp", options) != key
+    assert source_key(b"int main() {}", ".c", {"mode": "full", "top_k": 2}) != key
+
+    first = manager.submit(work, 1, dedupe_key=key)
+    second = manager.submit(work, 1, dedupe_key=key)
+    assert manager.join(key) is first
+    assert second is first and first.subscribers == 3
+
+    release.set()
+    assert first.future.result(5) == 1
+    assert runs == [1]
+    assert manager.stats()["coalesce_hit_rate"] == round(2 / 3, 4)
+
+    # Once finished, the same key starts a fresh run
+    assert manager.submit(work, 2, dedupe_key=key) is not first
+
+
+def test_code_options_are_coerced_and_validated():
+    options = code_options({"code": "", "top_k": "3", "cache": "false", "race": 1})
+    assert options["top_k"] == 3 and options["use_cache"] is False and options["race"] is True
+
+    client = TestClient(app)
+    for bad in ({"top_k": "three"}, {"top_k": 2.5}, {"cache": "maybe"}, {"profile": None},
+                {"mode": 3}):
+        for path in ("/analyze-code", "/analyze-code/stream", "/jobs/analyze-code"):
+            response = client.post(path, json={"code": "int main(){}", **bad})
+            assert response.status_code == 422, (path, bad)
+            assert next(iter(bad)) in response.json()["detail"]
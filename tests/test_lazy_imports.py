@@ -0,0 +1,16 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def test_backend_import_does_not_load_ml_stack():
+    # Fresh interpreter: other tests in this session already imported pandas
+    script = "import json, sys; import backend.main; print(json.dumps(sorted(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    loaded = set(json.loads(out.stdout.splitlines()[-1]))
+
+    for heavy in ("pandas", "sklearn", "joblib", "pyarrow", "numpy", "requests"):
+        assert heavy not in loaded, f"backend.main imports {heavy} eagerly"
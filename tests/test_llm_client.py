@@ -0,0 +1,54 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend.llm import PENDING_EXPLANATION, ExplanationClient
+
+
+class StubLLM(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooling is observable
+    delay = 0.0
+    calls = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        StubLLM.calls.append(self.client_address[1])
+        time.sleep(StubLLM.delay)
+        flag = "-O3" if "-O3" in body["inputs"] else "other"
+        payload = json.dumps([{"generated_text": f"because {flag}"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_explanations_are_pooled_cached_and_deadline_bounded():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLM)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = ExplanationClient(url=f"http://127.0.0.1:{server.server_port}/",
+                               api_key=None, deadline=5)
+    try:
+        stats = {"-O2": 0.2, "-O3": 0.8}
+        assert client.wait(client.explain("-O3", stats, ".c")) == "because -O3"
+        # Same key: served from cache without another HTTP call
+        assert client.wait(client.explain("-O3", stats, ".c")) == "because -O3"
+        assert client.wait(client.explain("-O2", {"-O2": 0.9}, ".c")) == "because other"
+        assert len(StubLLM.calls) == 2
+        assert len(set(StubLLM.calls)) == 1  # one reused connection
+        assert client.stats()["hits"] == 1
+
+        # Past the deadline the caller gets a placeholder; the answer is
+        # still cached once it arrives
+        StubLLM.delay = 0.5
+        slow = client.explain("-O1", {"-O1": 1.0}, ".rs")
+        assert client.wait(slow, deadline=0.05) == PENDING_EXPLANATION
+        assert slow.result(5) == "because other"
+        assert client.wait(client.explain("-O1", {"-O1": 1.0}, ".rs"), deadline=0) == "because other"
+    finally:
+        client.close()
+        server.shutdown()
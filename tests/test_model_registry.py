@@ -0,0 +1,22 @@
+from src.model_registry import ModelRegistry
+from pathlib import Path
+import joblib
+import os
+import tempfile
+
+def test_registry_loads_once_and_hot_reloads():
+    path = Path(tempfile.mkdtemp()) / "model.pkl"
+    joblib.dump({"v": 1}, path)
+
+    registry = ModelRegistry(path)
+    assert registry.get() == {"v": 1}
+    assert registry.get() is registry.get()
+    assert registry.loads == 1
+    first_version = registry.version
+
+    joblib.dump({"v": 2, "pad": "x"}, path)
+    os.utime(path, ns=(0, 1))  # make sure the mtime differs on coarse filesystems
+
+    assert registry.get() == {"v": 2, "pad": "x"}
+    assert registry.loads == 2
+    assert registry.version != first_version
@@ -0,0 +1,19 @@
+import src.benchmark_runner as benchmark_runner
+from src.benchmark_runner import FLAGS, benchmark_files
+
+def test_parallel_rows_are_ordered(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark_runner, "BIN_DIR", tmp_path / "bin")
+    (tmp_path / "bin").mkdir()
+    sources = []
+    for name in ("par_b", "par_a"):
+        path = tmp_path / f"{name}.rs"
+        path.write_text("fn main() {}")
+        sources.append(path)
+
+    rows = benchmark_files(sources, jobs=4, run_jobs=1)
+
+    assert [(r["file"], r["flag"]) for r in rows] == [
+        (src.stem, flag) for src in sources for flag in FLAGS
+    ]
+    assert all(r["status"] == "ok" for r in rows)
+    assert not list(benchmark_runner.ROOT.glob("data/bin/par_*"))
@@ -0,0 +1,52 @@
+from src.profiler import profile_binary, profile_diff, ptrace_available
+from pathlib import Path
+import pytest
+import tempfile
+
+def test_profile_busy_binary():
+    if not ptrace_available():
+        pytest.skip("ptrace sampling is not available on this platform")
+    script = Path(tempfile.mkdtemp()) / "busy.sh"
+    script.write_text("#!/bin/sh\ni=0\nwhile [ $i -lt 100000 ]; do i=$((i+1)); done\n")
+    script.chmod(0o755)
+
+    profile = profile_binary(script, top=5)
+    assert profile["sampler"] in ("perf", "ptrace")
+    assert profile["samples"] > 0
+    assert 0 < len(profile["functions"]) <= 5
+    samples = [f["samples"] for f in profile["functions"]]
+    assert samples == sorted(samples, reverse=True)
+    assert sum(profile["counts"].values()) == profile["samples"]
+
+def test_profile_diff_orders_by_time_saved():
+    def row(flag, functions, top=10):
+        total = sum(functions.values())
+        hottest = sorted(functions.items(), key=lambda fn: -fn[1])
+        return {"flag": flag, "profile": {
+            "sampler": "ptrace", "samples": total, "counts": dict(hottest),
+            "functions": [{"function": f, "samples": n, "percent": 100 * n / total}
+                          for f, n in hottest[:top]]}}
+
+    results = [row("-O0", {"main": 100, "helper": 400}), row("-O3", {"main": 50}),
+               {"flag": "-O2", "status": "predicted"}]
+    diff = profile_diff(results, "-O3")
+    assert diff["baseline_samples"] == 500 and diff["best_samples"] == 50
+    assert [f["function"] for f in diff["functions"]] == ["helper", "main"]
+    assert diff["functions"][0]["best_samples"] == 0
+    assert profile_diff(results, "-O2") is None
+
+    # Only the top function of each profile is listed, but the diff uses
+    # the full counts: "helper" still ran under -O3, it was not inlined
+    results = [row("-O0", {"main": 100, "helper": 400}, top=1),
+               row("-O3", {"main": 300, "helper": 50}, top=1)]
+    diff = profile_diff(results, "-O3", top=1)
+    assert diff["functions"] == [{"function": "helper", "best_samples": 50,
+                                  "baseline_samples": 400, "best_percent": 14.29,
+                                  "baseline_percent": 80.0}]
+
+    # Without counts, functions outside a top list are unknown, not 0
+    for r in results:
+        del r["profile"]["counts"]
+    by_name = {f["function"]: f for f in profile_diff(results, "-O3")["functions"]}
+    assert by_name["helper"]["best_samples"] is None
+    assert by_name["main"]["baseline_samples"] is None
@@ -0,0 +1,37 @@
+from src.benchmark_runner import race_binaries
+from pathlib import Path
+import tempfile
+import time
+
+def _script(directory, name, body):
+    path = Path(directory) / name
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(0o755)
+    return path
+
+def test_race_kills_dominated_candidates():
+    tmp = tempfile.mkdtemp()
+    binaries = {
+        "-O2": _script(tmp, "fast.sh", "exit 0"),
+        "-O0": _script(tmp, "slow.sh", "sleep 5"),
+        "-O1": _script(tmp, "crash.sh", "exit 3"),
+    }
+
+    start = time.perf_counter()
+    outcome = race_binaries(binaries, min_timeout=0.2, rounds=2)
+    assert time.perf_counter() - start < 2
+
+    status, stats = outcome["-O2"]
+    assert status == "ok" and stats["runs"] == 2
+    status, stats = outcome["-O0"]
+    assert status == "dominated" and 0.2 <= stats["runtime_limit"] < 1
+    assert outcome["-O1"][0].startswith("runtime_error")
+
+def test_race_seeded_best_and_full_timeout():
+    tmp = tempfile.mkdtemp()
+    slow = {"-O3": _script(tmp, "slow.sh", "sleep 0.3")}
+
+    # Without a known best the first candidate gets the full timeout
+    assert race_binaries(slow, min_timeout=0.05)["-O3"][0] == "ok"
+    # A cached runtime seeds the adaptive limit
+    assert race_binaries(slow, best=0.01, min_timeout=0.05)["-O3"][0] == "dominated"
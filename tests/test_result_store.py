@@ -0,0 +1,29 @@
+import src.result_store as store
+from pathlib import Path
+import tempfile
+
+def test_append_read_latest_and_delete(monkeypatch):
+    monkeypatch.setattr(store, "STORE_DIR", Path(tempfile.mkdtemp()))
+
+    store.append("results", [
+        {"file": "a", "language": ".c", "flag": "-O2", "runtime": 2.0, "status": "ok"},
+        {"file": "b", "language": ".c", "flag": "-O2", "runtime": 5.0, "status": "ok"},
+    ], compiler_version=lambda lang: "clang 17")
+    store.append("results", [
+        {"file": "a", "language": ".c", "flag": "-O2", "runtime": 1.0, "status": "ok"},
+    ], compiler_version="clang 18")
+
+    df = store.read("results", columns=["runtime"])
+    assert list(df.columns) == ["file", "flag", "runtime"]
+    assert dict(zip(df["file"], df["runtime"])) == {"a": 1.0, "b": 5.0}
+
+    full = store.read("results")
+    assert {"run_id", "host", "timestamp", "compiler_version"} <= set(full.columns)
+    assert full.loc[full["file"] == "a", "compiler_version"].item() == "clang 18"
+
+    store.delete("results", [{"file": "b", "flag": "-O2"}])
+    assert list(store.read("results", columns=[])["file"]) == ["a"]
+
+    store.compact("results")
+    assert len(store.parts("results")) == 1
+    assert list(store.read("results", columns=[])["file"]) == ["a"]
@@ -0,0 +1,57 @@
+from src.benchmark_runner import measure_runtime_stats, runtime_stats
+from pathlib import Path
+import tempfile
+
+def test_runtime_stats_summary():
+    stats = runtime_stats([1.0, 2.0, 3.0, 4.0, 100.0])
+    assert stats["runtime"] == 3.0
+    assert stats["runtime_mean"] == 22.0
+    assert stats["runs"] == 5
+    assert stats["runtime_ci95"] > 0
+
+def test_measure_runtime_stats_repeats():
+    script = Path(tempfile.mkdtemp()) / "prog.sh"
+    script.write_text("#!/bin/sh\nexit 0\n")
+    script.chmod(0o755)
+
+    ok, stats, err = measure_runtime_stats(script, warmup=1, min_runs=3, max_runs=4)
+    assert ok, err
+    assert 3 <= stats["runs"] <= 4
+    assert stats["cpu_time"] >= 0
+
+def test_collect_metrics_rusage_and_perf_fallback():
+    from src.benchmark_runner import METRIC_COLUMNS, collect_metrics, perf_available
+
+    script = Path(tempfile.mkdtemp()) / "prog.sh"
+    script.write_text("#!/bin/sh\nexit 0\n")
+    script.chmod(0o755)
+
+    ok, metrics, err = collect_metrics(script)
+    assert ok, err
+    assert set(metrics) == set(METRIC_COLUMNS)
+    assert metrics["peak_rss_kb"] > 0
+    assert metrics["minor_faults"] >= 0
+    if not perf_available():
+        assert metrics["instructions"] is None and metrics["ipc"] is None
+
+def test_parse_perf_csv():
+    from src.benchmark_runner import _parse_perf_csv
+
+    text = ("# started on Mon\n\n"
+            "1200,,instructions:u,1000,100.00,,\n"
+            "600,,cycles:u,1000,100.00,,\n"
+            "<not supported>,,cache-misses:u,0,100.00,,\n")
+    assert _parse_perf_csv(text) == {"instructions": 1200, "cycles": 600,
+                                     "cache_misses": None}
+
+def test_failed_metrics_run_keeps_the_timing(monkeypatch):
+    import src.benchmark_runner as runner
+
+    script = Path(tempfile.mkdtemp()) / "prog.sh"
+    script.write_text("#!/bin/sh\nexit 0\n")
+    script.chmod(0o755)
+    monkeypatch.setattr(runner, "collect_metrics", lambda path: (False, None, "timeout"))
+
+    row = runner.run_flag({"flag": "-O2"}, script, metrics=True)
+    assert row["status"] == "ok" and row["runtime"] >= 0
+    assert all(row[col] is None for col in runner.METRIC_COLUMNS)
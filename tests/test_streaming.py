@@ -0,0 +1,75 @@
+from src.smartopt import iter_analysis
+from src.benchmark_runner import FLAGS
+from src.workspace import quota_stats, workspace_root
+from pathlib import Path
+import json
+import tempfile
+
+def _rust_source():
+    src = Path(tempfile.mkdtemp()) / "stream.rs"
+    src.write_text("fn main() { println!(\"{}\", (0..1000u64).sum::<u64>()); }\n")
+    return src
+
+def test_iter_analysis_streams_prediction_then_rows():
+    events = list(iter_analysis(_rust_source(), use_cache=False, mode="fast",
+                                top_k=1, baseline=False))
+    kinds = [e["event"] for e in events]
+    assert kinds[0] == "prediction" and kinds[-1] == "done"
+    assert kinds.count("flag") == len(FLAGS)
+
+    prediction, done = events[0], events[-1]
+    assert prediction["verify"] == [prediction["ranked"][0][0]]
+    assert [row["flag"] for row in done["flags"]] == FLAGS
+    # Placeholders come first, the benchmarked flag last
+    assert events[-2]["row"]["verified"] and events[-2]["row"]["status"] == "ok"
+
+def test_closing_stream_early_removes_workspace():
+    before = set(workspace_root().glob("analysis-*"))
+    events = iter_analysis(_rust_source(), use_cache=False)
+    assert next(events)["event"] == "prediction"
+    assert len(set(workspace_root().glob("analysis-*")) - before) == 1
+    events.close()
+    assert set(workspace_root().glob("analysis-*")) - before == set()
+
+def _sse_events(response):
+    events, kind = [], None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            kind = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((kind, json.loads(line[len("data: "):])))
+    return events
+
+def test_stream_endpoint_matches_analyze_code():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    client = TestClient(app)
+    payload = {"code": _rust_source().read_text(), "cache": False, "mode": "fast",
+               "top_k": 1}
+    before = set(workspace_root().glob("stream-*"))
+    used = quota_stats()["used_bytes"]
+
+    with client.stream("POST", "/analyze-code/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(response)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds == ["prediction", *["flag"] * len(FLAGS), "explanation", "done"]
+    done = events[-1][1]
+    assert done["explanation"] == events[-2][1]["explanation"]
+    assert done["best_flag"] == events[0][1]["best_flag"]
+    assert [row["flag"] for row in done["flags"]] == FLAGS
+
+    # The workspace is gone once the stream has ended
+    assert set(workspace_root().glob("stream-*")) - before == set()
+    assert quota_stats()["used_bytes"] == used
+
+    # Same body as the non-streaming endpoint, up to the timings
+    plain = client.post("/analyze-code", json=payload).json()
+    assert set(done) == set(plain)
+    for key in ("filename", "language", "best_flag", "verified_flags", "explanation"):
+        assert done[key] == plain[key]
+    assert [(r["flag"], r["status"], r["verified"]) for r in done["flags"]] == \
+        [(r["flag"], r["status"], r["verified"]) for r in plain["flags"]]
@@ -0,0 +1,44 @@
+from src import telemetry
+from src.benchmark_runner import run_binary
+from pathlib import Path
+import tempfile
+
+def test_histogram_and_noop_when_disabled():
+    registry = []
+    hist = telemetry.Histogram("test_seconds", "Test latency.", ("stage",), buckets=(0.1, 1.0),
+                               registry=registry)
+    was_enabled = telemetry.enabled()
+    telemetry.enable(False)
+    with hist.time(stage="x"):
+        pass
+    assert hist.count(stage="x") == 0
+
+    telemetry.enable(True)
+    try:
+        hist.observe(0.5, stage="x")
+        hist.observe(2.0, stage="x")
+        text = telemetry.render(registry)
+    finally:
+        telemetry.enable(was_enabled)
+    assert registry == [hist] and "test_seconds" not in telemetry.render()
+    assert 'test_seconds_bucket{stage="x",le="0.1"} 0' in text
+    assert 'test_seconds_bucket{stage="x",le="1"} 1' in text
+    assert 'test_seconds_bucket{stage="x",le="+Inf"} 2' in text
+    assert 'test_seconds_count{stage="x"} 2' in text
+
+def test_metrics_endpoint_counts_runs():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    script = Path(tempfile.mkdtemp()) / "fail.sh"
+    script.write_text("#!/bin/sh\nexit 3\n")
+    script.chmod(0o755)
+    before = telemetry.FAILURES.value(stage="run")
+    run_binary(script)
+    assert telemetry.FAILURES.value(stage="run") == before + 1
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE smartopt_stage_seconds histogram" in response.text
+    assert 'smartopt_failures_total{stage="run"}' in response.text
+    assert "smartopt_queue_depth 0" in response.text
@@ -0,0 +1,67 @@
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import src.model_trainer as trainer
+import src.result_store as store
+from src.benchmark_runner import FLAGS
+
+
+def _features(files, loops):
+    row = {col: 1.0 for col in trainer.FEATURE_COLUMNS}
+    return [{**row, "file": f, "loop_markers": float(n)} for f, n in zip(files, loops)]
+
+
+def test_stream_corpus_and_train(monkeypatch):
+    monkeypatch.setattr(store, "STORE_DIR", Path(tempfile.mkdtemp()))
+    files = [f"p{i}" for i in range(40)]
+    loops = [i % 2 for i in range(40)]
+
+    store.append("features", _features(files, loops))
+    # Loopy programs are fastest at -O3, the rest at -O1
+    store.append("results", [
+        {"file": f, "language": ".c", "flag": flag, "compile_time": 0.1,
+         "runtime": 1.0 if flag == ("-O3" if n else "-O1") else 2.0,
+         "binary_size": 1000, "status": "ok"}
+        for f, n in zip(files, loops) for flag in FLAGS
+    ])
+    # A later run wins, and deleted programs drop out
+    store.append("results", [{"file": "p0", "language": ".c", "flag": "-O0",
+                              "runtime": 0.5, "status": "ok"}])
+    store.delete("features", [{"file": "p39"}])
+
+    names, X, metrics = trainer.stream_corpus(metric_columns=["runtime"], chunk_rows=16)
+    assert len(names) == 39 and "p39" not in names
+    assert X.shape == (39, len(trainer.FEATURE_COLUMNS)) and X.dtype == np.float32
+    assert metrics[names.index("p0"), FLAGS.index("-O0"), 0] == 0.5
+
+    model, report = trainer.train(search_iter=1, folds=2, chunk_rows=16, n_jobs=1)
+    assert report["programs"] == 39
+    assert report["test"]["accuracy"] >= 0.75
+    assert report["test"]["mean_regret"] <= report["static_flag_regret"]["-O1"]
+
+    models_dir = Path(tempfile.mkdtemp())
+    out = trainer.save_artifacts(model, report, models_dir, promote=False)
+    metrics_json = json.loads((out / "metrics.json").read_text())
+    assert metrics_json["version"] == out.name
+    assert (out / "model.pkl").exists() and (out / "model.npz").exists()
+    # Saving the same model again (within the second) never overwrites
+    again = trainer.save_artifacts(model, report, models_dir, promote=False)
+    assert again != out and sorted(p.name for p in models_dir.iterdir()) == \
+        sorted([out.name, again.name])
+
+
+def test_score_programs_labels_with_balanced_metric():
+    nan = float("nan")
+    # (programs, flags, [runtime, binary_size]); program 2 was never measured
+    metrics = np.full((3, len(FLAGS), 2), nan)
+    metrics[0, :3] = [[1.0, 100], [0.5, 400], [0.6, 150]]
+    metrics[1, :2] = [[1.0, 100], [0.9, 110]]
+    scores, best = trainer.score_programs(metrics, ["runtime", "binary_size"],
+                                          {"runtime": 0.5, "binary_size": 0.5})
+
+    assert list(best["file"]) == [0, 1]
+    assert list(best["flag"]) == [FLAGS[2], FLAGS[1]]
+    assert np.isnan(scores[2]).all() and np.isnan(scores[0, 3])
@@ -0,0 +1,25 @@
+import pytest
+
+from src.workspace import Workspace, WorkspaceQuotaExceeded, _Quota
+
+
+def test_workspace_quota_and_cleanup():
+    quota = _Quota(limit=100)
+
+    with Workspace(quota=quota) as first:
+        first.write("a.ll", b"x" * 60)
+        assert quota.used == 60
+
+        # Growing a tracked file only charges the difference
+        (first.path / "a.ll").write_bytes(b"x" * 70)
+        first.track(first.path / "a.ll")
+        assert quota.used == 70
+
+        second = Workspace(quota=quota)
+        with pytest.raises(WorkspaceQuotaExceeded):
+            second.write("bin", b"y" * 40)
+        second.close()
+        assert not second.path.exists()
+
+    assert quota.used == 0
+    assert not first.path.exists()